@@ -0,0 +1,6 @@
+"""Shared helpers for the validation scripts and tooling around the lessons.
+
+The notebooks stay self-contained (they must run on Colab with nothing but
+``pip install lyzr-adk``); this package is for the scripts that live next to
+them — ``validate.py``, ``validate_bonus.py`` and friends.
+"""
@@ -0,0 +1,262 @@
+"""Persistent agent pool keyed by a hash of the agent configuration.
+
+Provisioning an agent is several remote calls — ``create_agent`` then
+``add_tool`` / ``add_memory`` / ``add_rai_policy`` / ``add_context`` — and
+scripts repeat them with identical arguments on every run.
+:class:`AgentPool` fingerprints the full configuration and remembers the
+resulting agent id on local disk. The next run fetches that agent with
+``studio.get_agent`` instead of creating a new one, and only touches the
+parts of the configuration that actually changed.
+
+Tools are the exception: the functions live in this process, so they are
+always bound to the fetched agent with ``add_tool`` again.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "lyzr_kit", "agents.json")
+
+# create_agent() arguments that Agent.update() also accepts. Anything else
+# (provider, skills, ...) can only be set at creation, so changing it means
+# a new agent.
+_UPDATE_FIELDS = frozenset((
+    "description", "temperature", "top_p", "role", "goal", "instructions", "response_model",
+    "store_messages", "file_output", "image_output_config", "reflection", "bias_check",
+    "llm_judge", "groundedness_facts", "image_model", "features", "examples",
+    "managed_agents", "tool_usage_description", "tool_configs", "llm_credential_id",
+))
+
+
+def _digest(value) -> str:
+    blob = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def tool_signature(fn: Callable) -> str:
+    """Name, parameters and docstring — everything add_tool() sends to the model."""
+    return f"{fn.__name__}{inspect.signature(fn)}\n{inspect.getdoc(fn) or ''}"
+
+
+def _model_schema(model) -> Optional[dict]:
+    if model is None:
+        return None
+    for attr in ("model_json_schema", "schema"):   # pydantic v2, then v1
+        fn = getattr(model, attr, None)
+        if fn is not None:
+            return fn()
+    return {"name": getattr(model, "__name__", str(model))}
+
+
+def _ref(obj):
+    """Stable reference for a policy/context: its id, or the settings dict itself."""
+    if obj is None or isinstance(obj, (dict, str)):
+        return obj
+    return getattr(obj, "id", None) or repr(obj)
+
+
+@dataclass
+class PoolStats:
+    created: int = 0
+    reused: int = 0
+    updated: int = 0
+
+
+class AgentPool:
+    """Reuse agents across runs when their configuration hasn't changed.
+
+    Records are namespaced by a hash of the API key, so switching accounts
+    never hands back an agent id from another account. The key defaults to
+    the one ``studio`` sends with its requests.
+    """
+
+    def __init__(self, studio, path: str = DEFAULT_PATH, api_key: Optional[str] = None):
+        self.studio = studio
+        self.path = path
+        key = api_key or getattr(getattr(studio, "_http", None), "api_key", None)
+        if not key:
+            raise ValueError("AgentPool needs the account's API key to namespace its records")
+        self.namespace = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+        self.stats = PoolStats()
+        self._lock = threading.Lock()
+
+    # ── persistence ───────────────────────────────────────────────────────────
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save(self, name: str, record: Optional[dict]):
+        # Re-read under the lock so concurrent pools writing other names survive.
+        with self._lock:
+            data = self._load()
+            space = data.setdefault(self.namespace, {})
+            if record is None:
+                space.pop(name, None)
+            else:
+                space[name] = record
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)      # atomic: readers never see half a file
+
+    def forget(self, name: str):
+        """Drop the record for ``name`` (e.g. after deleting the agent)."""
+        self._save(name, None)
+
+    # ── fingerprinting ────────────────────────────────────────────────────────
+    @staticmethod
+    def fingerprint(provider: str, role: str, goal: str, instructions: str,
+                    tools: Sequence[Callable] = (), memory: Optional[int] = None,
+                    rai_policy=None, contexts: Sequence = (), response_model=None,
+                    **create_kwargs) -> Dict[str, str]:
+        """Per-part hashes of a configuration; ``"all"`` covers everything.
+
+        ``"identity"`` holds what only ``create_agent`` can set; ``"core"``
+        what ``Agent.update`` can change in place.
+        """
+        updatable = {k: v for k, v in create_kwargs.items() if k in _UPDATE_FIELDS}
+        parts = {
+            "identity": _digest({"provider": provider,
+                                 "extra": {k: v for k, v in create_kwargs.items()
+                                           if k not in _UPDATE_FIELDS}}),
+            "core": _digest({"role": role, "goal": goal, "instructions": instructions,
+                             "response_model": _model_schema(response_model),
+                             "extra": updatable}),
+            "tools": _digest(sorted(tool_signature(t) for t in tools)),
+            "memory": _digest(memory),
+            "rai": _digest(_ref(rai_policy)),
+            "contexts": _digest(sorted(str(_ref(c)) for c in contexts)),
+        }
+        parts["all"] = _digest(parts)
+        return parts
+
+    # ── main entry point ──────────────────────────────────────────────────────
+    def get_or_create(self, name: str, provider: str, role: str, goal: str,
+                      instructions: str, tools: Sequence[Callable] = (),
+                      memory: Optional[int] = None, rai_policy=None,
+                      contexts: Sequence = (), response_model=None, **create_kwargs):
+        """Return an agent with exactly this configuration, reusing one if possible.
+
+        ``memory`` is ``max_messages`` for ``add_memory`` (None = no memory).
+        Extra keyword arguments go to ``create_agent`` and count towards the
+        hash (``temperature``, ``features``, ...). A change to ``provider`` or
+        to an argument ``Agent.update`` does not take replaces the agent.
+        """
+        parts = self.fingerprint(provider, role, goal, instructions, tools, memory,
+                                 rai_policy, contexts, response_model, **create_kwargs)
+        record = self._load().get(self.namespace, {}).get(name)
+
+        agent = None
+        if record is not None:
+            try:
+                agent = self.studio.get_agent(record["id"])
+            except Exception:
+                agent = None        # deleted on the server (e.g. by the sweeper)
+            if agent is not None and record["parts"].get("identity") != parts["identity"]:
+                try:
+                    agent.delete()
+                except Exception:
+                    pass
+                agent = None
+
+        if agent is None:
+            agent = self.studio.create_agent(
+                name=name, provider=provider, role=role, goal=goal,
+                instructions=instructions, response_model=response_model, **create_kwargs)
+            old = {}
+            self.stats.created += 1
+        else:
+            old = record["parts"]
+            if old.get("all") == parts["all"]:
+                self.stats.reused += 1
+            else:
+                self.stats.updated += 1
+            if old.get("core") != parts["core"]:
+                changes = {k: v for k, v in create_kwargs.items() if k in _UPDATE_FIELDS}
+                changes.update(role=role, goal=goal, instructions=instructions)
+                if response_model is not None:
+                    changes["response_model"] = response_model
+                agent = agent.update(**changes)
+
+        agent = self._apply(agent, old, parts, tools, memory, rai_policy, contexts, record)
+        self._save(name, {"id": agent.id, "parts": parts,
+                          "contexts": [str(_ref(c)) for c in contexts]})
+        return agent
+
+    def _apply(self, agent, old: Dict[str, str], parts: Dict[str, str],
+               tools: Sequence[Callable], memory: Optional[int], rai_policy,
+               contexts: Sequence, record: Optional[dict]):
+        # Each add_*/remove_* call rebuilds the feature list from the agent it
+        # is called on and returns a new Agent, so always carry the result on.
+        if old.get("memory") != parts["memory"]:
+            if old and hasattr(agent, "remove_memory"):
+                try:
+                    agent = agent.remove_memory()
+                except Exception:
+                    pass
+            if memory is not None:
+                agent = agent.add_memory(max_messages=memory)
+
+        if old.get("rai") != parts["rai"]:
+            if old:
+                try:
+                    agent = agent.remove_rai_policy()
+                except Exception:
+                    pass
+            if rai_policy is not None:
+                agent = agent.add_rai_policy(rai_policy)
+
+        if old.get("contexts") != parts["contexts"]:
+            wanted = {str(_ref(c)) for c in contexts}
+            previous = set((record or {}).get("contexts", [])) if old else set()
+            for ctx_id in previous - wanted:
+                try:
+                    agent = agent.remove_context(self.studio.get_context(ctx_id))
+                except Exception:
+                    pass
+            for ctx in contexts:
+                if str(_ref(ctx)) not in previous:
+                    agent = agent.add_context(ctx)
+
+        # Local tools live on the Python object, so bind them to the final one.
+        for fn in tools:
+            agent.add_tool(fn)
+        return agent
+
+
+def pooled_or_new(pool: Optional[AgentPool], studio, name: str, provider: str, role: str,
+                  goal: str, instructions: str, tools: Sequence[Callable] = (),
+                  memory: Optional[int] = None, rai_policy=None, contexts: Sequence = (),
+                  on_create: Optional[Callable] = None, **create_kwargs):
+    """Provision through ``pool`` if given, else create a fresh agent the long way.
+
+    ``on_create`` is called with fresh (non-pooled) agents — use it to
+    register them for cleanup. Pooled agents are kept on purpose.
+    """
+    if pool is not None:
+        return pool.get_or_create(name, provider, role, goal, instructions, tools, memory,
+                                  rai_policy, contexts, **create_kwargs)
+    agent = studio.create_agent(name=name, provider=provider, role=role, goal=goal,
+                                instructions=instructions, **create_kwargs)
+    if on_create is not None:
+        on_create(agent)
+    if memory is not None:
+        agent = agent.add_memory(max_messages=memory)
+    if rai_policy is not None:
+        agent = agent.add_rai_policy(rai_policy)
+    for ctx in contexts:
+        agent = agent.add_context(ctx)
+    for fn in tools:
+        agent.add_tool(fn)
+    return agent
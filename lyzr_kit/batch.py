@@ -0,0 +1,514 @@
+"""Resumable batch classification with a ``response_model`` agent.
+
+Lesson 04's ``struct_agent.run(review)`` classifies one row at a time.
+:func:`run_batch` runs the same agent over a CSV or JSONL file of any size:
+rows are streamed from disk and dispatched with bounded concurrency, each
+result is validated against the Pydantic model and appended to a JSONL file
+(or a directory of Parquet parts), and rows that still fail after retries go
+to a dead-letter JSONL file with the error. Memory stays flat: at most
+``2 * concurrency`` rows are in flight and results are flushed as they land.
+
+Progress is checkpointed every ``checkpoint_every`` rows (and every
+``checkpoint_interval`` seconds): the checkpoint stores which rows are done
+and the byte offset / part count of both output files. After a crash, the
+next run truncates anything written after the last checkpoint and skips the
+rows it covers, so no finished row is redone and none is written twice.
+
+    python -m lyzr_kit.batch reviews.csv sentiment.jsonl --text-field review -c 16
+    python -m lyzr_kit.batch reviews.jsonl sentiment.parquet      # needs pyarrow
+    python -m lyzr_kit.batch reviews.csv out.jsonl --stub --sample 20000
+
+Re-running the same command resumes; pass the dead-letter file back as the
+input to retry only the rows that failed.
+"""
+
+import csv
+import glob
+import importlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+MODEL = "openai/gpt-4o-mini"
+
+
+class Sentiment(BaseModel):
+    """Default response model — the one from lesson 04 / validate.py Test 7."""
+    label: str = Field(description="Sentiment label: positive, negative, or neutral")
+    score: float = Field(description="Confidence score between 0.0 and 1.0")
+
+
+# ── input ─────────────────────────────────────────────────────────────────────
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows from a ``.csv`` / ``.tsv`` or ``.jsonl`` file as dicts."""
+    if path.endswith((".csv", ".tsv")):
+        csv.field_size_limit(max(csv.field_size_limit(), 1 << 24))
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f, delimiter="\t" if path.endswith(".tsv") else ",")
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# ── output ────────────────────────────────────────────────────────────────────
+class JSONLWriter:
+    """Append-only JSONL; its position is a byte offset."""
+
+    def __init__(self, path: str, position: int = 0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._f = open(path, "r+b" if os.path.exists(path) else "w+b")
+        # Drop rows written after the checkpoint, and write from there on.
+        position = min(position, os.fstat(self._f.fileno()).st_size)
+        self._f.truncate(position)
+        self._f.seek(position)
+
+    def write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+    def commit(self) -> int:
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return self._f.tell()
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetWriter:
+    """A directory of ``part-NNNNN.parquet`` files; its position is the part count.
+
+    Each commit writes the buffered rows as one part, so the directory reads
+    as a single table (``pandas.read_parquet(path)``). Needs ``pip install pyarrow``.
+    """
+
+    def __init__(self, path: str, position: int = 0):
+        import pyarrow  # noqa: F401  (fail early when missing)
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        for part in glob.glob(os.path.join(path, "part-*.parquet")):
+            if int(os.path.basename(part)[5:10]) >= position:
+                os.remove(part)
+        self.parts = position
+        self._buffer = []
+        self._schema = None
+
+    def write(self, record: dict):
+        self._buffer.append(record)
+
+    def commit(self) -> int:
+        if self._buffer:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pylist(self._buffer, schema=self._schema)
+            self._schema = self._schema or table.schema
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            os.close(fd)
+            pq.write_table(table, tmp)
+            os.replace(tmp, os.path.join(self.path, f"part-{self.parts:05d}.parquet"))
+            self.parts += 1
+            self._buffer = []
+        return self.parts
+
+    def close(self):
+        pass
+
+
+def open_writer(path: str, position: int = 0):
+    if path.endswith(".parquet"):
+        return ParquetWriter(path, position)
+    return JSONLWriter(path, position)
+
+
+# ── checkpoint ────────────────────────────────────────────────────────────────
+class Checkpoint:
+    """Which rows are finished, as a watermark plus the finished rows above it.
+
+    Rows complete out of order, but only the ones above the lowest unfinished
+    row are kept in a set, so the checkpoint stays small however long the job.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark = 0
+        self.above = set()
+        self.positions = {"output": 0, "dead_letter": 0}
+        self.counts = {"ok": 0, "failed": 0}
+        self.input: Optional[str] = None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        self.watermark = data["watermark"]
+        self.above = set(data["above"])
+        self.positions = data["positions"]
+        self.counts = data["counts"]
+        self.input = data.get("input")
+
+    def __contains__(self, row: int) -> bool:
+        return row < self.watermark or row in self.above
+
+    def add(self, row: int):
+        if row != self.watermark:
+            self.above.add(row)
+            return
+        self.watermark += 1
+        while self.watermark in self.above:
+            self.above.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"input": self.input, "watermark": self.watermark,
+                       "above": sorted(self.above), "positions": self.positions,
+                       "counts": self.counts}, f)
+        os.replace(tmp, self.path)
+
+
+# ── run ───────────────────────────────────────────────────────────────────────
+@dataclass
+class BatchReport:
+    ok: int = 0              # classified in this run
+    failed: int = 0          # sent to the dead-letter file in this run
+    skipped: int = 0         # already done by an earlier run
+    total_ok: int = 0        # across all runs of this job
+    total_failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return (self.ok + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.ok} classified, {self.failed} failed, {self.skipped} resumed "
+                f"in {self.elapsed:.1f}s ({self.rows_per_sec:.1f} rows/s); "
+                f"job total {self.total_ok} ok / {self.total_failed} failed")
+
+
+def _dump(obj) -> dict:
+    return obj.model_dump() if hasattr(obj, "model_dump") else obj.dict()
+
+
+def validate(result, model):
+    """Coerce what ``run()`` returned into a ``model`` instance, or raise."""
+    if isinstance(result, model):
+        return result
+    if isinstance(result, dict):
+        return model(**result)
+    text = getattr(result, "response", result)
+    if isinstance(text, str):
+        data = json.loads(text)
+        return model(**data)
+    raise TypeError(f"expected {model.__name__}, got {type(result).__name__}")
+
+
+def _classify(agent, model, message: str, retries: int, backoff: float) -> Tuple[dict, int]:
+    for attempt in range(retries + 1):
+        try:
+            return _dump(validate(agent.run(message), model)), attempt + 1
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+
+
+class _Meter:
+    """Live rows/sec on one console line: recent rate and run average."""
+
+    def __init__(self, every: float, stream=None):
+        self.every = every
+        self.stream = stream or sys.stderr
+        self.start = self._last = time.perf_counter()
+        self._last_done = 0
+
+    def tick(self, report: BatchReport, in_flight: int, force: bool = False):
+        now = time.perf_counter()
+        if not self.every or (not force and now - self._last < self.every):
+            return
+        done = report.ok + report.failed
+        recent = (done - self._last_done) / max(now - self._last, 1e-9)
+        average = done / max(now - self.start, 1e-9)
+        self._last, self._last_done = now, done
+        print(f"\r  {report.skipped + done:>9,} rows  {recent:>7.1f} rows/s now  "
+              f"{average:>7.1f} avg  {report.failed} failed  {in_flight} in flight ",
+              end="", file=self.stream, flush=True)
+
+
+def run_batch(agent, input_path: str, output_path: str, model=None, text_field: str = "text",
+              template: Optional[str] = None, id_field: Optional[str] = None,
+              keep: Sequence[str] = (), concurrency: int = 8, retries: int = 2,
+              backoff: float = 1.0, checkpoint_path: Optional[str] = None,
+              dead_letter_path: Optional[str] = None, checkpoint_every: int = 500,
+              checkpoint_interval: float = 10.0, progress_every: float = 1.0) -> BatchReport:
+    """Classify every row of ``input_path`` with ``agent``; resumable.
+
+    The message for a row is ``row[text_field]``, or ``template.format_map(row)``
+    when a template is given. Output records hold the row number, the row id
+    (``row[id_field]`` or the row number), the ``keep`` input columns and the
+    model's fields. ``model`` defaults to ``agent.response_model``.
+    """
+    model = model or getattr(agent, "response_model", None)
+    if model is None:
+        raise ValueError("agent has no response_model; pass model=")
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint.json"
+    dead_letter_path = dead_letter_path or os.path.splitext(output_path)[0] + ".failed.jsonl"
+
+    ckpt = Checkpoint(checkpoint_path)
+    source = os.path.abspath(input_path)
+    if ckpt.input not in (None, source):
+        raise ValueError(f"{checkpoint_path} belongs to {ckpt.input}; "
+                         f"delete it or choose another output")
+    ckpt.input = source
+    out = open_writer(output_path, ckpt.positions["output"])
+    dead = JSONLWriter(dead_letter_path, ckpt.positions["dead_letter"])
+    report = BatchReport()
+    meter = _Meter(progress_every)
+    since_commit, last_commit = 0, time.perf_counter()
+    committed = [0, 0]              # report.ok / report.failed at the last commit
+
+    def commit():
+        ckpt.positions = {"output": out.commit(), "dead_letter": dead.commit()}
+        ckpt.counts = {"ok": ckpt.counts["ok"] + report.ok - committed[0],
+                       "failed": ckpt.counts["failed"] + report.failed - committed[1]}
+        committed[:] = [report.ok, report.failed]
+        ckpt.save()
+
+    def record(fut, row_no, row_id, row, message):
+        nonlocal since_commit
+        try:
+            fields, attempts = fut.result()
+            out.write({"row": row_no, "id": row_id, **{k: row.get(k) for k in keep}, **fields})
+            report.ok += 1
+        except Exception as e:
+            dead.write({"row": row_no, "id": row_id, **row, "_message": message,
+                        "_error": f"{type(e).__name__}: {e}"})
+            report.failed += 1
+        ckpt.add(row_no)
+        since_commit += 1
+
+    start = time.perf_counter()
+    pending: Dict[Any, tuple] = {}
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    try:
+        for row_no, row in enumerate(iter_rows(input_path)):
+            if row_no in ckpt:
+                report.skipped += 1
+                continue
+            row_id = row.get(id_field, row_no) if id_field else row_no
+            message = template.format_map(row) if template else str(row.get(text_field) or "")
+            if not message.strip():
+                dead.write({"row": row_no, "id": row_id, **row, "_error": "empty input"})
+                report.failed += 1
+                ckpt.add(row_no)
+                continue
+            while len(pending) >= 2 * concurrency:
+                finished, _ = wait(pending, timeout=progress_every or None,
+                                   return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    record(fut, *pending.pop(fut))
+                meter.tick(report, len(pending))
+            pending[pool.submit(_classify, agent, model, message, retries, backoff)] = (
+                row_no, row_id, row, message)
+            if since_commit >= checkpoint_every or (
+                    checkpoint_interval and time.perf_counter() - last_commit >= checkpoint_interval):
+                commit()
+                since_commit, last_commit = 0, time.perf_counter()
+        while pending:
+            finished, _ = wait(pending, timeout=progress_every or None, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                record(fut, *pending.pop(fut))
+            meter.tick(report, len(pending))
+    finally:
+        # Also on Ctrl-C / errors: keep what finished, drop what didn't start.
+        for fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=False)
+        commit()
+        out.close()
+        dead.close()
+        report.elapsed = time.perf_counter() - start
+        meter.tick(report, 0, force=True)
+        if meter.every:
+            print(file=meter.stream)
+    report.total_ok, report.total_failed = ckpt.counts["ok"], ckpt.counts["failed"]
+    return report
+
+
+# ── self-check ────────────────────────────────────────────────────────────────
+class _CheckAgent:
+    """Offline agent for :func:`check_resume`: fails every message containing "fail"."""
+
+    def run(self, message: str):
+        if "fail" in message:
+            raise ValueError("unparseable")
+        return {"label": "neutral", "score": 0.5}
+
+
+def check_resume() -> List[str]:
+    """Run a job, then resume it twice with nothing left to do; returns failures.
+
+    Before the first resume, both files get a partial row appended, as if the
+    job had crashed after writing but before checkpointing. The resumes must
+    cut that off and otherwise leave both files byte for byte as the first
+    run wrote them, and the checkpoint must record their real sizes.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = os.path.join(tmp, "in.jsonl"), os.path.join(tmp, "out.jsonl")
+        dead = os.path.splitext(out)[0] + ".failed.jsonl"
+        with open(src, "w", encoding="utf-8") as f:
+            for i in range(20):
+                f.write(json.dumps({"id": i, "text": f"row {i} {'fail' if i % 5 == 0 else 'ok'}"}) + "\n")
+        snapshots = []
+        for run in range(3):
+            report = run_batch(_CheckAgent(), src, out, model=Sentiment, retries=0,
+                               progress_every=0)
+            if run and (report.ok or report.failed or report.skipped != 20):
+                failures.append(f"resume {run}: expected 20 skipped, got {report.summary()}")
+            with open(out, "rb") as f_out, open(dead, "rb") as f_dead:
+                snapshots.append((f_out.read(), f_dead.read()))
+            with open(out + ".checkpoint.json") as f:
+                positions = json.load(f)["positions"]
+            sizes = {"output": os.path.getsize(out), "dead_letter": os.path.getsize(dead)}
+            if positions != sizes:
+                failures.append(f"run {run}: checkpoint positions {positions} != file sizes {sizes}")
+            if run == 0:
+                for path in (out, dead):
+                    with open(path, "ab") as f:
+                        f.write(b'{"row": 99, "uncommitted": tr')
+        output, dead_rows = snapshots[0]
+        if len(output.splitlines()) != 16 or len(dead_rows.splitlines()) != 4:
+            failures.append(f"first run wrote {len(output.splitlines())} results and "
+                            f"{len(dead_rows.splitlines())} dead letters, expected 16 and 4")
+        for run, snapshot in enumerate(snapshots[1:], 1):
+            if snapshot != snapshots[0]:
+                failures.append(f"resume {run} changed the output files")
+        for line in dead_rows.splitlines():
+            try:
+                json.loads(line)
+            except ValueError:
+                failures.append(f"corrupt dead-letter line {line[:40]!r}")
+    return failures
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+_REVIEWS = {
+    "positive": ["Great product, works perfectly!", "Arrived early and the quality is excellent.",
+                 "Best purchase this year, highly recommend."],
+    "negative": ["Broke after two days. Very disappointed.", "Terrible support, still no refund.",
+                 "The size was wrong and the fabric feels cheap."],
+    "neutral": ["It does what it says.", "Delivery took a week, product is okay.",
+                "Average quality for the price."],
+}
+
+
+def write_sample(path: str, n: int, seed: int = 0):
+    """Write ``n`` synthetic reviews (``id,review``) to try the runner with."""
+    rng = random.Random(seed)
+    pool = [text for texts in _REVIEWS.values() for text in texts]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "review"])
+        for i in range(n):
+            writer.writerow([f"R{i:07d}", f"{rng.choice(pool)} (order #{rng.randint(1000, 99999)})"])
+
+
+def _load_model(spec: str):
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classify a CSV/JSONL file with a structured-output agent.")
+    parser.add_argument("input", nargs="?", help=".csv, .tsv or .jsonl")
+    parser.add_argument("output", nargs="?",
+                        help=".jsonl, or .parquet (a directory of parts; needs pyarrow)")
+    parser.add_argument("--text-field", default="review", help="column holding the text (default: review)")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--template", help='message template over the row, e.g. "{title}: {review}"')
+    parser.add_argument("--keep", default="", help="comma-separated input columns to copy to the output")
+    parser.add_argument("--model", help="response model as module:Class (default: Sentiment)")
+    parser.add_argument("--agent-id", help="use an existing agent instead of creating one")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--checkpoint-every", type=int, default=500)
+    parser.add_argument("--throttle-db", metavar="PATH",
+                        help="share adaptive rate limits with other jobs through this SQLite file")
+    parser.add_argument("--stub", action="store_true", help="classify with an offline stub agent")
+    parser.add_argument("--sample", type=int, metavar="N",
+                        help="first write N synthetic reviews to INPUT (if it doesn't exist)")
+    parser.add_argument("--check", action="store_true",
+                        help="offline self-check: resuming a finished job leaves its files intact")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = check_resume()
+        print(f"Batch resume check: {'passed' if not failures else f'{len(failures)} failure(s)'}")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        return 1 if failures else 0
+    if not args.input or not args.output:
+        parser.error("input and output are required")
+
+    if args.sample and not os.path.exists(args.input):
+        write_sample(args.input, args.sample)
+        print(f"Wrote {args.sample} sample reviews to {args.input}")
+    model = _load_model(args.model) if args.model else Sentiment
+
+    if args.stub:
+        from lyzr_kit.stub import StubStudio
+        studio = StubStudio()
+    else:
+        if not os.getenv("LYZR_API_KEY"):
+            print("ERROR: LYZR_API_KEY not set (or use --stub)")
+            return 1
+        from lyzr import Studio
+        studio = Studio(api_key=os.environ["LYZR_API_KEY"])
+
+    created = None
+    if args.agent_id:
+        agent = studio.get_agent(args.agent_id)
+    else:
+        agent = created = studio.create_agent(
+            name="batch-classifier", provider=MODEL, role="analyst",
+            goal=f"classify text into {model.__name__}",
+            instructions="Classify the text. Always fill all fields.", response_model=model)
+    if args.throttle_db:
+        from lyzr_kit.throttle import SQLiteState, Throttle
+        agent = Throttle(state=SQLiteState(args.throttle_db)).wrap(agent)
+    try:
+        report = run_batch(agent, args.input, args.output, model=model,
+                           text_field=args.text_field, template=args.template,
+                           id_field=args.id_field,
+                           keep=[k.strip() for k in args.keep.split(",") if k.strip()],
+                           concurrency=args.concurrency, retries=args.retries,
+                           checkpoint_every=args.checkpoint_every)
+    finally:
+        if created is not None and not args.stub:
+            created.delete()
+    print(report.summary())
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
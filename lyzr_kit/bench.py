@@ -0,0 +1,350 @@
+"""Latency and throughput benchmarks for agent.run, streaming, tools and KBs.
+
+Each scenario runs N iterations at a given concurrency and reports
+p50/p95/p99 for every metric it records. Results are written as JSON; pass
+``--compare`` with an earlier result file to flag regressions.
+
+    python -m lyzr_kit.bench --backend stub                     # offline
+    LYZR_API_KEY=sk-... python -m lyzr_kit.bench -n 20 -c 4 --out bench.json
+    python -m lyzr_kit.bench --backend stub --compare bench.json
+
+Scenarios: run, stream, structured, tools, memory, kb_query.
+"""
+
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+MODEL = "openai/gpt-4o-mini"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+@dataclass
+class Sample:
+    """What one iteration measured. ``metrics`` maps name → value (or values)."""
+    metrics: Dict[str, List[float]] = field(default_factory=dict)
+
+    def add(self, name: str, value: float):
+        self.metrics.setdefault(name, []).append(value)
+
+
+@dataclass
+class Scenario:
+    name: str
+    setup: Callable[[object], object]            # studio → state (e.g. an agent)
+    step: Callable[[object, int, Sample], None]  # state, iteration, sample
+
+
+# ── scenarios ─────────────────────────────────────────────────────────────────
+
+def _plain_agent(studio, name="bench-run", **kwargs):
+    return studio.create_agent(name=name, provider=MODEL, role="assistant",
+                               goal="answer questions", instructions="Be very brief.",
+                               **kwargs)
+
+
+def _timed(sample: Sample, fn):
+    start = time.perf_counter()
+    out = fn()
+    sample.add("latency", time.perf_counter() - start)
+    return out
+
+
+def _run_step(agent, i, sample):
+    _timed(sample, lambda: agent.run("Say hi in three words."))
+
+
+def _stream_step(agent, i, sample):
+    start = time.perf_counter()
+    last = None
+    chunks = 0
+    for chunk in agent.run("Count from one to ten in words.", stream=True):
+        now = time.perf_counter()
+        if not getattr(chunk, "content", ""):
+            continue
+        if last is None:
+            sample.add("ttft", now - start)
+        else:
+            sample.add("inter_chunk", now - last)
+        last = now
+        chunks += 1
+    total = time.perf_counter() - start
+    sample.add("latency", total)
+    if total > 0:
+        sample.add("chunks_per_sec", chunks / total)
+
+
+def _structured_setup(studio):
+    from pydantic import BaseModel, Field
+
+    class Sentiment(BaseModel):
+        label: str = Field(description="Sentiment label: positive, negative, or neutral")
+        score: float = Field(description="Confidence score between 0.0 and 1.0")
+
+    return _plain_agent(studio, "bench-struct", response_model=Sentiment)
+
+
+def _structured_step(agent, i, sample):
+    _timed(sample, lambda: agent.run("Great product!"))
+
+
+ORDERS = {
+    "ORD-1001": "shipped via FedEx (tracking: FX123456)",
+    "ORD-1002": "processing via UPS (tracking: UP789012)",
+}
+
+
+def double(n: int) -> str:
+    """Double a number and return the result as a string."""
+    return str(n * 2)
+
+
+def lookup_order(order_id: str) -> str:
+    """Look up a customer order by order ID (format ORD-XXXX) and return its status."""
+    return ORDERS.get(order_id.upper(), f"Order {order_id} not found.")
+
+
+def _tools_setup(studio):
+    agent = _plain_agent(studio, "bench-tools")
+    agent.add_tool(double)
+    agent.add_tool(lookup_order)
+    return agent
+
+
+def _tools_step(agent, i, sample):
+    message = f"Double {i + 1}." if i % 2 == 0 else "What is the status of ORD-1001?"
+    _timed(sample, lambda: agent.run(message))
+
+
+def _memory_setup(studio):
+    agent = _plain_agent(studio, "bench-memory")
+    agent.add_memory(max_messages=5)
+    return agent
+
+
+def _memory_step(agent, i, sample):
+    session = str(uuid.uuid4())
+    _timed(sample, lambda: agent.run("My name is Val.", session_id=session))
+    _timed(sample, lambda: agent.run("What is my name?", session_id=session))
+
+
+def _kb_setup(studio):
+    from lyzr_kit.kb import wait_for_indexed
+    kb = studio.create_knowledge_base(name="bench_kb")
+    kb.add_text(text="The sky is blue. Water is wet. Grass is green.", source="facts")
+    wait_for_indexed(kb, probe="What color is the sky?")
+    return kb
+
+
+def _kb_step(kb, i, sample):
+    _timed(sample, lambda: kb.query("What color is the sky?", top_k=2))
+
+
+SCENARIOS = {
+    s.name: s for s in [
+        Scenario("run", _plain_agent, _run_step),
+        Scenario("stream", lambda st: _plain_agent(st, "bench-stream"), _stream_step),
+        Scenario("structured", _structured_setup, _structured_step),
+        Scenario("tools", _tools_setup, _tools_step),
+        Scenario("memory", _memory_setup, _memory_step),
+        Scenario("kb_query", _kb_setup, _kb_step),
+    ]
+}
+
+
+# ── runner ────────────────────────────────────────────────────────────────────
+
+def run_scenario(studio, scenario: Scenario, iterations: int, concurrency: int,
+                 warmup: int = 1) -> Dict:
+    """Run ``scenario`` and return its summary dict (JSON-serialisable)."""
+    state = scenario.setup(studio)
+    try:
+        for i in range(warmup):
+            scenario.step(state, i, Sample())
+
+        merged = Sample()
+        errors: List[str] = []
+        lock = threading.Lock()
+
+        def one(i):
+            sample = Sample()
+            try:
+                scenario.step(state, i, sample)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                return
+            with lock:
+                for name, values in sample.metrics.items():
+                    merged.metrics.setdefault(name, []).extend(values)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            list(pool.map(one, range(iterations)))
+        wall = time.perf_counter() - start
+    finally:
+        delete = getattr(state, "delete", None)
+        if delete is not None:
+            try:
+                delete()
+            except Exception:
+                pass
+
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "wall_time": wall,
+        "throughput": (iterations - len(errors)) / wall if wall > 0 else 0.0,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "metrics": {name: summarize(v) for name, v in sorted(merged.metrics.items())},
+    }
+
+
+def run_suite(studio, names: List[str], iterations: int, concurrency: int,
+              backend: str) -> Dict:
+    result = {
+        "meta": {
+            "backend": backend,
+            "model": MODEL,
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        print(f"  {name:<11} n={iterations} c={concurrency} ...", end="", flush=True)
+        try:
+            summary = run_scenario(studio, SCENARIOS[name], iterations, concurrency)
+        except Exception as e:
+            # setup failed (e.g. pydantic not installed) — record and move on
+            result["scenarios"][name] = {"skipped": f"{type(e).__name__}: {e}"}
+            print(f" skipped: {type(e).__name__}: {e}")
+            continue
+        result["scenarios"][name] = summary
+        lat = summary["metrics"].get("latency", {})
+        print(f" p50 {lat.get('p50', 0) * 1000:7.1f}ms  p95 {lat.get('p95', 0) * 1000:7.1f}ms"
+              f"  {summary['throughput']:6.1f}/s  errors {summary['errors']}")
+    return result
+
+
+# Metrics where bigger numbers are better; for everything else bigger is worse.
+HIGHER_IS_BETTER = {"chunks_per_sec"}
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.2,
+            stats=("p50", "p95")) -> List[str]:
+    """Return human-readable regressions of ``current`` against ``baseline``.
+
+    A stat regresses when it is worse than the baseline by more than
+    ``tolerance`` (0.2 = 20%). Scenarios or metrics missing on either side
+    are ignored.
+    """
+    regressions = []
+    for name, cur in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None or "skipped" in base or "skipped" in cur:
+            continue
+        if cur["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} → {cur['errors']}")
+        for metric, cur_stats in cur["metrics"].items():
+            base_stats = base["metrics"].get(metric)
+            if not base_stats:
+                continue
+            for stat in stats:
+                old, new = base_stats.get(stat), cur_stats.get(stat)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if metric in HIGHER_IS_BETTER:
+                    change = -change
+                if change > tolerance:
+                    regressions.append(f"{name}.{metric}.{stat}: {old:.4f} → {new:.4f} "
+                                       f"({change:+.0%} worse)")
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark lyzr agents.")
+    parser.add_argument("--backend", choices=["live", "stub"], default="live")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("-n", "--iterations", type=int, default=10)
+    parser.add_argument("-c", "--concurrency", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown before flagging (default 0.2)")
+    args = parser.parse_args(argv)
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    if args.backend == "stub":
+        from lyzr_kit.stub import StubStudio
+        studio = StubStudio()
+    else:
+        api_key = os.getenv("LYZR_API_KEY", "")
+        if not api_key:
+            print("ERROR: LYZR_API_KEY environment variable not set (or use --backend stub).")
+            return 1
+        from lyzr import Studio
+        studio = Studio(api_key=api_key)
+
+    print(f"\nLyzr ADK Benchmark — backend: {args.backend}, model: {MODEL}")
+    print("=" * 60)
+    result = run_suite(studio, names, args.iterations, args.concurrency, args.backend)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n✅ No regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
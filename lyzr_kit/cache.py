@@ -0,0 +1,238 @@
+"""TTL/LRU cache for specialist wrapper tools.
+
+FAQ-style questions ("what is your return window?") reach the specialists
+over and over, and each one is a full LLM round-trip. :func:`cached_tool`
+wraps a ``query -> answer`` tool so identical (normalised) questions are
+answered from a cache, while questions mentioning order IDs, tracking
+numbers, e-mails and the like always go to the agent.
+
+The in-process :class:`ResponseCache` does TTL expiry and LRU eviction under
+an entry count and memory bound. Give it a shared ``backend`` (SQLite for
+several workers on one host, Redis across hosts) and misses fall through to
+it, so workers share each other's hits.
+"""
+
+import abc
+import functools
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Pattern, Sequence, Tuple
+
+# Anything that makes an answer specific to one customer or moment in time.
+VOLATILE_PATTERNS: Tuple[Pattern, ...] = (
+    re.compile(r"\b[A-Z]{2,5}-?\d{3,}\b", re.IGNORECASE),        # ORD-1001, FX123456
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"),                      # e-mail
+    re.compile(r"\+?\d[\d\s().-]{7,}\d"),                        # phone numbers
+    re.compile(r"\b\d{4}-\d{2}-\d{2}\b"),                        # dates
+    re.compile(r"\$\s?\d"),                                      # amounts
+    re.compile(r"\b(my|mine|i|i'm|i've|me)\b.*\b(order|account|card|charg\w*|payment|refund)\b",
+               re.IGNORECASE),                                   # "my order", "I was charged"
+)
+
+
+def normalize(query: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s'-]", " ", query.lower())
+    return " ".join(text.split())
+
+
+def is_volatile(query: str, patterns: Sequence[Pattern] = VOLATILE_PATTERNS) -> bool:
+    return any(p.search(query) for p in patterns)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    shared_hits: int = 0      # misses locally, answered by the shared backend
+    misses: int = 0
+    bypassed: int = 0         # volatile queries that skipped the cache
+    evictions: int = 0        # LRU / memory-bound evictions
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.shared_hits + self.misses
+        return (self.hits + self.shared_hits) / lookups if lookups else 0.0
+
+
+class CacheBackend(abc.ABC):
+    """Shared store interface. Implementations must be safe across workers."""
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None:
+        ...
+
+
+class SQLiteBackend(CacheBackend):
+    """Shared cache for worker processes on one host, in a single SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS cache "
+                       "(key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT value, expires FROM cache WHERE key = ?",
+                                   (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl):
+        with self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                       (key, value, time.time() + ttl))
+            # Opportunistic purge so the file doesn't grow without bound.
+            db.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+
+class RedisBackend(CacheBackend):
+    """Shared cache across hosts. Needs ``pip install redis``."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "lyzr:resp:"):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self._redis.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._redis.set(self.prefix + key, value.encode("utf-8"), ex=max(1, int(ttl)))
+
+
+class ResponseCache:
+    """Thread-safe TTL + LRU cache keyed on ``(specialist, normalised query)``."""
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 10_000,
+                 max_bytes: int = 32 * 1024 * 1024, backend: Optional[CacheBackend] = None,
+                 volatile_patterns: Sequence[Pattern] = VOLATILE_PATTERNS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.volatile_patterns = volatile_patterns
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(specialist: str, query: str) -> str:
+        digest = hashlib.sha256(normalize(query).encode("utf-8")).hexdigest()[:32]
+        return f"{specialist}:{digest}"
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _drop(self, key: str):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.stats.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def _put_local(self, key: str, value: str, ttl: float):
+        size = len(key) + len(value.encode("utf-8")) + 64   # rough per-entry overhead
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + ttl, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.stats.evictions += 1
+
+    def get_or_call(self, specialist: str, query: str, call: Callable[[str], str]) -> str:
+        """Return a cached answer for ``query`` or compute it with ``call``."""
+        if is_volatile(query, self.volatile_patterns):
+            with self._lock:
+                self.stats.bypassed += 1
+            return call(query)
+
+        key = self.key(specialist, query)
+        value = self._get_local(key)
+        if value is not None:
+            with self._lock:
+                self.stats.hits += 1
+            return value
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception:
+                value = None        # a flaky shared cache must never fail the tool
+            if value is not None:
+                self._put_local(key, value, self.ttl)
+                with self._lock:
+                    self.stats.shared_hits += 1
+                return value
+
+        with self._lock:
+            self.stats.misses += 1
+        value = call(query)
+        if value:
+            self._put_local(key, value, self.ttl)
+            if self.backend is not None:
+                try:
+                    self.backend.set(key, value, self.ttl)
+                except Exception:
+                    pass
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+
+def cached_tool(cache: ResponseCache, specialist: Optional[str] = None):
+    """Decorator for ``query -> answer`` wrapper tools.
+
+    ``functools.wraps`` keeps the name, docstring and signature intact —
+    ``add_tool()`` builds the tool description the manager routes on from
+    exactly those.
+    """
+    def decorate(fn: Callable[[str], str]) -> Callable[[str], str]:
+        name = specialist or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(query: str) -> str:
+            return cache.get_or_call(name, query, fn)
+        return wrapper
+    return decorate
@@ -0,0 +1,259 @@
+"""Cleanup of Studio resources created by the validation scripts.
+
+Two parts:
+
+* :class:`Registry` collects agents, KBs, contexts and RAI policies as tests
+  create them (thread-safe) and :func:`delete_all` removes them concurrently,
+  retrying transient failures.
+* :func:`sweep_orphans` lists what exists in the account and deletes anything
+  whose name matches a test pattern and is older than a cutoff — the leftovers
+  of runs that crashed or never cleaned up.
+
+Run the sweeper from the command line with::
+
+    LYZR_API_KEY=sk-... python -m lyzr_kit.cleanup --older-than 6h [--dry-run]
+"""
+
+import fnmatch
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Deletion order matters a little: agents reference KBs, contexts and
+# policies, so they go first.
+KINDS = ("agents", "kbs", "contexts", "policies")
+
+# Names used by validate.py ("val-basic", "val_kb_test", ...) and
+# validate_bonus.py ("WA Test Agent", "Order Specialist Test", ...).
+TEST_NAME_PATTERNS = ("val-*", "val_*", "* Test", "* Test *")
+
+_SINGULAR = {"agents": "agent", "kbs": "KB", "contexts": "context", "policies": "policy"}
+
+# Studio listing calls per resource kind. Missing methods are skipped, so an
+# older SDK without e.g. list_rai_policies() still sweeps the rest.
+_LISTERS = {
+    "agents": "list_agents",
+    "kbs": "list_knowledge_bases",
+    "contexts": "list_contexts",
+    "policies": "list_rai_policies",
+}
+
+
+@dataclass
+class CleanupReport:
+    deleted: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    matched: int = 0                        # sweep only: orphans found
+    errors: List[Tuple[str, str, str]] = field(default_factory=list)  # (kind, id, error)
+
+    def __str__(self):
+        extra = f", matched {self.matched}" if self.matched else ""
+        return (f"deleted {self.deleted}, failed {self.failed}{extra} "
+                f"in {self.elapsed:.2f}s")
+
+
+class Registry:
+    """Thread-safe record of resources to delete at the end of a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[str, list] = {k: [] for k in KINDS}
+
+    def add(self, kind: str, obj):
+        if kind not in self._items:
+            raise ValueError(f"unknown resource kind {kind!r}; expected one of {KINDS}")
+        with self._lock:
+            self._items[kind].append(obj)
+        return obj
+
+    def __getitem__(self, kind: str) -> list:
+        with self._lock:
+            return list(self._items[kind])
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(v) for v in self._items.values())
+
+    def drain(self) -> Dict[str, list]:
+        """Return everything registered so far and empty the registry."""
+        with self._lock:
+            items, self._items = self._items, {k: [] for k in KINDS}
+        return items
+
+
+def _is_gone(err: Exception) -> bool:
+    msg = str(err).lower()
+    return "404" in msg or "not found" in msg
+
+
+def _delete_one(kind: str, obj, retries: int, backoff: float) -> Optional[str]:
+    """Delete ``obj``; return None on success or the last error message."""
+    last = ""
+    for attempt in range(retries + 1):
+        try:
+            obj.delete()
+            return None
+        except Exception as e:
+            if _is_gone(e):
+                return None       # already deleted — that's what we wanted
+            last = str(e)
+        if attempt < retries:
+            time.sleep(random.uniform(0.5, 1.0) * backoff * (2 ** attempt))
+    return last or "delete failed"
+
+
+def _delete_many(items: Iterable[Tuple[str, object]], workers: int, retries: int,
+                 backoff: float, report: CleanupReport, verbose: bool):
+    items = list(items)
+    if not items:
+        return
+    # All objects share their Studio's HTTP client, so the pool below reuses
+    # its keep-alive connections rather than opening one per delete.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(kind, obj, pool.submit(_delete_one, kind, obj, retries, backoff))
+                   for kind, obj in items]
+        for kind, obj, fut in futures:
+            err = fut.result()
+            obj_id = getattr(obj, "id", "?")
+            if err is None:
+                report.deleted += 1
+                if verbose:
+                    print(f"  Deleted {_SINGULAR[kind]}: {obj_id}")
+            else:
+                report.failed += 1
+                report.errors.append((kind, obj_id, err))
+                if verbose:
+                    print(f"  Warning: could not delete {_SINGULAR[kind]} {obj_id}: {err}")
+
+
+def delete_all(registry: Registry, workers: int = 8, retries: int = 2,
+               backoff: float = 0.5, verbose: bool = True) -> CleanupReport:
+    """Delete every resource in ``registry`` concurrently.
+
+    Agents are deleted first, then KBs, contexts and policies together.
+    Failures are retried ``retries`` times with jittered exponential backoff;
+    a 404 counts as deleted.
+    """
+    start = time.perf_counter()
+    report = CleanupReport()
+    items = registry.drain()
+    _delete_many((("agents", o) for o in items["agents"]),
+                 workers, retries, backoff, report, verbose)
+    _delete_many(((k, o) for k in KINDS[1:] for o in items[k]),
+                 workers, retries, backoff, report, verbose)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _created_at(obj) -> Optional[datetime]:
+    for attr in ("created_at", "createdAt", "created"):
+        value = getattr(obj, attr, None)
+        if value is None and isinstance(obj, dict):
+            value = obj.get(attr)
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def find_orphans(studio, older_than: timedelta = timedelta(hours=1),
+                 patterns: Sequence[str] = TEST_NAME_PATTERNS,
+                 include_undated: bool = False) -> List[Tuple[str, object]]:
+    """Return ``(kind, obj)`` for test resources older than ``older_than``.
+
+    Resources without a creation timestamp are only included when
+    ``include_undated`` is set, so a sweep can't delete something a run in
+    progress has just created.
+    """
+    cutoff = datetime.now(timezone.utc) - older_than
+    found = []
+    for kind in KINDS:
+        lister = getattr(studio, _LISTERS[kind], None)
+        if lister is None:
+            continue
+        for obj in lister() or []:
+            name = getattr(obj, "name", "") or ""
+            if not any(fnmatch.fnmatchcase(name, p) for p in patterns):
+                continue
+            created = _created_at(obj)
+            if created is None and not include_undated:
+                continue
+            if created is not None and created > cutoff:
+                continue
+            found.append((kind, obj))
+    return found
+
+
+def sweep_orphans(studio, older_than: timedelta = timedelta(hours=1),
+                  patterns: Sequence[str] = TEST_NAME_PATTERNS,
+                  include_undated: bool = False, workers: int = 8,
+                  retries: int = 2, dry_run: bool = False,
+                  verbose: bool = True) -> CleanupReport:
+    """Delete leftover test resources; see :func:`find_orphans` for matching."""
+    start = time.perf_counter()
+    report = CleanupReport()
+    orphans = find_orphans(studio, older_than, patterns, include_undated)
+    report.matched = len(orphans)
+    if dry_run:
+        for kind, obj in orphans:
+            print(f"  Would delete {_SINGULAR[kind]}: {getattr(obj, 'name', '')} ({getattr(obj, 'id', '?')})")
+    else:
+        agents = [(k, o) for k, o in orphans if k == "agents"]
+        others = [(k, o) for k, o in orphans if k != "agents"]
+        _delete_many(agents, workers, retries, 0.5, report, verbose)
+        _delete_many(others, workers, retries, 0.5, report, verbose)
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _parse_age(text: str) -> timedelta:
+    units = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+    if text and text[-1] in units:
+        return timedelta(**{units[text[-1]]: float(text[:-1])})
+    return timedelta(hours=float(text))
+
+
+def main(argv=None):
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Delete orphaned test resources from Lyzr Studio.")
+    parser.add_argument("--older-than", default="1h", type=_parse_age,
+                        help="minimum age, e.g. 30m, 6h, 2d (default: 1h)")
+    parser.add_argument("--pattern", action="append",
+                        help=f"name glob to match (repeatable; default: {', '.join(TEST_NAME_PATTERNS)})")
+    parser.add_argument("--include-undated", action="store_true",
+                        help="also delete matches that have no creation timestamp")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="list matches without deleting")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("LYZR_API_KEY", "")
+    if not api_key:
+        print("ERROR: LYZR_API_KEY environment variable not set.")
+        return 1
+
+    from lyzr import Studio
+    studio = Studio(api_key=api_key)
+    report = sweep_orphans(studio, args.older_than, args.pattern or TEST_NAME_PATTERNS,
+                           args.include_undated, args.workers, dry_run=args.dry_run)
+    print(f"Sweep: {report}")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
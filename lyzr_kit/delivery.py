@@ -0,0 +1,296 @@
+"""Sentence-level incremental delivery of streamed replies to WhatsApp.
+
+``send_whatsapp_reply`` used to wait for the whole ``agent.run()``. With
+``stream=True`` the first tokens arrive much sooner (lesson 11), so
+:func:`deliver_stream` consumes ``AgentStream`` chunks and sends each
+complete sentence or paragraph as soon as it is ready. The customer sees the
+first message after roughly *time to first sentence*, not total generation
+time.
+
+Sizing and pacing:
+
+* ``min_chars`` — don't send fragments; short sentences are merged;
+* ``max_chars`` — split long runs at the last sentence/word boundary;
+* ``flush_after`` — if text has been waiting this long with no sentence end,
+  send what we have (at a word boundary);
+* outbound rate limits — while a recipient is rate-limited, text keeps
+  accumulating and goes out as one larger message instead of being delayed
+  piece by piece.
+
+Note: streaming is incompatible with RAI policies on the agent (lesson 11),
+so use it with agents that don't have one.
+"""
+
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+# End of a sentence (., !, ? or … possibly followed by closing quotes/brackets)
+# and then whitespace, or a blank line (paragraph break).
+_BOUNDARY = re.compile(r"""(?:[.!?…]+["')\]]*\s+|\n\s*\n)""")
+
+
+class SentenceChunker:
+    """Accumulates streamed text and cuts it into sendable messages."""
+
+    def __init__(self, min_chars: int = 40, max_chars: int = 1000):
+        if min_chars > max_chars:
+            raise ValueError("min_chars must be <= max_chars")
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        return self.ready()
+
+    def ready(self) -> List[str]:
+        """Messages that can go out now (complete sentences ≥ ``min_chars``)."""
+        out = []
+        while True:
+            cut = self._cut()
+            if cut is None:
+                return out
+            out.append(self._take(cut))
+
+    def _cut(self) -> Optional[int]:
+        last = None
+        for m in _BOUNDARY.finditer(self.buffer):
+            if m.end() > self.max_chars:
+                break
+            # Keep extending while the next boundary still fits, so a burst
+            # of short sentences becomes one message, not several.
+            last = m.end()
+        if last is not None and last >= self.min_chars:
+            return last
+        if len(self.buffer) > self.max_chars:
+            return self._word_cut(self.max_chars)
+        return None
+
+    def _word_cut(self, limit: int) -> int:
+        space = self.buffer.rfind(" ", 0, limit)
+        return space + 1 if space > 0 else limit
+
+    def _take(self, n: int) -> str:
+        piece, self.buffer = self.buffer[:n], self.buffer[n:]
+        return piece.strip()
+
+    def flush_partial(self) -> Optional[str]:
+        """Deadline flush: send up to the last word boundary, if that's ≥ ``min_chars``."""
+        cut = self._word_cut(len(self.buffer))
+        if len(self.buffer[:cut].strip()) < self.min_chars:
+            return None
+        return self._take(cut)
+
+    def flush(self) -> Optional[str]:
+        piece = self.buffer.strip()
+        self.buffer = ""
+        return piece or None
+
+
+class RateLimiter:
+    """Token buckets for outbound messages: one global, one per recipient.
+
+    Defaults are conservative placeholders — set them to your WhatsApp
+    Business number's actual throughput tier.
+    """
+
+    def __init__(self, global_per_sec: float = 80.0, per_recipient_per_sec: float = 1.0,
+                 recipient_burst: int = 3):
+        self.global_rate = global_per_sec
+        self.recipient_rate = per_recipient_per_sec
+        self.recipient_burst = recipient_burst
+        self._global = [float(max(1, int(global_per_sec))), time.monotonic()]
+        self._recipients: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _refill(bucket: list, rate: float, cap: float, now: float):
+        bucket[0] = min(cap, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+
+    def wait_time(self, recipient: str) -> float:
+        """Seconds until a message to ``recipient`` may be sent (0 = now)."""
+        now = time.monotonic()
+        with self._lock:
+            rb = self._recipients.setdefault(recipient, [float(self.recipient_burst), now])
+            self._refill(self._global, self.global_rate, max(1, int(self.global_rate)), now)
+            self._refill(rb, self.recipient_rate, self.recipient_burst, now)
+            need = max(0.0, 1 - self._global[0]) / self.global_rate
+            need = max(need, max(0.0, 1 - rb[0]) / self.recipient_rate)
+            return need
+
+    def acquire(self, recipient: str) -> bool:
+        """Take a token for ``recipient`` if one is available right now."""
+        now = time.monotonic()
+        with self._lock:
+            rb = self._recipients.setdefault(recipient, [float(self.recipient_burst), now])
+            self._refill(self._global, self.global_rate, max(1, int(self.global_rate)), now)
+            self._refill(rb, self.recipient_rate, self.recipient_burst, now)
+            if self._global[0] >= 1 and rb[0] >= 1:
+                self._global[0] -= 1
+                rb[0] -= 1
+                return True
+            return False
+
+
+@dataclass
+class DeliveryReport:
+    messages: List[str] = field(default_factory=list)
+    time_to_first_token: Optional[float] = None
+    time_to_first_sentence: Optional[float] = None    # first message handed to send()
+    total_time: float = 0.0
+    chunks: int = 0
+    deadline_flushes: int = 0
+    rate_limited_waits: int = 0      # times ready text was held back and merged
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.messages)
+
+
+_DONE = object()
+
+
+def _pack(text: str, min_chars: int, max_chars: int) -> List[str]:
+    """Split ``text`` into as few messages as fit ``max_chars``.
+
+    A tail shorter than ``min_chars`` is merged into the message before it,
+    or, when that would overflow ``max_chars``, the two are re-cut at an
+    earlier sentence boundary so neither is undersized.
+    """
+    merger = SentenceChunker(min_chars, max_chars)
+    pieces = [p for p in merger.feed(text + " ") + [merger.flush()] if p]
+    if len(pieces) < 2 or len(pieces[-1]) >= min_chars:
+        return pieces
+    joined = f"{pieces[-2]} {pieces[-1]}"
+    if len(joined) <= max_chars:
+        pieces[-2:] = [joined]
+        return pieces
+    cuts = [m.end() for m in _BOUNDARY.finditer(joined)
+            if min_chars <= len(joined[:m.end()].strip()) <= max_chars
+            and min_chars <= len(joined[m.end():].strip()) <= max_chars]
+    if cuts:
+        pieces[-2:] = [joined[:cuts[-1]].strip(), joined[cuts[-1]:].strip()]
+    return pieces
+
+
+def deliver_stream(
+    stream: Iterable,
+    to_number: str,
+    send: Callable[[str, str], object],
+    min_chars: int = 40,
+    max_chars: int = 1000,
+    flush_after: float = 2.0,
+    limiter: Optional[RateLimiter] = None,
+    started: Optional[float] = None,
+) -> DeliveryReport:
+    """Send ``stream`` (``AgentStream`` chunks or plain strings) sentence by sentence.
+
+    ``started`` is the ``time.monotonic()`` of the request (defaults to now)
+    and is the zero point for the reported latencies. The stream is read on
+    a helper thread so flush deadlines fire even while the model is silent.
+    """
+    start = time.monotonic() if started is None else started
+    report = DeliveryReport()
+    chunker = SentenceChunker(min_chars, max_chars)
+    inbox: "queue.Queue" = queue.Queue()
+    pending: List[str] = []          # ready messages held back by the rate limiter
+    held = False
+    waiting_since: Optional[float] = None
+
+    def pump():
+        try:
+            for chunk in stream:
+                inbox.put(getattr(chunk, "content", chunk))
+        except Exception as e:       # surface stream errors in the caller's thread
+            inbox.put(e)
+        inbox.put(_DONE)
+
+    threading.Thread(target=pump, daemon=True, name="stream-pump").start()
+
+    def emit(force: bool = False):
+        nonlocal held
+        if not pending:
+            return
+        if limiter is not None and not limiter.acquire(to_number):
+            if not force:
+                report.rate_limited_waits += not held
+                held = True
+                return
+            while not limiter.acquire(to_number):
+                time.sleep(limiter.wait_time(to_number))
+        # Merge everything that piled up while rate-limited into one message,
+        # re-splitting only if that would exceed max_chars.
+        pieces = _pack(" ".join(pending), min_chars, max_chars)
+        pending.clear()
+        held = False
+        for i, message in enumerate(pieces):
+            if i and limiter is not None:
+                while not limiter.acquire(to_number):
+                    time.sleep(limiter.wait_time(to_number))
+            send(to_number, message)
+            report.messages.append(message)
+            if report.time_to_first_sentence is None:
+                report.time_to_first_sentence = time.monotonic() - start
+
+    while True:
+        timeout = None
+        if waiting_since is not None:
+            timeout = max(0.0, waiting_since + flush_after - time.monotonic())
+        if pending and limiter is not None:
+            wait = limiter.wait_time(to_number)
+            timeout = wait if timeout is None else min(timeout, wait)
+        try:
+            item = inbox.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+
+        if item is _DONE:
+            break
+        if isinstance(item, Exception):
+            raise item
+        if item:
+            report.chunks += 1
+            if report.time_to_first_token is None:
+                report.time_to_first_token = time.monotonic() - start
+            pending.extend(chunker.feed(item))
+            if waiting_since is None and chunker.buffer.strip():
+                waiting_since = time.monotonic()
+            if not chunker.buffer.strip():
+                waiting_since = None
+        elif waiting_since is not None and time.monotonic() >= waiting_since + flush_after:
+            piece = chunker.flush_partial()
+            if piece:
+                pending.append(piece)
+                report.deadline_flushes += 1
+            waiting_since = time.monotonic() if chunker.buffer.strip() else None
+        emit()
+
+    tail = chunker.flush()
+    if tail:
+        pending.append(tail)
+    emit(force=True)
+    report.total_time = time.monotonic() - start
+    return report
+
+
+def streaming_handler(agent, send: Callable[[str, str], object], on_report=None, **options):
+    """A ``SessionDispatcher`` handler that streams replies out as they form.
+
+    Use it with a no-op dispatcher ``send``, since delivery happens here::
+
+        handle = streaming_handler(agent, MetaCloudSender(...))
+        SessionDispatcher(handle, lambda to, msg: None)
+    """
+    def handle(session_id: str, text: str) -> str:
+        started = time.monotonic()
+        report = deliver_stream(agent.run(text, session_id=session_id, stream=True),
+                                session_id, send, started=started, **options)
+        if on_report is not None:
+            on_report(report)
+        return report.text
+    return handle
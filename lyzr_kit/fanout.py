@@ -0,0 +1,105 @@
+"""Concurrent fan-out to specialist agents.
+
+A manager agent calls its tools one at a time, so a multi-domain question
+("cancel ORD-1002 and refund me") costs the sum of the specialist calls. The
+fix is to give the manager a single tool that takes one sub-question per
+specialist and runs them side by side with :func:`fan_out`; latency becomes
+that of the slowest specialist. Each specialist gets its own timeout, and a
+slow or failing one doesn't take the others' answers down with it.
+"""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+
+@dataclass
+class FanOutResult:
+    answers: Dict[str, str] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)   # specialist → error / "timed out"
+    latency: Dict[str, float] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors
+
+    def combined(self) -> str:
+        """One text block with each specialist's answer, noting any that failed."""
+        parts = [f"[{name}]\n{text}" for name, text in self.answers.items()]
+        for name, err in self.errors.items():
+            parts.append(f"[{name}]\n(no answer: {err} — tell the customer this part "
+                         f"will be followed up separately)")
+        return "\n\n".join(parts)
+
+
+def ask(agent) -> Callable[[str], str]:
+    """Adapt an agent into ``query -> answer text``."""
+    def call(query: str) -> str:
+        return agent.run(query).response
+    return call
+
+
+def fan_out(
+    queries: Dict[str, str],
+    specialists: Dict[str, Callable[[str], str]],
+    timeout: float = 60.0,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> FanOutResult:
+    """Send ``queries[name]`` to ``specialists[name]`` concurrently.
+
+    Empty queries are skipped. ``timeouts`` overrides ``timeout`` per
+    specialist; every deadline is measured from the start of the fan-out.
+    A timed-out call keeps running in the background (threads can't be
+    cancelled) but its result is discarded and it never touches the
+    returned :class:`FanOutResult`. Each call gets its own threads, so a
+    straggler never holds up a later fan-out.
+    """
+    timeouts = timeouts or {}
+    result = FanOutResult()
+    start = time.perf_counter()
+
+    def timed(fn, query):
+        t0 = time.perf_counter()
+        try:
+            return fn(query), None, time.perf_counter() - t0
+        except Exception as e:
+            return None, e, time.perf_counter() - t0
+
+    calls = {}
+    for name, query in queries.items():
+        if not query or not query.strip():
+            continue
+        if name not in specialists:
+            result.errors[name] = "unknown specialist"
+            continue
+        calls[name] = query
+    if not calls:
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="fanout")
+    # Run in a copy of the caller's context so tracing spans nest under it.
+    futures = {name: pool.submit(contextvars.copy_context().run, timed, specialists[name], query)
+               for name, query in calls.items()}
+    try:
+        for name, fut in futures.items():
+            remaining = timeouts.get(name, timeout) - (time.perf_counter() - start)
+            try:
+                answer, error, latency = fut.result(timeout=max(0.0, remaining))
+            except FutureTimeout:
+                result.errors[name] = f"timed out after {timeouts.get(name, timeout):g}s"
+                continue
+            result.latency[name] = latency
+            if error is None:
+                result.answers[name] = answer
+            else:
+                result.errors[name] = f"{type(error).__name__}: {error}"
+    finally:
+        # Don't wait for stragglers; their threads exit when their calls return.
+        pool.shutdown(wait=False)
+
+    result.elapsed = time.perf_counter() - start
+    return result
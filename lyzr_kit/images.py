@@ -0,0 +1,553 @@
+"""Concurrent image generation with a content-addressed on-disk cache.
+
+Lesson 12 generates one image at a time and waits on each. For batches of
+product-image variants, :class:`ImagePipeline` takes a list or generator of
+prompts and:
+
+* runs generation with **bounded concurrency per provider** (its own worker
+  pool per provider, optionally also under a :class:`lyzr_kit.throttle.Throttle`);
+* **streams downloads to disk** in chunks, hashing as it goes, so an image is
+  never held in memory whole;
+* **deduplicates** identical ``(provider, model, prompt, size)`` requests,
+  both within a batch (in flight) and across runs (the cache), and stores
+  each distinct image once under its SHA-256;
+* evicts least-recently-used images once the cache exceeds ``max_bytes``;
+* reports per-image latency (generate / download) and overall throughput.
+
+Results are yielded as they complete, so thousands of prompts can be fed
+from a generator with only ``max_pending`` in flight.
+
+    cache = ImageCache("~/.cache/lyzr_kit/images", max_bytes=2 << 30)
+    pipeline = ImagePipeline({"openai": agent_generator(studio, "dalle-3")}, cache,
+                             concurrency={"openai": 4})
+    for result in pipeline.run(prompts, provider="openai", model="dalle-3", out_dir="renders/"):
+        print(result.index, result.path, result.latency)
+
+    python -m lyzr_kit.images --stub --count 300      # local fake provider
+    python -m lyzr_kit.images prompts.txt --image-model dalle-3 --out renders/
+"""
+
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+from urllib.parse import urlsplit
+
+from lyzr_kit.bench import summarize
+
+CHUNK = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ImageRequest:
+    prompt: str
+    provider: str = "openai"
+    model: str = "dalle-3"
+    size: str = "1024x1024"
+
+    @property
+    def key(self) -> str:
+        """Cache key: identical requests map to the same image."""
+        raw = json.dumps([self.provider, self.model, self.prompt, self.size], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ImageResult:
+    index: int
+    request: ImageRequest
+    path: Optional[str] = None
+    digest: Optional[str] = None       # SHA-256 of the image bytes
+    size: int = 0
+    cached: bool = False               # served from the on-disk cache
+    deduped: bool = False              # shared a generation with an identical request in this run
+    generate_s: float = 0.0
+    download_s: float = 0.0
+    latency: float = 0.0               # picked up → ready, including waiting for a slot
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+# ── cache ─────────────────────────────────────────────────────────────────────
+class ImageCache:
+    """Images stored once by content hash; requests map to hashes; LRU eviction by size.
+
+    Layout: ``objects/ab/<sha256>.<ext>`` plus ``index.sqlite``.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 1 << 30):
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS requests (key TEXT PRIMARY KEY, digest TEXT, created REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS blobs "
+                       "(digest TEXT PRIMARY KEY, ext TEXT, size INTEGER, used REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS blobs_used ON blobs (used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}{ext}")
+
+    def lookup(self, key: str) -> Optional[tuple]:
+        """``(path, digest, size)`` for a cached request, refreshing its LRU time."""
+        with self._conn() as db:
+            row = db.execute("SELECT b.digest, b.ext, b.size FROM requests r JOIN blobs b "
+                             "ON r.digest = b.digest WHERE r.key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            path = self.path(row[0], row[1])
+            if not os.path.exists(path):       # removed behind our back
+                db.execute("DELETE FROM blobs WHERE digest = ?", (row[0],))
+                return None
+            db.execute("UPDATE blobs SET used = ? WHERE digest = ?", (time.time(), row[0]))
+            return path, row[0], row[2]
+
+    def store(self, key: str, chunks: Iterable[bytes], ext: str) -> tuple:
+        """Stream ``chunks`` into the cache under ``key``; returns ``(path, digest, size)``."""
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    sha.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            digest = sha.hexdigest()
+            path = self.path(digest, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.unlink(tmp)                   # same bytes already stored
+            else:
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        with self._conn() as db:
+            db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)", (digest, ext, size, time.time()))
+            db.execute("INSERT OR REPLACE INTO requests VALUES (?, ?, ?)", (key, digest, time.time()))
+        self.evict(keep=digest)
+        return path, digest, size
+
+    def total_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least-recently-used images until under ``max_bytes``; returns bytes freed."""
+        freed = 0
+        with self._conn() as db:
+            excess = self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return 0
+            for digest, ext, size in db.execute("SELECT digest, ext, size FROM blobs ORDER BY used").fetchall():
+                if freed >= excess:
+                    break
+                if digest == keep:
+                    continue
+                try:
+                    os.unlink(self.path(digest, ext))
+                except FileNotFoundError:
+                    pass
+                db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                db.execute("DELETE FROM requests WHERE digest = ?", (digest,))
+                freed += size
+        return freed
+
+
+# ── downloads ─────────────────────────────────────────────────────────────────
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\((\S+?)\)")
+_URL = re.compile(r"https?://[^\s)\"'<>]+")
+_IMAGE_EXT = re.compile(r"\.(?:png|jpe?g|webp|gif)(?:\?|$)", re.IGNORECASE)
+
+
+def image_urls(response) -> List[str]:
+    """Image URLs from an ``agent.run`` response: artifacts first, then links in the text."""
+    urls = [a.url for a in getattr(response, "files", None) or []]
+    if urls:
+        return urls
+    text = getattr(response, "response", "") or ""
+    urls = _MD_IMAGE.findall(text)
+    if urls:
+        return urls
+    links = _URL.findall(text)
+    return [u for u in links if _IMAGE_EXT.search(u)] or links
+
+
+def _extension(url: str, content_type: str = "") -> str:
+    ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) if content_type else None
+    if not ext:
+        ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    return {".jpe": ".jpg", ".jpeg": ".jpg"}.get(ext, ext) or ".png"
+
+
+def download(url: str, cache: ImageCache, key: str, client=None) -> tuple:
+    """Stream ``url`` into ``cache``; ``data:`` URLs (inline base64) are decoded instead."""
+    if url.startswith("data:"):
+        header, _, payload = url.partition(",")
+        data = base64.b64decode(payload) if ";base64" in header else payload.encode("utf-8")
+        ext = _extension("", header[5:].split(";")[0])
+        return cache.store(key, (data[i:i + CHUNK] for i in range(0, len(data), CHUNK)), ext)
+    import httpx
+
+    client = client or httpx
+    with client.stream("GET", url, follow_redirects=True, timeout=60.0) as r:
+        r.raise_for_status()
+        return cache.store(key, r.iter_bytes(CHUNK), _extension(url, r.headers.get("content-type", "")))
+
+
+# ── generators ────────────────────────────────────────────────────────────────
+Generator = Callable[[ImageRequest], str]
+
+
+def agent_generator(studio, image_model, provider: str = "openai/gpt-4o-mini") -> Generator:
+    """A generator backed by one agent with ``set_image_model(image_model)`` (lesson 12)."""
+    agent = studio.create_agent(
+        name="Image Pipeline",
+        provider=provider,
+        role="Image generator",
+        goal="Generate exactly the requested image",
+        instructions="Generate the requested image directly. Do not ask questions or describe it.",
+    )
+    agent.set_image_model(image_model)
+
+    def generate(req: ImageRequest) -> str:
+        response = agent.run(f"Generate one image, size {req.size}: {req.prompt}")
+        urls = image_urls(response)
+        if not urls:
+            raise RuntimeError(f"no image in response: {getattr(response, 'response', '')[:120]!r}")
+        return urls[0]
+
+    generate.agent = agent
+    return generate
+
+
+# ── pipeline ──────────────────────────────────────────────────────────────────
+class ImagePipeline:
+    """Generate → stream to cache, with per-provider concurrency and request dedup."""
+
+    def __init__(self, generators: Dict[str, Generator], cache: ImageCache,
+                 concurrency: Union[int, Dict[str, int]] = 4, download_workers: int = 16,
+                 throttle=None, client=None):
+        self.generators = generators
+        self.cache = cache
+        self.throttle = throttle
+        self._own_client = client is None
+        if client is None:
+            import httpx
+
+            # One pooled client: a fresh one per download costs a TLS context each time.
+            client = httpx.Client(follow_redirects=True, timeout=60.0)
+        self.client = client
+        limits = concurrency if isinstance(concurrency, dict) else {p: concurrency for p in generators}
+        self._gen_pools = {p: ThreadPoolExecutor(max_workers=limits.get(p, 4), thread_name_prefix=f"img-{p}")
+                           for p in generators}
+        self._downloads = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="img-dl")
+
+    def close(self):
+        for pool in self._gen_pools.values():
+            pool.shutdown(wait=True)
+        self._downloads.shutdown(wait=True)
+        if self._own_client:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _generate(self, req: ImageRequest) -> str:
+        fn = self.generators[req.provider]
+        if self.throttle is not None:
+            return self.throttle.call(req.provider, fn, req)
+        return fn(req)
+
+    def run(self, prompts: Iterable[Union[str, ImageRequest]], provider: Optional[str] = None,
+            model: Optional[str] = None, size: str = "1024x1024", max_pending: int = 256,
+            out_dir: Optional[str] = None) -> Iterator[ImageResult]:
+        """Yield an :class:`ImageResult` per prompt, in completion order.
+
+        Plain strings become ``ImageRequest(prompt, provider, model, size)``.
+        With ``out_dir``, each image is also linked (or copied) there as
+        ``<index>.<ext>``, which keeps it safe from cache eviction.
+        """
+        provider = provider or next(iter(self.generators))
+        done: "queue.Queue[ImageResult]" = queue.Queue()
+        waiters: Dict[str, List[tuple]] = {}      # key → [(index, request, submitted)] in flight
+        lock = threading.Lock()
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        def finish(key: str, first: ImageResult):
+            with lock:
+                group = waiters.pop(key)
+            now = time.perf_counter()
+            for n, (index, req, submitted) in enumerate(group):
+                result = first if n == 0 else ImageResult(
+                    index, req, first.path, first.digest, first.size, first.cached, True,
+                    error=first.error)
+                result.latency = now - submitted
+                done.put(result)
+
+        def fetch(key: str, result: ImageResult, url: str):
+            t0 = time.perf_counter()
+            try:
+                result.path, result.digest, result.size = download(url, self.cache, key, self.client)
+            except Exception as e:
+                result.error = f"download: {type(e).__name__}: {e}"
+            result.download_s = time.perf_counter() - t0
+            finish(key, result)
+
+        def generate(key: str, result: ImageResult):
+            t0 = time.perf_counter()
+            try:
+                url = self._generate(result.request)
+            except Exception as e:
+                result.error = f"generate: {type(e).__name__}: {e}"
+                result.generate_s = time.perf_counter() - t0
+                finish(key, result)
+                return
+            result.generate_s = time.perf_counter() - t0
+            self._downloads.submit(fetch, key, result, url)
+
+        def submit(index: int, req: ImageRequest):
+            submitted = time.perf_counter()
+            key = req.key
+            with lock:
+                if key in waiters:                   # identical request already in flight
+                    waiters[key].append((index, req, submitted))
+                    return
+                hit = self.cache.lookup(key)
+                if hit is not None:
+                    done.put(ImageResult(index, req, *hit, cached=True,
+                                         latency=time.perf_counter() - submitted))
+                    return
+                waiters[key] = [(index, req, submitted)]
+            if req.provider not in self._gen_pools:
+                finish(key, ImageResult(index, req, error=f"no generator for provider {req.provider!r}"))
+            else:
+                self._gen_pools[req.provider].submit(generate, key, ImageResult(index, req))
+
+        pending = index = 0
+        source = iter(prompts)
+        exhausted = False
+        while True:
+            while not exhausted and pending < max_pending:
+                try:
+                    item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                req = item if isinstance(item, ImageRequest) else ImageRequest(
+                    item, provider, model or "default", size)
+                submit(index, req)
+                index += 1
+                pending += 1
+            if pending == 0:
+                return
+            result = done.get()
+            pending -= 1
+            if out_dir and result.ok:
+                try:
+                    _export(result, out_dir)
+                except FileNotFoundError:
+                    result.error = "evicted from the cache before export (raise max_bytes)"
+            yield result
+
+
+def _export(result: ImageResult, out_dir: str):
+    target = os.path.join(out_dir, f"{result.index:05d}{os.path.splitext(result.path)[1]}")
+    if os.path.exists(target):
+        os.unlink(target)
+    try:
+        os.link(result.path, target)
+    except OSError:
+        shutil.copyfile(result.path, target)
+    result.path = target
+
+
+# ── reporting ─────────────────────────────────────────────────────────────────
+@dataclass
+class PipelineReport:
+    images: int = 0
+    failed: int = 0
+    cached: int = 0
+    deduped: int = 0
+    bytes: int = 0
+    wall_s: float = 0.0
+    latency: List[float] = field(default_factory=list)
+    generate: List[float] = field(default_factory=list)
+    download: List[float] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    def add(self, result: ImageResult):
+        self.images += 1
+        if not result.ok:
+            self.failed += 1
+            self.errors.append(f"#{result.index}: {result.error}")
+            return
+        self.latency.append(result.latency)
+        if result.cached:
+            self.cached += 1
+        elif result.deduped:
+            self.deduped += 1
+        else:
+            self.bytes += result.size
+            self.generate.append(result.generate_s)
+            self.download.append(result.download_s)
+
+    def summary(self) -> dict:
+        wall = self.wall_s or 1e-9
+        return {
+            "images": self.images, "failed": self.failed, "cached": self.cached, "deduped": self.deduped,
+            "generated": len(self.generate), "megabytes": self.bytes / 1e6, "wall_s": self.wall_s,
+            "images_per_s": (self.images - self.failed) / wall, "mb_per_s": self.bytes / 1e6 / wall,
+            "latency": summarize(self.latency), "generate": summarize(self.generate),
+            "download": summarize(self.download), "errors": self.errors[:20],
+        }
+
+
+def run_batch(pipeline: ImagePipeline, prompts, on_result: Optional[Callable[[ImageResult], None]] = None,
+              **run_kwargs) -> PipelineReport:
+    """Drain :meth:`ImagePipeline.run` into a :class:`PipelineReport`."""
+    report = PipelineReport()
+    start = time.perf_counter()
+    for result in pipeline.run(prompts, **run_kwargs):
+        report.add(result)
+        if on_result is not None:
+            on_result(result)
+    report.wall_s = time.perf_counter() - start
+    return report
+
+
+# ── stub provider ─────────────────────────────────────────────────────────────
+def stub_server(image_bytes: int = 256 * 1024, chunk_delay: float = 0.002):
+    """Local HTTP server streaming deterministic fake images; returns ``(server, base_url)``."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            seed = hashlib.sha256(self.path.encode("utf-8")).digest()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(image_bytes))
+            self.end_headers()
+            block = seed * (CHUNK // len(seed))
+            for sent in range(0, image_bytes, CHUNK):
+                self.wfile.write(block[:min(CHUNK, image_bytes - sent)])
+                time.sleep(chunk_delay)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stub_generator(base_url: str, latency: float = 0.5) -> Generator:
+    """Pretends to generate: sleeps ``latency`` ± 30% and returns a URL on the stub server."""
+    import random
+
+    def generate(req: ImageRequest) -> str:
+        time.sleep(latency * random.uniform(0.7, 1.3))
+        return f"{base_url}/img/{req.key[:16]}.png"
+
+    return generate
+
+
+def main(argv=None):
+    import argparse
+    import random
+
+    parser = argparse.ArgumentParser(description="Batch image generation with a content-addressed cache.")
+    parser.add_argument("prompts", nargs="?", help="text file, one prompt per line")
+    parser.add_argument("--image-model", default="dalle-3", help="passed to agent.set_image_model")
+    parser.add_argument("--size", default="1024x1024")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="generations in flight per provider")
+    parser.add_argument("--cache-dir", default=os.path.join("~", ".cache", "lyzr_kit", "images"))
+    parser.add_argument("--max-cache-mb", type=float, default=1024.0)
+    parser.add_argument("--out", help="link finished images into this directory")
+    parser.add_argument("--stub", action="store_true", help="local fake provider (no API key)")
+    parser.add_argument("--count", type=int, default=200, help="--stub: number of prompts")
+    parser.add_argument("--dupes", type=float, default=0.2, help="--stub: fraction of repeated prompts")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    cache_dir = args.cache_dir
+    if args.stub:
+        server, base = stub_server()
+        providers = {"openai": stub_generator(base), "google": stub_generator(base, latency=0.3)}
+        rng = random.Random(1)
+        prompts = []
+        for i in range(args.count):
+            n = rng.randrange(i) if i and rng.random() < args.dupes else i
+            prompts.append(ImageRequest(f"product shot, variant {n}, studio light",
+                                        "openai" if n % 2 else "google", "stub", args.size))
+        if args.cache_dir == parser.get_default("cache_dir"):
+            cache_dir = tempfile.mkdtemp(prefix="lyzr-images-")
+    elif not args.prompts:
+        parser.error("give a prompts file or --stub")
+    else:
+        from lyzr import Studio
+
+        studio = Studio(api_key=os.environ["LYZR_API_KEY"])
+        providers = {"lyzr": agent_generator(studio, args.image_model)}
+        with open(args.prompts, encoding="utf-8") as f:
+            prompts = [line.strip() for line in f if line.strip()]
+
+    cache = ImageCache(cache_dir, max_bytes=int(args.max_cache_mb * 1e6))
+    with ImagePipeline(providers, cache, concurrency=args.concurrency) as pipeline:
+        report = run_batch(pipeline, prompts, model=args.image_model, size=args.size, out_dir=args.out)
+    if not args.stub:
+        providers["lyzr"].agent.delete()
+    r = report.summary()
+    if args.json:
+        print(json.dumps(r, indent=2))
+        return 0 if not r["failed"] else 1
+
+    lat, gen, dl = r["latency"], r["generate"], r["download"]
+    print(f"\nImage pipeline — {r['images']} prompts, concurrency {args.concurrency} per provider")
+    print("=" * 60)
+    print(f"Generated:    {r['generated']}  ({r['megabytes']:.1f} MB streamed to {cache.root})")
+    print(f"Cache hits:   {r['cached']}   In-flight dedup: {r['deduped']}   Failed: {r['failed']}")
+    print(f"Wall time:    {r['wall_s']:.2f}s  → {r['images_per_s']:.1f} images/s, {r['mb_per_s']:.1f} MB/s")
+    if lat["count"]:
+        print(f"Latency:      p50 {lat['p50']:.2f}s  p95 {lat['p95']:.2f}s  max {lat['max']:.2f}s")
+    if gen["count"]:
+        print(f"  generate:   p50 {gen['p50']:.2f}s  p95 {gen['p95']:.2f}s")
+        print(f"  download:   p50 {dl['p50']:.2f}s  p95 {dl['p95']:.2f}s")
+    print(f"Cache size:   {cache.total_bytes() / 1e6:.1f} MB (limit {args.max_cache_mb:.0f} MB)")
+    for error in r["errors"]:
+        print(f"  ✗ {error}")
+    return 0 if not r["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
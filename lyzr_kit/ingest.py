@@ -0,0 +1,408 @@
+"""Incremental, deduplicated bulk ingestion into a knowledge base.
+
+Calling ``kb.add_text()`` for every document on every run re-uploads the
+whole corpus and leaves duplicates behind. :func:`sync` instead streams
+documents from a directory or a JSONL file, chunks them, and hashes each
+chunk. A local manifest remembers which chunk hashes are already in which
+KB, so a re-run uploads only new or changed chunks and deletes (with
+``kb.delete_documents``) the ones that disappeared. Work is proportional to
+what changed, not to corpus size.
+
+Chunks are identified by content, not position: inserting a paragraph only
+uploads the chunk(s) it lands in, however far the chunks after it move.
+Each chunk is uploaded with a source label ``<source>#<hash>`` (``~<n>`` is
+appended for the n-th repeat of the same text in one document). That label
+is the document's name on the server: it is what
+``kb.list_documents()`` reports as ``Document.source`` and what
+``kb.delete_documents()`` removes. (The SDK's ``add_text`` only returns
+``True``, and the ``doc_<n>`` ids from ``list_documents`` are positions in
+the listing, so neither can identify a chunk.)
+
+    python -m lyzr_kit.ingest KB_ID docs/                # directory of .md/.txt
+    python -m lyzr_kit.ingest KB_ID corpus.jsonl         # {"source": ..., "text": ...}
+    python -m lyzr_kit.ingest KB_ID docs/ --dry-run      # show what would change
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_MANIFEST = os.path.join(os.path.expanduser("~"), ".cache", "lyzr_kit", "ingest.json")
+DEFAULT_PATTERNS = ("*.md", "*.txt", "*.rst", "*.html")
+
+
+@dataclass
+class Document:
+    source: str
+    text: str
+
+
+@dataclass
+class Chunk:
+    source: str
+    text: str
+    hash: str
+    repeat: int = 0   # earlier chunks of the same document with the same text
+
+    @property
+    def key(self) -> str:
+        """``<source>#<hash>[~<repeat>]`` — identity by content, wherever the chunk moves."""
+        key = f"{self.source}#{self.hash[:12]}"
+        return f"{key}~{self.repeat}" if self.repeat else key
+
+    @property
+    def label(self) -> str:
+        return self.key
+
+
+# ── sources ───────────────────────────────────────────────────────────────────
+def iter_directory(root: str, patterns: Sequence[str] = DEFAULT_PATTERNS) -> Iterator[Document]:
+    """Yield files under ``root`` one at a time; source is the relative path."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if not any(fnmatch.fnmatch(name, p) for p in patterns):
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield Document(os.path.relpath(path, root).replace(os.sep, "/"), f.read())
+
+
+def iter_jsonl(path: str, text_field: str = "text", source_field: str = "source") -> Iterator[Document]:
+    """Yield one document per JSONL line; lines without a source get ``<file>:<line>``."""
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield Document(str(row.get(source_field) or f"{os.path.basename(path)}:{n}"),
+                           row[text_field])
+
+
+def iter_path(path: str, **kwargs) -> Iterator[Document]:
+    return iter_jsonl(path, **kwargs) if path.endswith(".jsonl") else iter_directory(path)
+
+
+# ── chunking ──────────────────────────────────────────────────────────────────
+def chunk_text(text: str, size: int = 1500, overlap: int = 150) -> List[str]:
+    """Split on paragraphs, packing them up to ``size`` characters.
+
+    Paragraphs longer than ``size`` are cut at word boundaries with
+    ``overlap`` characters carried over. Editing one paragraph therefore only
+    changes the chunk(s) around it, which keeps re-indexing incremental.
+    """
+    paragraphs = [p.strip() for p in text.replace("\r\n", "\n").split("\n\n") if p.strip()]
+    chunks, current = [], ""
+    for para in paragraphs:
+        while len(para) > size:
+            cut = para.rfind(" ", 0, size)
+            cut = cut if cut > size // 2 else size
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:cut].strip())
+            para = para[max(0, cut - overlap):].strip() if overlap else para[cut:].strip()
+        if current and len(current) + 2 + len(para) > size:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_document(doc: Document, size: int = 1500, overlap: int = 150) -> List[Chunk]:
+    chunks, repeats = [], {}
+    for text in chunk_text(doc.text, size, overlap):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        repeats[digest] = repeats.get(digest, -1) + 1
+        chunks.append(Chunk(doc.source, text, digest, repeats[digest]))
+    return chunks
+
+
+# ── manifest ──────────────────────────────────────────────────────────────────
+class Manifest:
+    """``{kb_id: {"chunks": {chunk_key: {"source", "hash", "label"}}, "pending_delete": [label]}}`` on disk.
+
+    Stale chunks move to ``pending_delete`` before the KB is asked to delete
+    them and leave it only once the delete succeeds, so a failed delete is
+    retried by the next sync instead of orphaning the old chunk.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.data: Dict[str, dict] = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.data = {}
+        for kb_id, space in list(self.data.items()):
+            if "chunks" not in space:   # flat {chunk_key: record} manifests from before pending_delete
+                self.data[kb_id] = {"chunks": space, "pending_delete": []}
+
+    def _space(self, kb_id: str) -> dict:
+        return self.data.setdefault(kb_id, {"chunks": {}, "pending_delete": []})
+
+    def entries(self, kb_id: str) -> Dict[str, dict]:
+        return self._space(kb_id)["chunks"]
+
+    def pending(self, kb_id: str) -> List[str]:
+        with self._lock:
+            return list(self._space(kb_id)["pending_delete"])
+
+    def set(self, kb_id: str, key: str, record: Optional[dict]):
+        with self._lock:
+            space = self.entries(kb_id)
+            if record is None:
+                space.pop(key, None)
+            else:
+                space[key] = record
+
+    def retire(self, kb_id: str, keys: Iterable[str]):
+        """Drop ``keys`` from the manifest, queueing their labels for deletion."""
+        with self._lock:
+            space = self._space(kb_id)
+            for key in keys:
+                entry = space["chunks"].pop(key, None)
+                if entry and entry["label"] not in space["pending_delete"]:
+                    space["pending_delete"].append(entry["label"])
+
+    def deleted(self, kb_id: str, labels: Iterable[str]):
+        """Forget pending labels the KB no longer has."""
+        with self._lock:
+            space = self._space(kb_id)
+            done = set(labels)
+            space["pending_delete"] = [label for label in space["pending_delete"] if label not in done]
+
+    def save(self):
+        with self._lock:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+
+
+# ── sync ──────────────────────────────────────────────────────────────────────
+@dataclass
+class IngestReport:
+    added: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    failed: int = 0
+    documents: int = 0
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (f"{self.documents} docs: +{self.added} new, ={self.unchanged} unchanged, "
+                f"-{self.deleted} deleted, "
+                f"{self.failed} failed in {self.elapsed:.1f}s")
+
+
+def _retry(fn, retries: int, backoff: float):
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+
+
+def _sources(kb) -> List[str]:
+    """Names of the documents in ``kb``, as the server reports them."""
+    names = []
+    for doc in kb.list_documents():
+        source = doc.get("source") if isinstance(doc, dict) else getattr(doc, "source", None)
+        if source:
+            names.append(str(source))
+    return names
+
+
+def adopt(kb) -> Dict[str, dict]:
+    """Rebuild manifest entries from the labels of documents already in ``kb``.
+
+    Used when the manifest is missing (new machine, wiped cache), so a re-run
+    recognises chunks uploaded earlier instead of duplicating them.
+    """
+    entries: Dict[str, dict] = {}
+    for label in _sources(kb):
+        match = _LABEL.match(label)
+        if match:
+            entries[label] = {"source": match.group(1), "hash": match.group(2), "label": label}
+    return entries
+
+
+_LABEL = re.compile(r"^(.*)#([0-9a-f]{12})(?:~\d+)?$")
+
+
+def _source_of(key: str, entry: dict) -> str:
+    return entry.get("source") or key.rpartition("#")[0]
+
+
+def sync(kb, documents: Iterable[Document], manifest: Optional[Manifest] = None,
+         chunk_size: int = 1500, overlap: int = 150, workers: int = 8, prune: bool = True,
+         dry_run: bool = False, retries: int = 2, backoff: float = 0.5,
+         checkpoint_every: int = 200, verbose: bool = True) -> IngestReport:
+    """Bring ``kb`` in line with ``documents``, uploading only what changed.
+
+    Chunks of a document in ``documents`` that are no longer part of it are
+    deleted once its new chunks are all uploaded. ``prune`` also deletes the
+    chunks of documents missing from ``documents`` — leave it on only when
+    ``documents`` is the whole corpus.
+    Uploads run on ``workers`` threads with at most ``2 * workers`` chunks in
+    flight, so memory stays flat however large the corpus is. The manifest is
+    checkpointed every ``checkpoint_every`` uploads; an interrupted run simply
+    resumes where it left off. Chunks are already at most ``chunk_size``
+    characters, and the same ``chunk_size``/``overlap`` go to ``add_text`` so
+    the server keeps each one whole instead of re-chunking it.
+    """
+    manifest = manifest if manifest is not None else Manifest()
+    known = manifest.entries(kb.id)
+    if not known:
+        pending = set(manifest.pending(kb.id))
+        known.update({key: entry for key, entry in adopt(kb).items() if entry["label"] not in pending})
+    report = IngestReport()
+    seen, seen_sources, failed_sources = set(), set(), set()
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def upload(chunk: Chunk) -> Chunk:
+        try:
+            _retry(lambda: kb.add_text(text=chunk.text, source=chunk.label,
+                                       chunk_size=chunk_size, chunk_overlap=overlap),
+                   retries, backoff)
+        except Exception as e:
+            e.chunk = chunk
+            raise
+        return chunk
+
+    def record(fut):
+        try:
+            chunk = fut.result()
+        except Exception as e:
+            with lock:
+                report.failed += 1
+                report.errors.append(f"{type(e).__name__}: {e}")
+                failed_sources.add(e.chunk.source)
+            return
+        manifest.set(kb.id, chunk.key, {"source": chunk.source, "hash": chunk.hash,
+                                        "label": chunk.label})
+        with lock:
+            report.added += 1
+            done = report.added
+        if checkpoint_every and done % checkpoint_every == 0:
+            manifest.save()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        in_flight = set()
+        for doc in documents:
+            report.documents += 1
+            seen_sources.add(doc.source)
+            for chunk in chunk_document(doc, chunk_size, overlap):
+                seen.add(chunk.key)
+                if chunk.key in known:
+                    report.unchanged += 1
+                    continue
+                if dry_run:
+                    report.added += 1
+                    continue
+                if len(in_flight) >= 2 * workers:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        record(fut)
+                in_flight.add(pool.submit(upload, chunk))
+        for fut in in_flight:
+            record(fut)
+
+    # A document whose new chunks didn't all upload keeps its old ones until a re-run.
+    gone = []
+    for key, entry in list(known.items()):
+        source = _source_of(key, entry)
+        if key not in seen and source not in failed_sources and (prune or source in seen_sources):
+            gone.append(key)
+    if dry_run:
+        report.deleted = len(gone) + len(manifest.pending(kb.id))
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    # Queue before deleting: a crash or failed delete leaves the labels for the next run.
+    manifest.retire(kb.id, gone)
+    manifest.save()
+    pending = manifest.pending(kb.id)
+    if pending:
+        # A label that is live again was re-uploaded under the same name; deleting
+        # by name would take the new copy with it.
+        live = {entry["label"] for entry in known.values()}
+        on_server = set(_sources(kb))
+        manifest.deleted(kb.id, [label for label in pending if label in live or label not in on_server])
+        stale_names = [label for label in pending if label not in live and label in on_server]
+        for i in range(0, len(stale_names), 100):
+            batch = stale_names[i:i + 100]
+            try:
+                _retry(lambda: kb.delete_documents(batch), retries, backoff)
+            except Exception as e:
+                report.failed += len(batch)
+                report.errors.append(f"delete {len(batch)} docs: {type(e).__name__}: {e}")
+                continue
+            manifest.deleted(kb.id, batch)
+            report.deleted += len(batch)
+
+    manifest.save()
+    report.elapsed = time.perf_counter() - start
+    if verbose:
+        print(f"  Ingest → {getattr(kb, 'name', kb.id)}: {report.summary()}")
+        for err in report.errors[:5]:
+            print(f"    ! {err}")
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally sync documents into a knowledge base.")
+    parser.add_argument("kb_id")
+    parser.add_argument("path", help="directory of text files, or a .jsonl file")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument("--no-prune", action="store_true",
+                        help="keep chunks missing from this input (partial uploads)")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--stub", action="store_true", help="ingest into an offline stub KB")
+    args = parser.parse_args(argv)
+
+    if args.stub:
+        from lyzr_kit.stub import StubStudio
+        kb = StubStudio().create_knowledge_base(name=args.kb_id)
+        kb.id = args.kb_id
+    else:
+        if not os.getenv("LYZR_API_KEY"):
+            print("ERROR: LYZR_API_KEY not set")
+            return 1
+        from lyzr import Studio
+        kb = Studio(api_key=os.environ["LYZR_API_KEY"]).get_knowledge_base(args.kb_id)
+
+    report = sync(kb, iter_path(args.path), Manifest(args.manifest), args.chunk_size,
+                  args.overlap, args.workers, prune=not args.no_prune, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"Dry run: {report.summary()}")
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Knowledge-base helpers.
+
+Indexing after ``kb.add_text()`` / ``kb.add_website()`` is asynchronous, so a
+query issued straight away can come back empty. :func:`wait_for_indexed`
+polls the KB until the new content is visible instead of sleeping for a
+fixed amount of time, and reports how long that took.
+
+:class:`CachedKnowledgeBase` wraps a KB with a client-side retrieval cache
+(:class:`RetrievalCache`) so repeated ``kb.query()`` calls skip the remote
+round-trip until the KB is changed through the wrapper.
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from lyzr_kit.cache import normalize
+
+
+@dataclass
+class IndexingResult:
+    ready: bool
+    latency: float          # seconds from ingest until queryable (or until giving up)
+    attempts: int
+    results: list = field(default_factory=list)   # last kb.query() results, if probed
+
+
+# The most recent wait_for_indexed() results, so scripts can report ingest →
+# queryable latency at the end of a run. Bounded so a long-lived process
+# doesn't grow it forever; use the return value or ``on_result`` to keep more.
+indexing_latencies: Deque[IndexingResult] = deque(maxlen=1000)
+
+
+def wait_for_indexed(
+    kb,
+    probe: Optional[str] = None,
+    min_documents: Optional[int] = None,
+    ingested_at: Optional[float] = None,
+    deadline: float = 30.0,
+    initial_delay: float = 0.25,
+    max_delay: float = 4.0,
+    on_result: Optional[Callable[[IndexingResult], None]] = None,
+) -> IndexingResult:
+    """Poll ``kb`` until freshly ingested content is queryable.
+
+    Readiness means ``kb.list_documents()`` has at least ``min_documents``
+    entries (when given) and ``kb.query(probe, top_k=1)`` returns a hit (when
+    ``probe`` is given). Polls back off exponentially with jitter and stop at
+    ``deadline`` seconds after ``ingested_at`` (a ``time.monotonic()`` value
+    taken just before the ``add_*`` call; defaults to now).
+
+    Never raises on timeout — check ``.ready`` on the returned result.
+    """
+    if probe is None and min_documents is None:
+        min_documents = 1
+    start = time.monotonic() if ingested_at is None else ingested_at
+    delay = initial_delay
+    attempts = 0
+    hits: list = []
+
+    while True:
+        attempts += 1
+        ready = True
+        if min_documents is not None:
+            ready = len(kb.list_documents()) >= min_documents
+        if ready and probe is not None:
+            hits = kb.query(probe, top_k=1)
+            ready = len(hits) > 0
+
+        elapsed = time.monotonic() - start
+        remaining = deadline - elapsed
+        if ready or remaining <= 0:
+            break
+        # "Equal jitter": sleep somewhere in [delay/2, delay] so parallel
+        # pollers don't fall into lock-step against the API.
+        time.sleep(min(remaining, random.uniform(delay / 2, delay)))
+        delay = min(max_delay, delay * 2)
+
+    result = IndexingResult(ready, time.monotonic() - start, attempts, hits)
+    indexing_latencies.append(result)
+    if on_result is not None:
+        on_result(result)
+    return result
+
+
+# ── retrieval cache ───────────────────────────────────────────────────────────
+def _score(hit) -> float:
+    return hit.get("score", 0.0) if isinstance(hit, dict) else getattr(hit, "score", 0.0)
+
+
+@dataclass
+class RetrievalStats:
+    hits: int = 0
+    subsumed_hits: int = 0      # answered from a broader entry (larger top_k / lower threshold)
+    misses: int = 0
+    invalidations: int = 0
+    saved_latency: float = 0.0  # estimated seconds of kb.query() round-trips avoided
+    miss_latency: float = 0.0   # total seconds spent in kb.query() on misses
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class _Entry:
+    top_k: int
+    threshold: float
+    results: list
+    expires: float
+
+    def covers(self, top_k: int, threshold: float) -> bool:
+        # Results are the top ``self.top_k`` hits scoring ≥ ``self.threshold``,
+        # so they contain the answer for any stricter threshold, and for any
+        # top_k up to ours — or any top_k at all if the KB ran out of hits.
+        return (threshold >= self.threshold
+                and (top_k <= self.top_k or len(self.results) < self.top_k))
+
+    def answer(self, top_k: int, threshold: float) -> list:
+        return [r for r in self.results if _score(r) >= threshold][:top_k]
+
+
+class RetrievalCache:
+    """Client-side ``kb.query()`` cache keyed on KB id and normalised query.
+
+    Each key keeps the broadest ``(top_k, score_threshold)`` results seen;
+    narrower requests are answered by filtering them. Empty results are
+    never cached, so polling a KB that is still indexing keeps working.
+    One cache can be shared by several :class:`CachedKnowledgeBase` wrappers.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = RetrievalStats()
+        self._data: "OrderedDict[Tuple[str, str], List[_Entry]]" = OrderedDict()
+        self._generation: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def generation(self, kb_id: str) -> int:
+        with self._lock:
+            return self._generation.get(kb_id, 0)
+
+    def lookup(self, kb_id: str, query: str, top_k: int, threshold: float) -> Optional[list]:
+        key = (kb_id, normalize(query))
+        now = time.monotonic()
+        with self._lock:
+            entries = [e for e in self._data.get(key, ()) if e.expires > now]
+            for entry in entries:
+                if entry.covers(top_k, threshold):
+                    self._data[key] = entries
+                    self._data.move_to_end(key)
+                    self.stats.hits += 1
+                    if (entry.top_k, entry.threshold) != (top_k, threshold):
+                        self.stats.subsumed_hits += 1
+                    if self.stats.misses:
+                        self.stats.saved_latency += self.stats.miss_latency / self.stats.misses
+                    return entry.answer(top_k, threshold)
+            return None
+
+    def store(self, kb_id: str, query: str, top_k: int, threshold: float, results: list,
+              generation: int, latency: float):
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.miss_latency += latency
+            # The KB changed while this query was in flight: result may be stale.
+            if not results or self._generation.get(kb_id, 0) != generation:
+                return
+            key = (kb_id, normalize(query))
+            entry = _Entry(top_k, threshold, list(results), time.monotonic() + self.ttl)
+            kept = [e for e in self._data.get(key, ())
+                    if not (threshold <= e.threshold and top_k >= e.top_k)]
+            self._data[key] = kept + [entry]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, kb_id: str):
+        with self._lock:
+            self._generation[kb_id] = self._generation.get(kb_id, 0) + 1
+            for key in [k for k in self._data if k[0] == kb_id]:
+                del self._data[key]
+            self.stats.invalidations += 1
+
+
+class CachedKnowledgeBase:
+    """Drop-in KB wrapper: cached ``query()``, invalidating writes.
+
+    ``add_text``, ``add_website``, ``delete_documents`` and ``reset`` pass
+    through and then drop every cached result for this KB. Changes made
+    elsewhere (another process, the Studio UI) are only picked up after
+    ``ttl`` — keep it short if that matters.
+    """
+
+    def __init__(self, kb, cache: Optional[RetrievalCache] = None):
+        self.kb = kb
+        self.cache = cache if cache is not None else RetrievalCache()
+
+    def __getattr__(self, name):
+        return getattr(self.kb, name)
+
+    def query(self, query: str, top_k: int = 5, score_threshold: float = 0.0, **kwargs):
+        if kwargs:      # options we don't key on: don't risk a wrong answer
+            return self.kb.query(query, top_k=top_k, score_threshold=score_threshold, **kwargs)
+        cached = self.cache.lookup(self.kb.id, query, top_k, score_threshold)
+        if cached is not None:
+            return cached
+        generation = self.cache.generation(self.kb.id)
+        start = time.perf_counter()
+        results = self.kb.query(query, top_k=top_k, score_threshold=score_threshold)
+        self.cache.store(self.kb.id, query, top_k, score_threshold, results, generation,
+                         time.perf_counter() - start)
+        return results
+
+    def _write(self, method: str, *args, **kwargs):
+        try:
+            return getattr(self.kb, method)(*args, **kwargs)
+        finally:
+            self.cache.invalidate(self.kb.id)
+
+    def add_text(self, *args, **kwargs):
+        return self._write("add_text", *args, **kwargs)
+
+    def add_website(self, *args, **kwargs):
+        return self._write("add_website", *args, **kwargs)
+
+    def delete_documents(self, *args, **kwargs):
+        return self._write("delete_documents", *args, **kwargs)
+
+    def reset(self, *args, **kwargs):
+        return self._write("reset", *args, **kwargs)
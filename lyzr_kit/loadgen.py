@@ -0,0 +1,202 @@
+"""Load generator for the WhatsApp webhook service.
+
+Replays thousands of simulated customer conversations and checks that every
+customer's turns were answered in the order they were sent.
+
+    python -m lyzr_kit.loadgen --conversations 2000 --turns 4      # in-process
+    WHATSAPP_APP_SECRET=... python -m lyzr_kit.loadgen --url http://localhost:8000 -c 500
+
+In-process mode drives :class:`~lyzr_kit.webhook.SessionDispatcher` directly
+with the stub agent, so it measures the queueing layer end to end (ordering,
+backpressure, latency percentiles). HTTP mode posts Meta-shaped payloads,
+signed with the server's app secret, to a running server (start it with
+``python -m lyzr_kit.webhook --stub``) and reports acknowledgement latency
+plus the server's ``/metrics``.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from lyzr_kit.bench import summarize
+from lyzr_kit.stub import Latency, StubStudio
+from lyzr_kit.webhook import Inbound, SessionDispatcher, meta_payload, sign
+
+TURNS = [
+    "Hi, do you have wireless headphones?",
+    "I placed order ORD-1001 last week. Where is it?",
+    "Can you track FX123456 for me?",
+    "I'd like to cancel ORD-1002.",
+    "Thanks! Can I speak with a human?",
+]
+
+
+def conversations(n: int, turns: int, seed: int = 7) -> List[Tuple[str, List[str]]]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        phone = f"+1555{i:07d}"
+        out.append((phone, [f"[turn {t}] {rng.choice(TURNS)}" for t in range(turns)]))
+    return out
+
+
+async def run_in_process(convs, workers: int, max_pending: int, latency: Latency,
+                         think_time: float) -> dict:
+    agent = StubStudio(latency=latency).create_agent(name="Load Stub", provider="stub")
+    seen: Dict[str, List[int]] = defaultdict(list)
+    lock = threading.Lock()
+
+    def handle(session_id, text):
+        reply = agent.run(text, session_id=session_id).response
+        with lock:
+            seen[session_id].append(int(text.split("]")[0].split()[-1]))
+        return reply
+
+    dispatcher = SessionDispatcher(handle, lambda to, msg: None, workers=workers,
+                                   max_pending=max_pending)
+    await dispatcher.start()
+    rejected_retries = 0
+    start = time.perf_counter()
+
+    async def customer(phone, texts):
+        nonlocal rejected_retries
+        for t, text in enumerate(texts):
+            msg = Inbound(phone, text, f"{phone}-{t}")
+            # Like Meta: on 503, back off and redeliver the same message.
+            while not dispatcher.submit(msg):
+                rejected_retries += 1
+                await asyncio.sleep(random.uniform(0.05, 0.2))
+            if think_time:
+                await asyncio.sleep(random.uniform(0, think_time))
+
+    await asyncio.gather(*(customer(p, texts) for p, texts in convs))
+    await dispatcher.drain()
+    wall = time.perf_counter() - start
+    await dispatcher.stop()
+
+    violations = sum(1 for order in seen.values() if order != sorted(order))
+    missing = sum(len(texts) - len(seen.get(p, [])) for p, texts in convs)
+    snap = dispatcher.snapshot()
+    return {"mode": "in-process", "wall_time": wall,
+            "messages_per_sec": snap["processed"] / wall if wall else 0.0,
+            "ordering_violations": violations, "missing_replies": missing,
+            "redeliveries": rejected_retries, "server": snap}
+
+
+def run_http(convs, url: str, concurrency: int, app_secret: str) -> dict:
+    acks: List[float] = []
+    statuses: Dict[int, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def post(body: dict) -> int:
+        data = json.dumps(body).encode("utf-8")
+        req = urllib.request.Request(f"{url}/webhook", data=data, method="POST", headers={
+            "Content-Type": "application/json", "X-Hub-Signature-256": sign(app_secret, data)})
+        try:
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def customer(conv):
+        phone, texts = conv
+        for t, text in enumerate(texts):
+            body = meta_payload(phone, text, f"{phone}-{t}")
+            while True:
+                t0 = time.perf_counter()
+                status = post(body)
+                with lock:
+                    acks.append(time.perf_counter() - t0)
+                    statuses[status] += 1
+                if status != 503:
+                    break
+                time.sleep(random.uniform(0.05, 0.2))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(customer, convs))
+    wall = time.perf_counter() - start
+    with urllib.request.urlopen(f"{url}/metrics", timeout=10) as resp:
+        server = json.load(resp)
+    return {"mode": "http", "wall_time": wall, "requests_per_sec": len(acks) / wall if wall else 0.0,
+            "ack_latency": summarize(acks), "statuses": dict(statuses), "server": server}
+
+
+def _ms(stats: dict) -> str:
+    if not stats.get("count"):
+        return "n/a"
+    return (f"p50 {stats['p50'] * 1000:.1f}ms  p95 {stats['p95'] * 1000:.1f}ms  "
+            f"p99 {stats['p99'] * 1000:.1f}ms")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay simulated WhatsApp conversations.")
+    parser.add_argument("-n", "--conversations", type=int, default=2000)
+    parser.add_argument("-t", "--turns", type=int, default=4)
+    parser.add_argument("--url", help="server base URL; omit to run in-process")
+    parser.add_argument("-c", "--concurrency", type=int, default=200,
+                        help="HTTP mode: concurrent customers")
+    parser.add_argument("--workers", type=int, default=64, help="in-process: dispatcher workers")
+    parser.add_argument("--max-pending", type=int, default=2000,
+                        help="in-process: queue bound before 503s")
+    parser.add_argument("--agent-latency", type=float, default=0.05,
+                        help="in-process: stub agent seconds per turn")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="max random pause between a customer's messages")
+    parser.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    args = parser.parse_args(argv)
+
+    convs = conversations(args.conversations, args.turns)
+    if args.url:
+        app_secret = os.getenv("WHATSAPP_APP_SECRET", "")
+        if not app_secret:
+            print("ERROR: set WHATSAPP_APP_SECRET to the server's app secret to sign deliveries.")
+            return 1
+        result = run_http(convs, args.url.rstrip("/"), args.concurrency, app_secret)
+    else:
+        latency = Latency(first_token=args.agent_latency, tool_call=0.0)
+        result = asyncio.run(run_in_process(convs, args.workers, args.max_pending,
+                                            latency, args.think_time))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    server = result["server"]
+    print(f"\nWhatsApp webhook load test — {result['mode']}, "
+          f"{args.conversations} conversations × {args.turns} turns")
+    print("=" * 60)
+    print(f"Wall time:        {result['wall_time']:.2f}s")
+    if result["mode"] == "http":
+        print(f"Requests/sec:     {result['requests_per_sec']:.1f}")
+        print(f"Ack latency:      {_ms(result['ack_latency'])}")
+        print(f"HTTP statuses:    {result['statuses']}")
+    else:
+        print(f"Messages/sec:     {result['messages_per_sec']:.1f}")
+        print(f"Redeliveries:     {result['redeliveries']} (after 503 backpressure)")
+    print(f"Processed:        {server['processed']} ok, {server['failed']} failed")
+    print(f"Max queue depth:  {server['max_queue_depth']}")
+    print(f"Queue wait:       {_ms(server['queue_wait'])}")
+    print(f"Agent time:       {_ms(server['agent_time'])}")
+    print(f"End-to-end:       {_ms(server['end_to_end'])}")
+    if result["mode"] == "in-process":
+        ok = result["ordering_violations"] == 0 and result["missing_replies"] == 0
+        print(f"Ordering:         {result['ordering_violations']} sessions out of order, "
+              f"{result['missing_replies']} missing — {'✅' if ok else '❌'}")
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
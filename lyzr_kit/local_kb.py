@@ -0,0 +1,567 @@
+"""Offline knowledge base with the same surface as the hosted one.
+
+:class:`LocalKnowledgeBase` implements ``add_text`` / ``add_website`` /
+``query(query, top_k, score_threshold)`` / ``list_documents`` /
+``delete_documents`` / ``reset`` entirely in-process, and
+:class:`LocalKBStudio` provides ``create_knowledge_base`` /
+``get_knowledge_base`` / ``list_knowledge_bases``. There is no indexing
+delay: text is queryable as soon as ``add_text`` returns. Use it for local
+development, CI, and as a low-latency pre-filter in front of the hosted KB.
+
+Index: an inverted index from unigram and bigram term ids (32-bit CRC
+hashes, so distinct terms practically never collide) to the chunks that
+contain them, stored as sorted NumPy postings arrays. Each ``add_texts``
+call writes a segment; segments are merged tier by tier, so there are only
+logarithmically many. A query walks the postings of its own terms and ranks
+by BM25 (IDF and average length from live chunks), then ``argpartition``
+picks the top-k. Deletes only tombstone rows, which are compacted once they
+exceed a quarter of the index. Scores are BM25 divided by what a chunk holding
+each query term the KB knows once would score, capped at 1 — so the 0.5-0.7
+``score_threshold`` used with the hosted KB keeps close matches and drops
+weak ones here too.
+
+Memory is about 6 bytes per (term, chunk) posting — roughly 100 MB per 100k
+chunks of 120 words. ``--bench`` reports recall@k on exact-text probes next
+to latency, so a ranking regression shows up with the speed numbers.
+
+    python -m lyzr_kit.local_kb --bench --sizes 10000 50000 200000
+"""
+
+import html
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lyzr_kit.ingest import chunk_text
+
+_TOKEN = re.compile(r"\w+")
+
+
+@dataclass
+class LocalDocument:
+    id: str
+    source: str
+    text: str
+    rows: List[int] = field(default_factory=list, repr=False)
+
+
+@dataclass
+class LocalQueryResult:
+    text: str
+    score: float
+    source: str
+    id: str           # document id, usable with delete_documents()
+
+
+def _stem(word: str) -> str:
+    """Crude plural folding so "returns" matches "return"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class TermHasher:
+    """Unigram and bigram term ids, vectorised with NumPy.
+
+    Words are hashed with CRC32 (stable across processes, unlike ``hash()``)
+    once and cached; bigram ids are derived from the two word hashes
+    arithmetically, so the per-token Python work is one dict lookup. Unigrams
+    keep the full 32-bit CRC and bigrams get their own 32-bit range above it,
+    so distinct terms practically never share an id.
+    """
+
+    _BIGRAM = np.uint64(1 << 32)
+
+    def __init__(self, ngrams: Sequence[int] = (1, 2)):
+        self.ngrams = tuple(ngrams)
+        self._cache: Dict[str, int] = {}
+
+    def _hashes(self, text: str) -> List[int]:
+        words = _TOKEN.findall(text.lower())
+        hashes = list(map(self._cache.get, words))
+        if None in hashes:
+            for i, h in enumerate(hashes):
+                if h is None:
+                    h = hashes[i] = zlib.crc32(_stem(words[i]).encode("utf-8"))
+                    if len(self._cache) < 2_000_000:
+                        self._cache[words[i]] = h
+        return hashes
+
+    def terms(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(rows, term_ids, lengths)``: one entry per term occurrence, and words per text."""
+        per_text = [self._hashes(t) for t in texts]
+        lengths = np.fromiter((len(h) for h in per_text), np.int64, len(per_text))
+        words = np.fromiter(itertools.chain.from_iterable(per_text), np.uint64, int(lengths.sum()))
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+
+        feats, feat_rows = [], []
+        if 1 in self.ngrams:
+            feats.append(words)
+            feat_rows.append(rows)
+        if 2 in self.ngrams and len(words) > 1:
+            same = rows[:-1] == rows[1:]
+            with np.errstate(over="ignore"):
+                pair = (words[:-1][same] * np.uint64(0x9E3779B97F4A7C15)) ^ words[1:][same]
+                pair = (pair * np.uint64(0xBF58476D1CE4E5B9)) >> np.uint64(32)
+            feats.append(pair | self._BIGRAM)
+            feat_rows.append(rows[:-1][same])
+        if not feats:
+            return np.zeros(0, np.int64), np.zeros(0, np.uint64), lengths
+        return np.concatenate(feat_rows), np.concatenate(feats), lengths
+
+
+@dataclass
+class _Segment:
+    """Postings in CSR form: ``rows[starts[i]:starts[i + 1]]`` contain ``terms[i]``."""
+
+    terms: np.ndarray       # sorted unique term ids (uint64)
+    starts: np.ndarray      # int64, len(terms) + 1
+    rows: np.ndarray        # int32, ascending within each term
+    tf: np.ndarray          # uint16 term frequency per posting
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, rows: np.ndarray, terms: np.ndarray, tf: Optional[np.ndarray] = None) -> "_Segment":
+        """From occurrences (``tf`` None, duplicates counted) or postings (``tf`` given)."""
+        order = np.lexsort((rows, terms))
+        rows, terms = rows[order], terms[order]
+        if tf is None:
+            first = np.ones(len(rows), dtype=bool)
+            first[1:] = (terms[1:] != terms[:-1]) | (rows[1:] != rows[:-1])
+            idx = np.flatnonzero(first)
+            tf = np.diff(np.append(idx, len(rows)))
+            rows, terms = rows[idx], terms[idx]
+        else:
+            tf = tf[order]
+        new_term = np.ones(len(terms), dtype=bool)
+        new_term[1:] = terms[1:] != terms[:-1]
+        heads = np.flatnonzero(new_term)
+        return cls(terms[heads], np.append(heads, len(terms)).astype(np.int64),
+                   rows.astype(np.int32), np.minimum(tf, 65535).astype(np.uint16))
+
+    def expand(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(rows, terms, tf)``, one entry per posting."""
+        return self.rows, np.repeat(self.terms, np.diff(self.starts)), self.tf
+
+    def postings(self, term: np.uint64) -> Tuple[np.ndarray, np.ndarray]:
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.rows[:0], self.tf[:0]
+        lo, hi = self.starts[i], self.starts[i + 1]
+        return self.rows[lo:hi], self.tf[lo:hi]
+
+    @staticmethod
+    def merge(segments: Sequence["_Segment"], keep: Optional[np.ndarray] = None,
+              remap: Optional[np.ndarray] = None) -> "_Segment":
+        parts = [s.expand() for s in segments]
+        rows = np.concatenate([p[0] for p in parts]).astype(np.int64)
+        terms = np.concatenate([p[1] for p in parts])
+        tf = np.concatenate([p[2] for p in parts])
+        if keep is not None:
+            mask = keep[rows]
+            rows, terms, tf = remap[rows[mask]], terms[mask], tf[mask]
+        return _Segment.build(rows, terms, tf)
+
+
+class LocalKnowledgeBase:
+    """In-process KB: inverted index over hashed terms, BM25 top-k."""
+
+    def __init__(self, name: str, chunk_size: int = 1500, overlap: int = 150,
+                 ngrams: Sequence[int] = (1, 2), k1: float = 1.2, b: float = 0.75,
+                 kb_id: Optional[str] = None, studio: Optional["LocalKBStudio"] = None):
+        self.id = kb_id or f"local-kb-{uuid.uuid4().hex[:12]}"
+        self.name = name
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.k1 = k1
+        self.b = b
+        self.hasher = TermHasher(ngrams)
+        self._studio = studio
+        self._lock = threading.RLock()
+        self._segments: List[_Segment] = []
+        self._lengths = np.zeros(1024, dtype=np.float32)   # words per row
+        self._alive = np.zeros(1024, dtype=bool)
+        self._row_doc: List[Optional[str]] = []
+        self._row_text: List[Optional[str]] = []
+        self._n = 0           # rows used (live + tombstoned)
+        self._live = 0
+        self._live_words = 0.0
+        self._docs: Dict[str, LocalDocument] = {}
+
+    # ── writes ────────────────────────────────────────────────────────────────
+    def add_texts(self, items: Iterable[Tuple[str, str]], chunk_size: Optional[int] = None,
+                  chunk_overlap: Optional[int] = None) -> List[LocalDocument]:
+        """Bulk ``add_text`` for ``(text, source)`` pairs — one indexing pass."""
+        size = chunk_size or self.chunk_size
+        overlap = self.overlap if chunk_overlap is None else chunk_overlap
+        docs, chunks = [], []
+        for text, source in items:
+            doc = LocalDocument(f"doc-{uuid.uuid4().hex[:16]}", source, text)
+            docs.append(doc)
+            for piece in chunk_text(text, size, overlap) or [text]:
+                chunks.append((doc, piece))
+        if not chunks:
+            return docs
+        rows, terms, lengths = self.hasher.terms([c for _, c in chunks])
+        with self._lock:
+            self._reserve(self._n + len(chunks))
+            start = self._n
+            self._segments.append(_Segment.build(rows + start, terms))
+            self._lengths[start:start + len(chunks)] = lengths
+            self._alive[start:start + len(chunks)] = True
+            for offset, (doc, piece) in enumerate(chunks):
+                doc.rows.append(start + offset)
+                self._row_doc.append(doc.id)
+                self._row_text.append(piece)
+            self._n += len(chunks)
+            self._live += len(chunks)
+            self._live_words += float(lengths.sum())
+            for doc in docs:
+                self._docs[doc.id] = doc
+            # Tiered merging keeps the segment count logarithmic in the number of adds.
+            while len(self._segments) > 1 and 2 * self._segments[-1].size >= self._segments[-2].size:
+                self._segments[-2:] = [_Segment.merge(self._segments[-2:])]
+        return docs
+
+    def add_text(self, text: str, source: str = "text", chunk_size: Optional[int] = None,
+                 chunk_overlap: Optional[int] = None) -> LocalDocument:
+        return self.add_texts([(text, source)], chunk_size, chunk_overlap)[0]
+
+    def add_website(self, url: str, max_pages: int = 5, max_depth: int = 1) -> List[LocalDocument]:
+        """Crawl same-host pages breadth-first and index their visible text."""
+        host = urllib.parse.urlparse(url).netloc
+        seen, frontier, pages = {url}, [(url, 0)], []
+        while frontier and len(pages) < max_pages:
+            page, depth = frontier.pop(0)
+            try:
+                with urllib.request.urlopen(page, timeout=15) as resp:
+                    body = resp.read().decode("utf-8", errors="replace")
+            except Exception:
+                continue
+            parser = _TextAndLinks(page)
+            parser.feed(body)
+            pages.append(("\n\n".join(parser.blocks), page))
+            if depth < max_depth:
+                for link in parser.links:
+                    if urllib.parse.urlparse(link).netloc == host and link not in seen:
+                        seen.add(link)
+                        frontier.append((link, depth + 1))
+        return self.add_texts(pages)
+
+    def delete_documents(self, ids: Sequence[str]):
+        """Delete by document id or, like the hosted KB, by document name (source)."""
+        with self._lock:
+            wanted = set(ids)
+            for doc in [d for d in self._docs.values() if d.id in wanted or d.source in wanted]:
+                del self._docs[doc.id]
+                rows = np.asarray(doc.rows, dtype=np.int64)
+                self._alive[rows] = False
+                self._live_words -= float(self._lengths[rows].sum())
+                for row in doc.rows:
+                    self._row_text[row] = self._row_doc[row] = None
+                self._live -= len(doc.rows)
+            if self._n - self._live > max(1024, self._n // 4):
+                self._compact()
+
+    def reset(self):
+        with self._lock:
+            self.delete_documents(list(self._docs))
+            self._compact()
+
+    def delete(self):
+        if self._studio is not None:
+            self._studio._kbs.pop(self.id, None)
+
+    def _reserve(self, rows: int):
+        capacity = len(self._alive)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        lengths = np.zeros(capacity, dtype=np.float32)
+        lengths[:self._n] = self._lengths[:self._n]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._n] = self._alive[:self._n]
+        self._lengths, self._alive = lengths, alive
+
+    def _compact(self):
+        """Drop tombstoned rows and merge all postings into one segment."""
+        alive = self._alive[:self._n]
+        keep = np.flatnonzero(alive)
+        remap = np.cumsum(alive) - 1
+        if self._segments:
+            self._segments = [_Segment.merge(self._segments, alive, remap)]
+        self._lengths[:len(keep)] = self._lengths[keep]
+        self._alive[:] = False
+        self._alive[:len(keep)] = True
+        self._row_doc = [self._row_doc[i] for i in keep]
+        self._row_text = [self._row_text[i] for i in keep]
+        for doc in self._docs.values():
+            doc.rows = [int(remap[r]) for r in doc.rows]
+        self._n = self._live = len(keep)
+
+    # ── reads ─────────────────────────────────────────────────────────────────
+    def list_documents(self) -> List[LocalDocument]:
+        with self._lock:
+            return list(self._docs.values())
+
+    def __len__(self):
+        """Number of live chunks."""
+        return self._live
+
+    def _scores(self, query: str) -> np.ndarray:
+        """BM25 of every row against ``query``, scaled to ``[0, 1]``.
+
+        The scale is what a chunk of average length containing each query
+        term found in the KB once would score, so 1.0 means "has every query
+        term the KB knows about". Terms no chunk contains (typos, absent
+        words, most bigrams) are left out of it; otherwise they would push
+        every score far below the 0.5-0.7 thresholds callers use with the
+        hosted KB.
+        """
+        _, terms, _ = self.hasher.terms([query])
+        scores = np.zeros(self._n, dtype=np.float32)
+        if not len(terms) or not self._live:
+            return scores
+        alive = self._alive[:self._n]
+        avg_len = self._live_words / self._live or 1.0
+        ceiling = 0.0
+        for term, weight in zip(*np.unique(terms, return_counts=True)):
+            found = [s.postings(term) for s in self._segments]
+            rows = np.concatenate([r for r, _ in found])
+            tf = np.concatenate([t for _, t in found]).astype(np.float32)
+            live = alive[rows]
+            rows, tf = rows[live], tf[live]
+            df = len(rows)
+            idf = np.log1p((self._live - df + 0.5) / (df + 0.5))
+            if df:
+                ceiling += weight * idf
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / avg_len)
+                scores[rows] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+        if ceiling > 0:
+            scores = np.minimum(scores / ceiling, 1.0)
+        return scores
+
+    def query_batch(self, queries: Sequence[str], top_k: int = 5,
+                    score_threshold: float = 0.0) -> List[List[LocalQueryResult]]:
+        """Top-k for each of ``queries``."""
+        with self._lock:
+            results = []
+            for query in queries:
+                if self._n == 0 or top_k <= 0:
+                    results.append([])
+                    continue
+                scores = self._scores(query)
+                k = min(top_k, self._n)
+                top = np.argpartition(-scores, k - 1)[:k] if k < self._n else np.arange(self._n)
+                top = top[np.argsort(-scores[top], kind="stable")]
+                hits = []
+                for row in top:
+                    score = float(scores[row])
+                    if not score > 0.0 or score < score_threshold:
+                        break
+                    doc = self._docs[self._row_doc[row]]
+                    hits.append(LocalQueryResult(self._row_text[row], score, doc.source, doc.id))
+                results.append(hits)
+            return results
+
+    def query(self, query: str, top_k: int = 5, score_threshold: float = 0.0) -> List[LocalQueryResult]:
+        return self.query_batch([query], top_k, score_threshold)[0]
+
+    # ── persistence ───────────────────────────────────────────────────────────
+    def save(self, path: str):
+        """Write ``<path>.npz`` (postings) and ``<path>.json`` (documents)."""
+        with self._lock:
+            self._compact()
+            segment = self._segments[0] if self._segments else _Segment.build(
+                np.zeros(0, np.int64), np.zeros(0, np.uint64))
+            np.savez(path + ".npz", terms=segment.terms, starts=segment.starts, rows=segment.rows,
+                     tf=segment.tf, lengths=self._lengths[:self._n])
+            meta = {"id": self.id, "name": self.name, "ngrams": list(self.hasher.ngrams),
+                    "k1": self.k1, "b": self.b, "chunk_size": self.chunk_size,
+                    "overlap": self.overlap,
+                    "docs": [{"id": d.id, "source": d.source, "text": d.text, "rows": d.rows}
+                             for d in self._docs.values()],
+                    "rows": [{"doc": d, "text": t} for d, t in zip(self._row_doc, self._row_text)]}
+            with open(path + ".json", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalKnowledgeBase":
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        kb = cls(meta["name"], meta["chunk_size"], meta["overlap"], meta["ngrams"],
+                 meta["k1"], meta["b"], kb_id=meta["id"])
+        arrays = np.load(path + ".npz")
+        n = len(meta["rows"])
+        kb._reserve(max(n, 1))
+        kb._segments = [_Segment(arrays["terms"], arrays["starts"], arrays["rows"], arrays["tf"])]
+        kb._lengths[:n] = arrays["lengths"]
+        kb._alive[:n] = True
+        kb._row_doc = [r["doc"] for r in meta["rows"]]
+        kb._row_text = [r["text"] for r in meta["rows"]]
+        kb._docs = {d["id"]: LocalDocument(d["id"], d["source"], d["text"], d["rows"])
+                    for d in meta["docs"]}
+        kb._n = kb._live = n
+        kb._live_words = float(arrays["lengths"].sum())
+        return kb
+
+
+class _TextAndLinks(HTMLParser):
+    _SKIP = {"script", "style", "noscript", "nav", "footer", "header"}
+
+    def __init__(self, base: str):
+        super().__init__()
+        self.base = base
+        self.blocks: List[str] = []
+        self.links: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip += 1
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href and not href.startswith(("#", "mailto:", "javascript:")):
+                self.links.append(urllib.parse.urljoin(self.base, href).split("#")[0])
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        text = " ".join(html.unescape(data).split())
+        if text and not self._skip:
+            self.blocks.append(text)
+
+
+class LocalKBStudio:
+    """The knowledge-base part of ``Studio``, backed by :class:`LocalKnowledgeBase`."""
+
+    def __init__(self, **kb_options):
+        self.kb_options = kb_options
+        self._kbs: Dict[str, LocalKnowledgeBase] = {}
+
+    def create_knowledge_base(self, name: str, **kwargs) -> LocalKnowledgeBase:
+        kb = LocalKnowledgeBase(name, studio=self, **self.kb_options)
+        self._kbs[kb.id] = kb
+        return kb
+
+    def get_knowledge_base(self, kb_id: str) -> LocalKnowledgeBase:
+        return self._kbs[kb_id]
+
+    def list_knowledge_bases(self) -> List[LocalKnowledgeBase]:
+        return list(self._kbs.values())
+
+
+# ── benchmark ─────────────────────────────────────────────────────────────────
+def _synthetic_corpus(n: int, words_per_chunk: int = 120, vocab: int = 50_000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocab)])
+    # Zipf-like like real text; the long tail wraps round the vocabulary instead
+    # of piling up on the last word.
+    ids = (rng.zipf(1.2, size=n * words_per_chunk) - 1) % vocab
+    for i in range(n):
+        yield " ".join(words[ids[i * words_per_chunk:(i + 1) * words_per_chunk]]), f"doc-{i}"
+
+
+def benchmark(sizes: Sequence[int], queries: int = 200, top_k: int = 5,
+              batch: int = 32) -> List[dict]:
+    """Ingest rate, query latency and recall@``top_k`` per corpus size.
+
+    Each probe is the first six words of a random chunk; recall is the share
+    of probes whose source chunk is in the top-k.
+    """
+    from lyzr_kit.bench import summarize
+
+    rows = []
+    for size in sizes:
+        # chunk_size large enough that each synthetic document is one chunk
+        kb = LocalKnowledgeBase("bench", chunk_size=10_000)
+        corpus = _synthetic_corpus(size)
+        start = time.perf_counter()
+        while True:
+            block = list(itertools.islice(corpus, 10_000))
+            if not block:
+                break
+            kb.add_texts(block)
+        ingest = time.perf_counter() - start
+        targets = np.random.default_rng(1).integers(0, size, queries)
+        probes = [" ".join(kb._row_text[i].split()[:6]) for i in targets]
+
+        single, found = [], 0
+        for q, target in zip(probes, targets):
+            t0 = time.perf_counter()
+            hits = kb.query(q, top_k=top_k)
+            single.append(time.perf_counter() - t0)
+            found += any(h.source == f"doc-{target}" for h in hits)
+        t0 = time.perf_counter()
+        for i in range(0, len(probes), batch):
+            kb.query_batch(probes[i:i + batch], top_k=top_k)
+        batched = (time.perf_counter() - t0) / len(probes)
+
+        kb.delete_documents([d.id for d in kb.list_documents()[: size // 10]])
+        t0 = time.perf_counter()
+        kb.query(probes[0], top_k=top_k)
+        after_delete = time.perf_counter() - t0
+
+        rows.append({"chunks": size, "ingest_per_sec": size / ingest,
+                     "query": summarize(single), "batched_per_query": batched,
+                     f"recall_at_{top_k}": found / len(probes),
+                     "query_after_10pct_delete": after_delete,
+                     "index_mb": sum(s.terms.nbytes + s.starts.nbytes + s.rows.nbytes + s.tf.nbytes
+                                     for s in kb._segments) / 2 ** 20})
+    return rows
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local NumPy knowledge base.")
+    parser.add_argument("--bench", action="store_true", help="query latency and recall vs corpus size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.bench:
+        parser.print_help()
+        return 0
+
+    rows = benchmark(args.sizes, args.queries, args.top_k)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"\nLocal KB benchmark (BM25, top_k={args.top_k}, {args.queries} queries per size)")
+    print("=" * 88)
+    print(f"{'chunks':>9} {'ingest/s':>10} {'p50':>9} {'p95':>9} {'p99':>9} "
+          f"{'batched':>9} {f'recall@{args.top_k}':>9} {'index MB':>9}")
+    for r in rows:
+        q = r["query"]
+        print(f"{r['chunks']:>9} {r['ingest_per_sec']:>10.0f} {q['p50'] * 1000:>7.2f}ms "
+              f"{q['p95'] * 1000:>7.2f}ms {q['p99'] * 1000:>7.2f}ms "
+              f"{r['batched_per_query'] * 1000:>7.2f}ms {r[f'recall_at_{args.top_k}']:>9.3f} "
+              f"{r['index_mb']:>9.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+"""Headless, parallel execution of the lesson notebooks with per-cell profiling and caching.
+
+The lesson notebooks are plain Python apart from ``!pip`` lines, so each
+one is executed in its own worker process (a process pool runs several
+notebooks at once) by ``exec``-ing its code cells in a shared namespace, the
+way a kernel would. For every cell we record wall time, peak Python memory
+(``tracemalloc``) and captured output.
+
+* **Skipped cells** — interactive cells (calling ``input()``) and exercise
+  cells (``# TODO`` placeholders) are not run; ``!`` shell lines and ``%``
+  magics are dropped.
+* **Caching** — a cell's key hashes its source together with the keys of
+  the earlier cells that define or mutate the names it uses (static
+  analysis), so it changes whenever the cell *or anything upstream of it*
+  changes. Cells whose key is cached replay their stored output instead of
+  running, unless a cell that does run needs the state they build, in which
+  case they run too. A re-run therefore executes only what changed plus the
+  setup it depends on.
+* **Report** — per-notebook status, executed vs. cached time and peak
+  memory, and the slowest cells across all lessons.
+
+A failing cell stops its notebook (later cells are reported as not run).
+
+    python -m lyzr_kit.notebooks                      # all notebooks, 4 processes
+    python -m lyzr_kit.notebooks notebooks/07_*.ipynb -j 2 --report nb_report.json
+    python -m lyzr_kit.notebooks --no-cache --output-dir executed/
+"""
+
+import ast
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+import tracemalloc
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set
+
+CACHE_VERSION = "1"
+
+
+# ── cell analysis ─────────────────────────────────────────────────────────────
+@dataclass
+class Cell:
+    index: int
+    source: str                   # runnable code (shell lines and magics removed)
+    skip: Optional[str] = None    # reason the cell is not run
+    reads: Set[str] = field(default_factory=set)
+    writes: Set[str] = field(default_factory=set)
+    deps: List[int] = field(default_factory=list)
+    key: str = ""
+
+
+def _code(source: str) -> str:
+    return "\n".join("" if line.lstrip().startswith(("!", "%")) else line for line in source.splitlines())
+
+
+def _root(node) -> Optional[str]:
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def analyse(index: int, source: str) -> Cell:
+    """Which names a cell reads and writes; writes include objects it mutates (``x.y(...)``, ``x[k] = v``)."""
+    cell = Cell(index, _code(source))
+    if source.lstrip().startswith("%%"):
+        cell.skip = "cell magic"
+        return cell
+    if "# TODO" in source:
+        cell.skip = "TODO exercise"
+        return cell
+    try:
+        tree = ast.parse(cell.source)
+    except SyntaxError as e:
+        cell.skip = f"syntax error: {e.msg}"
+        return cell
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (cell.writes if isinstance(node.ctx, (ast.Store, ast.Del)) else cell.reads).add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            cell.writes.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                cell.writes.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id == "input":
+                cell.skip = "interactive input()"
+            elif isinstance(node.func, ast.Attribute):
+                root = _root(node.func.value)
+                if root:
+                    cell.writes.add(root)
+        elif isinstance(node, (ast.Assign, ast.AugAssign, ast.AnnAssign)):
+            for target in getattr(node, "targets", None) or [node.target]:
+                if isinstance(target, (ast.Attribute, ast.Subscript)) and _root(target):
+                    cell.writes.add(_root(target))
+    return cell
+
+
+def plan(sources: List[str], salt: str = "") -> List[Cell]:
+    """Analyse cells and chain their keys through the cells they depend on."""
+    cells, last_writer = [], {}
+    for index, source in enumerate(sources):
+        cell = analyse(index, source)
+        if cell.skip is None:
+            cell.deps = sorted({last_writer[n] for n in cell.reads | cell.writes if n in last_writer})
+            upstream = [cells[d].key for d in cell.deps]
+            cell.key = hashlib.sha256(json.dumps([CACHE_VERSION, salt, cell.source, upstream])
+                                      .encode("utf-8")).hexdigest()
+            for name in cell.writes:
+                last_writer[name] = index
+        cells.append(cell)
+    return cells
+
+
+def to_run(cells: List[Cell], cached: Set[str]) -> Set[int]:
+    """Cells that must execute: cache misses plus everything they depend on."""
+    need = [c.index for c in cells if c.skip is None and c.key not in cached]
+    run: Set[int] = set()
+    while need:
+        i = need.pop()
+        if i not in run:
+            run.add(i)
+            need.extend(cells[i].deps)
+    return run
+
+
+# ── cache ─────────────────────────────────────────────────────────────────────
+class CellCache:
+    """Cell outputs by key, in one SQLite file shared by the worker processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._conn() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS cells (key TEXT PRIMARY KEY, notebook TEXT, cell INTEGER, "
+                       "output TEXT, seconds REAL, peak_bytes INTEGER, created REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_many(self, keys) -> Dict[str, tuple]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        with contextlib.closing(self._conn()) as db:
+            rows = db.execute(f"SELECT key, output, seconds, peak_bytes FROM cells WHERE key IN "
+                              f"({','.join('?' * len(keys))})", keys).fetchall()
+        return {r[0]: r[1:] for r in rows}
+
+    def put(self, key: str, notebook: str, cell: int, output: str, seconds: float, peak: int):
+        with contextlib.closing(self._conn()) as db, db:
+            db.execute("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (key, notebook, cell, output, seconds, peak, time.time()))
+
+
+# ── execution (runs in a worker process) ──────────────────────────────────────
+@dataclass
+class CellResult:
+    index: int
+    status: str                  # ran | cached | skipped | failed | not run
+    seconds: float = 0.0         # for cached cells: the time of the run that was cached
+    peak_bytes: int = 0
+    output: str = ""
+    note: str = ""
+
+
+@dataclass
+class NotebookResult:
+    path: str
+    status: str = "ok"
+    seconds: float = 0.0             # wall time of this run
+    cells: List[CellResult] = field(default_factory=list)
+    peak_rss_bytes: int = 0
+    error: Optional[str] = None
+
+    @property
+    def executed_s(self) -> float:
+        return sum(c.seconds for c in self.cells if c.status in ("ran", "failed"))
+
+    @property
+    def cached_s(self) -> float:
+        return sum(c.seconds for c in self.cells if c.status == "cached")
+
+
+class _CellTimeout(Exception):
+    pass
+
+
+def _exec(source: str, namespace: dict):
+    """Run a cell like a kernel would: echo the value of a trailing expression."""
+    tree = ast.parse(source)
+    last = tree.body[-1] if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    if last is not None:
+        tree.body.pop()
+    exec(compile(tree, "<cell>", "exec"), namespace)
+    if last is not None:
+        value = eval(compile(ast.Expression(last.value), "<cell>", "eval"), namespace)
+        if value is not None:
+            print(repr(value))
+
+
+def _on_alarm(signum, frame):
+    raise _CellTimeout()
+
+
+def _peak_rss() -> int:
+    try:
+        import resource
+    except ImportError:          # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_notebook(path: str, cache_path: Optional[str] = None, timeout: float = 600.0,
+                 salt: str = "") -> NotebookResult:
+    """Execute one notebook; meant to run in its own process."""
+    start = time.perf_counter()
+    result = NotebookResult(path)
+    with open(path, encoding="utf-8") as f:
+        nb = json.load(f)
+    sources = ["".join(c["source"]) if c["cell_type"] == "code" else None for c in nb["cells"]]
+    code = [(i, s) for i, s in enumerate(sources) if s is not None]
+    cells = plan([s for _, s in code], salt)
+    cache = CellCache(cache_path) if cache_path else None
+    cached = cache.get_many(c.key for c in cells if c.key) if cache else {}
+    run = to_run(cells, set(cached))
+
+    namespace = {"__name__": "__main__"}
+    name = os.path.basename(path)
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(os.path.abspath(path)))
+    use_alarm = hasattr(signal, "SIGALRM") and timeout
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+    tracemalloc.start()
+    try:
+        failed = False
+        for cell, (nb_index, _) in zip(cells, code):
+            if cell.skip is not None:
+                result.cells.append(CellResult(nb_index, "skipped", note=cell.skip))
+                continue
+            if failed:
+                result.cells.append(CellResult(nb_index, "not run"))
+                continue
+            if cell.index not in run:
+                output, seconds, peak = cached[cell.key]
+                result.cells.append(CellResult(nb_index, "cached", seconds, peak, output))
+                continue
+            out = io.StringIO()
+            before = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            t0 = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+                    _exec(cell.source, namespace)
+                status, note = "ran", ""
+            except _CellTimeout:
+                status, note = "failed", f"timed out after {timeout:.0f}s"
+            except BaseException as e:     # SystemExit / KeyboardInterrupt from a cell too
+                status = "failed"
+                note = f"{type(e).__name__}: {e}"
+                out.write(traceback.format_exc())
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            seconds = time.perf_counter() - t0
+            peak = max(0, tracemalloc.get_traced_memory()[1] - before)
+            result.cells.append(CellResult(nb_index, status, seconds, peak, out.getvalue(), note))
+            if status == "failed":
+                failed = True
+                result.status = "failed"
+                result.error = f"cell {nb_index}: {note}"
+            elif cache is not None:
+                cache.put(cell.key, name, nb_index, out.getvalue(), seconds, peak)
+    finally:
+        tracemalloc.stop()
+        os.chdir(cwd)
+    result.seconds = time.perf_counter() - start
+    result.peak_rss_bytes = _peak_rss()
+    return result
+
+
+def write_executed(result: NotebookResult, output_dir: str) -> str:
+    """Copy of the notebook with each cell's captured output as a stream output."""
+    with open(result.path, encoding="utf-8") as f:
+        nb = json.load(f)
+    for n, cell in enumerate(result.cells, 1):
+        target = nb["cells"][cell.index]
+        target["execution_count"] = n if cell.status in ("ran", "cached", "failed") else None
+        target["outputs"] = [{"output_type": "stream", "name": "stdout", "text": cell.output}] if cell.output else []
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, os.path.basename(result.path))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(nb, f, indent=1, ensure_ascii=False)
+    return path
+
+
+# ── driver & report ───────────────────────────────────────────────────────────
+def run_all(paths: List[str], workers: int = 4, cache_path: Optional[str] = None,
+            timeout: float = 600.0, on_done=None) -> List[NotebookResult]:
+    """Run notebooks in a process pool; results come back in ``paths`` order."""
+    salt = _environment()
+    results: Dict[str, NotebookResult] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_notebook, p, cache_path, timeout, salt): p for p in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:        # the worker itself died
+                result = NotebookResult(path, status="failed", error=f"{type(e).__name__}: {e}")
+            results[path] = result
+            if on_done is not None:
+                on_done(result)
+    return [results[p] for p in paths]
+
+
+def _environment() -> str:
+    """Part of every cache key: outputs depend on the interpreter and SDK version."""
+    try:
+        from importlib.metadata import version
+        sdk = version("lyzr-adk")
+    except Exception:
+        sdk = "?"
+    return f"py{sys.version_info[0]}.{sys.version_info[1]} lyzr-adk {sdk}"
+
+
+def report(results: List[NotebookResult], wall: float, top: int = 10) -> dict:
+    cells = [(os.path.basename(r.path), c) for r in results for c in r.cells]
+    slowest = sorted((x for x in cells if x[1].status in ("ran", "failed", "cached")),
+                     key=lambda x: x[1].seconds, reverse=True)[:top]
+    counts: Dict[str, int] = {}
+    for _, c in cells:
+        counts[c.status] = counts.get(c.status, 0) + 1
+    executed = sum(r.executed_s for r in results)
+    return {
+        "notebooks": len(results),
+        "passed": sum(1 for r in results if r.status == "ok"),
+        "wall_s": wall,
+        "executed_s": executed,
+        "saved_by_cache_s": sum(r.cached_s for r in results),
+        "cells": counts,
+        "lessons": [{"notebook": os.path.basename(r.path), "status": r.status, "wall_s": r.seconds,
+                     "executed_s": r.executed_s, "cached_s": r.cached_s,
+                     "share": r.executed_s / executed if executed else 0.0,
+                     "peak_rss_mb": r.peak_rss_bytes / 1e6, "error": r.error}
+                    for r in sorted(results, key=lambda r: r.executed_s, reverse=True)],
+        "slowest_cells": [{"notebook": nb, "cell": c.index, "status": c.status, "seconds": c.seconds,
+                           "peak_mb": c.peak_bytes / 1e6} for nb, c in slowest],
+        "results": [asdict(r) for r in results],
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the lesson notebooks headless with per-cell profiling.")
+    parser.add_argument("paths", nargs="*", help="notebooks (default: notebooks/*.ipynb)")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="notebooks run in parallel")
+    parser.add_argument("--cache", default=os.path.join(".nbcache", "cells.sqlite"),
+                        help="cell output cache (SQLite)")
+    parser.add_argument("--no-cache", action="store_true", help="execute every cell")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds per cell")
+    parser.add_argument("--top", type=int, default=10, help="slowest cells to list")
+    parser.add_argument("--report", help="write the full report (JSON) here")
+    parser.add_argument("--output-dir", help="write executed notebooks (with outputs) here")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or sorted(glob.glob(os.path.join("notebooks", "*.ipynb")))
+    if not paths:
+        parser.error("no notebooks found")
+    cache_path = None
+    if not args.no_cache:
+        os.makedirs(os.path.dirname(args.cache) or ".", exist_ok=True)
+        cache_path = os.path.abspath(args.cache)
+        CellCache(cache_path)        # create the table before the workers race to
+
+    def progress(r: NotebookResult):
+        ran = sum(1 for c in r.cells if c.status == "ran")
+        hit = sum(1 for c in r.cells if c.status == "cached")
+        mark = "✅" if r.status == "ok" else "❌"
+        print(f"  {mark} {os.path.basename(r.path):<42} {r.seconds:7.2f}s  ({ran} ran, {hit} cached)"
+              + (f"  {r.error}" if r.error else ""), flush=True)
+
+    print(f"\nRunning {len(paths)} notebooks on {args.workers} processes")
+    print("=" * 60)
+    start = time.perf_counter()
+    results = run_all(paths, args.workers, cache_path, args.timeout, on_done=progress)
+    rep = report(results, time.perf_counter() - start, args.top)
+
+    if args.output_dir:
+        for r in results:
+            if r.cells:
+                write_executed(r, args.output_dir)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=2, ensure_ascii=False)
+
+    print(f"\n{rep['passed']}/{rep['notebooks']} notebooks passed in {rep['wall_s']:.1f}s wall "
+          f"({rep['executed_s']:.1f}s executed, {rep['saved_by_cache_s']:.1f}s served from cache)")
+    print("Cells: " + ", ".join(f"{n} {status}" for status, n in sorted(rep["cells"].items())))
+    print("\nBy lesson (executed time):")
+    for lesson in rep["lessons"]:
+        print(f"  {lesson['notebook']:<42} {lesson['executed_s']:7.2f}s  {lesson['share']:5.1%}  "
+              f"peak RSS {lesson['peak_rss_mb']:6.1f} MB")
+    print("\nSlowest cells:")
+    for c in rep["slowest_cells"]:
+        print(f"  {c['notebook']:<42} cell {c['cell']:>3}  {c['seconds']:7.2f}s  "
+              f"peak {c['peak_mb']:6.1f} MB{'  (cached)' if c['status'] == 'cached' else ''}")
+    return 0 if rep["passed"] == rep["notebooks"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
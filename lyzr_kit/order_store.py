@@ -0,0 +1,359 @@
+"""Indexed on-disk order and tracking store for the lesson 14 tools.
+
+The notebook's ``lookup_order`` / ``track_shipment`` read from in-memory
+``ORDERS`` / ``TRACKING_EVENTS`` dicts. :class:`OrderStore` serves the same
+data from a compact SQLite file instead, so it scales to millions of orders
+without loading them into every worker:
+
+* ``orders`` is a ``WITHOUT ROWID`` table clustered on the order id, with a
+  secondary index on the tracking number; ``events`` is clustered on
+  ``(tracking, seq)`` so one shipment's history is a single range scan;
+* connections are read-only, one per thread, with the file memory-mapped;
+* a small LRU hot-set cache (including "not found" answers) sits in front;
+* :meth:`OrderStore.get_orders` answers several ids in one query.
+
+:func:`make_tools` returns ``lookup_order`` / ``lookup_orders`` /
+``track_shipment`` functions backed by a store, ready for ``add_tool``.
+
+    python -m lyzr_kit.order_store --bench --orders 10000000
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    status   TEXT NOT NULL,
+    delivery TEXT,
+    carrier  TEXT,
+    tracking TEXT
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    tracking    TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (tracking, seq)
+) WITHOUT ROWID;
+"""
+INDEXES = "CREATE INDEX IF NOT EXISTS orders_tracking ON orders (tracking);"
+
+_MISSING = object()     # cached "not found"
+_BATCH = 500            # ids per IN (...) query, well under SQLite's variable limit
+
+
+@dataclass(frozen=True)
+class Order:
+    order_id: str
+    status: str
+    delivery: Optional[str]
+    carrier: Optional[str]
+    tracking: Optional[str]
+
+
+@dataclass
+class StoreStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def _key(value: str) -> str:
+    return value.strip().upper()
+
+
+# ── building ──────────────────────────────────────────────────────────────────
+def build(path: str, orders: Iterable[Tuple[str, str, str, str, str]],
+          events: Iterable[Tuple[str, int, str]] = (), batch: int = 100_000) -> str:
+    """Write a store at ``path`` from ``(order_id, status, delivery, carrier,
+    tracking)`` and ``(tracking, seq, description)`` rows.
+
+    Rows are streamed in batches, and the tracking index is created after the
+    bulk insert, which is several times faster than maintaining it row by row.
+    """
+    db = sqlite3.connect(path)
+    try:
+        db.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + SCHEMA)
+        for table, rows, width in (("orders", orders, 5), ("events", events, 3)):
+            sql = f"INSERT OR REPLACE INTO {table} VALUES ({', '.join('?' * width)})"
+            buf = []
+            for row in rows:
+                buf.append(row)
+                if len(buf) >= batch:
+                    db.executemany(sql, buf)
+                    buf.clear()
+            if buf:
+                db.executemany(sql, buf)
+            db.commit()
+        db.executescript(INDEXES + "ANALYZE;")
+    finally:
+        db.close()
+    return path
+
+
+def build_from_dicts(path: str, orders: Dict[str, dict],
+                     tracking_events: Optional[Dict[str, List[str]]] = None) -> str:
+    """Build from the notebook-style ``ORDERS`` / ``TRACKING_EVENTS`` dicts."""
+    return build(
+        path,
+        ((_key(oid), o["status"], o.get("delivery"), o.get("carrier"), o.get("tracking"))
+         for oid, o in orders.items()),
+        ((_key(tn), seq, text) for tn, evs in (tracking_events or {}).items()
+         for seq, text in enumerate(evs)))
+
+
+def synthetic(n: int, events_per_order: int = 3, seed: int = 0):
+    """``n`` fake orders ``ORD-0000000…`` plus tracking events, for benchmarks."""
+    rng = random.Random(seed)
+    carriers = (("FedEx", "FX"), ("UPS", "UP"), ("DHL", "DH"))
+    statuses = ("processing", "shipped", "delivered")
+
+    def orders():
+        for i in range(n):
+            carrier, prefix = carriers[i % 3]
+            yield (f"ORD-{i:07d}", statuses[rng.randrange(3)],
+                   f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}", carrier, f"{prefix}{i:08d}")
+
+    def events():
+        for i in range(n):
+            tracking = f"{carriers[i % 3][1]}{i:08d}"
+            for seq in range(events_per_order):
+                yield tracking, seq, f"2026-02-{20 + seq:02d} 09:00 — Scan {seq + 1}"
+    return orders(), events()
+
+
+# ── reading ───────────────────────────────────────────────────────────────────
+class OrderStore:
+    """Read-only, thread-safe order/tracking lookups with a hot-set cache."""
+
+    def __init__(self, path: str, hot_size: int = 4096, mmap_bytes: int = 1 << 30):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.hot_size = hot_size
+        self.mmap_bytes = mmap_bytes
+        self.stats = StoreStats()
+        self._hot: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []   # every thread's connection, for close()
+        self._generation = 0                          # bumped by close() so threads reconnect
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                   check_same_thread=False, cached_statements=64)
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            conn.execute("PRAGMA query_only=1")
+            with self._lock:
+                self._conns.append(conn)
+                self._local.generation = self._generation
+            self._local.conn = conn
+        return conn
+
+    # ── hot set ───────────────────────────────────────────────────────────────
+    def _cached(self, kind: str, key: str):
+        with self._lock:
+            value = self._hot.get((kind, key))
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self._hot.move_to_end((kind, key))
+            self.stats.hits += 1
+            return value
+
+    def _remember(self, kind: str, key: str, value):
+        if not self.hot_size:
+            return
+        with self._lock:
+            self._hot[(kind, key)] = _MISSING if value is None else value
+            self._hot.move_to_end((kind, key))
+            while len(self._hot) > self.hot_size:
+                self._hot.popitem(last=False)
+
+    # ── lookups ───────────────────────────────────────────────────────────────
+    def get_order(self, order_id: str) -> Optional[Order]:
+        key = _key(order_id)
+        hit = self._cached("order", key)
+        if hit is not None:
+            return None if hit is _MISSING else hit
+        row = self._conn().execute(
+            "SELECT order_id, status, delivery, carrier, tracking FROM orders WHERE order_id = ?",
+            (key,)).fetchone()
+        order = Order(*row) if row else None
+        self._remember("order", key, order)
+        return order
+
+    def get_orders(self, order_ids: Sequence[str]) -> Dict[str, Optional[Order]]:
+        """Batch lookup; the result maps every requested id (normalised) to an order or None."""
+        keys = list(dict.fromkeys(_key(o) for o in order_ids))
+        found: Dict[str, Optional[Order]] = {}
+        todo = []
+        for key in keys:
+            hit = self._cached("order", key)
+            if hit is None:
+                todo.append(key)
+            else:
+                found[key] = None if hit is _MISSING else hit
+        conn = self._conn()
+        for i in range(0, len(todo), _BATCH):
+            part = todo[i:i + _BATCH]
+            rows = conn.execute(
+                "SELECT order_id, status, delivery, carrier, tracking FROM orders "
+                f"WHERE order_id IN ({', '.join('?' * len(part))})", part).fetchall()
+            by_id = {r[0]: Order(*r) for r in rows}
+            for key in part:
+                found[key] = by_id.get(key)
+                self._remember("order", key, found[key])
+        return {key: found[key] for key in keys}
+
+    def order_by_tracking(self, tracking: str) -> Optional[Order]:
+        row = self._conn().execute(
+            "SELECT order_id, status, delivery, carrier, tracking FROM orders WHERE tracking = ?",
+            (_key(tracking),)).fetchone()
+        return Order(*row) if row else None
+
+    def tracking_events(self, tracking: str) -> List[str]:
+        key = _key(tracking)
+        hit = self._cached("events", key)
+        if hit is not None:
+            return [] if hit is _MISSING else list(hit)
+        events = tuple(r[0] for r in self._conn().execute(
+            "SELECT description FROM events WHERE tracking = ? ORDER BY seq", (key,)))
+        self._remember("events", key, events or None)
+        return list(events)
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT count(*) FROM orders").fetchone()[0]
+
+    def close(self):
+        """Close every thread's connection; later lookups open fresh ones."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._generation += 1
+        for conn in conns:
+            conn.close()
+
+
+# ── agent tools ───────────────────────────────────────────────────────────────
+def format_order(order_id: str, order: Optional[Order]) -> str:
+    if order is None:
+        return f"Order {order_id} not found. Please verify the order ID and try again."
+    return (f"Order {order.order_id}: {order.status} via {order.carrier} "
+            f"(tracking: {order.tracking}), estimated delivery: {order.delivery}")
+
+
+def make_tools(store: OrderStore) -> Tuple[Callable[[str], str], ...]:
+    """``(lookup_order, lookup_orders, track_shipment)`` backed by ``store``."""
+
+    def lookup_order(order_id: str) -> str:
+        """Look up a customer order by order ID and return its current status.
+
+        Returns the shipping status, carrier name, tracking number, and estimated delivery date.
+        Use this whenever a customer asks about the status, location, or delivery date of their order.
+        Order IDs follow the format ORD-XXXX.
+        """
+        return format_order(order_id.strip().upper(), store.get_order(order_id))
+
+    def lookup_orders(order_ids: str) -> str:
+        """Look up several customer orders at once.
+
+        Pass the order IDs as a comma-separated list, e.g. "ORD-1001, ORD-1002".
+        Use this instead of calling lookup_order repeatedly when a customer asks about
+        more than one order in the same message. Returns one status line per order.
+        """
+        ids = [o for o in order_ids.replace(";", ",").split(",") if o.strip()]
+        return "\n".join(format_order(k, v) for k, v in store.get_orders(ids).items())
+
+    def track_shipment(tracking_number: str) -> str:
+        """Get the full tracking history for a shipment by its tracking number.
+
+        Returns every scan event in chronological order (pickup, transit, out for delivery).
+        Use this when a customer gives a tracking number such as FX123456 and asks where
+        the package is or what happened to it.
+        """
+        events = store.tracking_events(tracking_number)
+        if not events:
+            return f"No tracking events found for {tracking_number.strip().upper()}."
+        return f"Tracking {tracking_number.strip().upper()}:\n" + "\n".join(f"- {e}" for e in events)
+
+    return lookup_order, lookup_orders, track_shipment
+
+
+# ── benchmark ─────────────────────────────────────────────────────────────────
+def benchmark(store: OrderStore, n: int, lookups: int = 100_000, batch: int = 10,
+              active: int = 1000, seed: int = 1) -> Dict[str, dict]:
+    from lyzr_kit.bench import summarize
+
+    rng = random.Random(seed)
+    ids = lambda: f"ORD-{rng.randrange(n):07d}"
+    hot_ids = [ids() for _ in range(active)]
+
+    def timed(fn, make) -> dict:
+        samples = []
+        for _ in range(lookups):
+            arg = make()
+            t0 = time.perf_counter()
+            fn(arg)
+            samples.append(time.perf_counter() - t0)
+        return summarize(samples)
+
+    store.hot_size = 0
+    cold = timed(store.get_order, ids)
+    events = timed(store.tracking_events, lambda: f"{('FX', 'UP', 'DH')[rng.randrange(3)]}"
+                                                  f"{rng.randrange(n):08d}")
+    batched = timed(store.get_orders, lambda: [ids() for _ in range(batch)])
+    store.hot_size = 4096
+    store.stats = StoreStats()
+    # Skewed traffic: 80% of lookups hit a small set of "active" orders.
+    hot = timed(store.get_order, lambda: rng.choice(hot_ids) if rng.random() < 0.8 else ids())
+    return {"uniform": cold, "tracking_events": events, f"batch_of_{batch}": batched,
+            "skewed_with_hot_set": hot}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Indexed order/tracking store.")
+    parser.add_argument("--path", default="orders.sqlite")
+    parser.add_argument("--bench", action="store_true", help="run lookup microbenchmarks")
+    parser.add_argument("--orders", type=int, default=10_000_000,
+                        help="synthetic orders to generate if --path doesn't exist")
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"Building {args.orders:,} synthetic orders at {args.path} ...")
+        t0 = time.perf_counter()
+        build(args.path, *synthetic(args.orders))
+        print(f"  built in {time.perf_counter() - t0:.0f}s, "
+              f"{os.path.getsize(args.path) / 2 ** 20:.0f} MB")
+    store = OrderStore(args.path)
+    n = store.count()
+    if not args.bench:
+        print(f"{args.path}: {n:,} orders")
+        return 0
+
+    print(f"\nOrder store lookups — {n:,} orders, {args.lookups:,} lookups per case")
+    print("=" * 70)
+    for name, s in benchmark(store, n, args.lookups).items():
+        print(f"{name:<22} p50 {s['p50'] * 1e6:7.1f}µs  p95 {s['p95'] * 1e6:7.1f}µs  "
+              f"p99 {s['p99'] * 1e6:7.1f}µs  max {s['max'] * 1e6:8.1f}µs")
+    print(f"hot-set hit rate: {store.stats.hit_rate:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
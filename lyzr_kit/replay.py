@@ -0,0 +1,575 @@
+"""Record/replay transport for the Studio HTTP API.
+
+The lyzr SDK talks to Studio through ``httpx``. :func:`install` patches
+httpx's transports so that every exchange (agent CRUD, ``run``, streaming
+chunks, knowledge bases, contexts, RAI policies) is either
+
+* **recorded** into a cassette (a JSON file) while going to the network, or
+* **replayed** from that cassette by an in-process transport, with no
+  network and no API key.
+
+Cassettes never contain secrets: request headers are not stored at all, and
+API keys, bearer tokens and fields like ``api_key`` / ``token`` / ``password``
+in bodies and URLs are replaced with ``***``.
+
+IDs change on every live run (server-assigned agent / KB / context / policy
+ids, the SDK's random ``session_…`` / ``user_…`` ids, your own ``uuid4()``
+sessions). The cassette stores them as numbered placeholders such as
+``{{oid:3}}``; on replay each placeholder becomes a stable synthetic id
+(``000…003``) and ids your code generates are bound to the recorded ones on
+first use. Requests are matched on method, URL and canonical JSON body;
+identical requests are answered in recording order. Nothing ties a request
+to the code that made it, so record and replay must issue requests in the
+same order — run suites serially while a cassette is active (validate.py
+drops to one worker).
+
+A request with no recorded match is a *drift*: replay fails that call and
+the drift report (``<cassette>.drift.json``, printed on :meth:`Cassette.close`)
+shows the closest recorded request and a diff. Recorded requests that were
+never made are reported as unused.
+
+    LYZR_RECORD=1 LYZR_CASSETTE=cassettes/validate.json LYZR_API_KEY=sk-... python validate.py
+    LYZR_CASSETTE=cassettes/validate.json python validate.py          # offline replay
+    python -m lyzr_kit.replay show cassettes/validate.json
+"""
+
+import base64
+import difflib
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx   # the lyzr SDK's HTTP client
+
+VERSION = 1
+
+# Values that differ between runs. Order matters: longer shapes first.
+ID_PATTERNS: Sequence[Tuple[str, "re.Pattern"]] = (
+    ("uuid", re.compile(r"(?<![0-9a-fA-F-])[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-"
+                        r"[0-9a-fA-F]{4}-[0-9a-fA-F]{12}(?![0-9a-fA-F-])")),
+    ("session", re.compile(r"\bsession_[0-9a-f]{16}\b")),       # SDK default session ids
+    ("user", re.compile(r"\buser_[0-9a-f]{16}\b")),
+    ("oid", re.compile(r"(?<![0-9a-fA-F])[0-9a-f]{24}(?![0-9a-fA-F])")),   # Mongo ObjectIds
+)
+# JSON fields whose values are random per run and irrelevant to matching
+# (the SDK appends a random suffix to a KB's collection_name).
+VOLATILE_FIELDS = ("collection_name",)
+SECRET_FIELDS = re.compile(r"api[_-]?key|token|secret|password|authorization|credential",
+                           re.IGNORECASE)
+SECRET_VALUES = (re.compile(r"\bsk-[A-Za-z0-9_-]{8,}"), re.compile(r"\bBearer\s+[A-Za-z0-9._~+/=-]+"))
+KEPT_HEADERS = ("content-type",)
+
+_PLACEHOLDER = re.compile(r"\{\{(\w+):(\d+|\?)\}\}")
+_ANY_ID = re.compile("|".join(f"(?:{pattern.pattern})" for _, pattern in ID_PATTERNS))
+_UNKNOWN = "?"
+
+
+def _synthetic(kind: str, n: int) -> str:
+    """Stable replay value for placeholder ``{{kind:n}}``."""
+    if kind == "uuid":
+        return f"00000000-0000-4000-8000-{n:012x}"
+    if kind in ("session", "user"):
+        return f"{kind}_{n:016x}"
+    return f"{n:024x}"
+
+
+# ── scrubbing & canonical form ────────────────────────────────────────────────
+def _scrub_json(value):
+    if isinstance(value, dict):
+        return {k: ("***" if SECRET_FIELDS.search(k) and isinstance(v, str) else
+                    "{{volatile}}" if k in VOLATILE_FIELDS else _scrub_json(v))
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [_scrub_json(v) for v in value]
+    return value
+
+
+def _scrub_text(text: str) -> str:
+    for pattern in SECRET_VALUES:
+        text = pattern.sub("***", text)
+    return text
+
+
+def _canonical_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(k, "***" if SECRET_FIELDS.search(k) else v) for k, v in parse_qsl(parts.query, True)]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(query)), ""))
+
+
+def _canonical_body(content: bytes, content_type: str) -> str:
+    if not content:
+        return ""
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        return "base64:" + base64.b64encode(content).decode("ascii")
+    if "json" in content_type or text[:1] in "{[":
+        try:
+            return json.dumps(_scrub_json(json.loads(text)), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            pass
+    return _scrub_text(text)
+
+
+def _encode_chunk(chunk: bytes) -> str:
+    try:
+        return chunk.decode("utf-8")
+    except UnicodeDecodeError:
+        return "base64:" + base64.b64encode(chunk).decode("ascii")
+
+
+def _decode_chunk(text: str) -> bytes:
+    if text.startswith("base64:"):
+        return base64.b64decode(text[7:])
+    return text.encode("utf-8")
+
+
+# ── id rewriting ──────────────────────────────────────────────────────────────
+class IdMap:
+    """Real (or synthetic) ids ↔ cassette placeholders."""
+
+    def __init__(self):
+        self.to_placeholder: Dict[str, str] = {}
+        self.to_value: Dict[str, str] = {}
+        self._counter = 0
+        self._lock = threading.RLock()
+
+    def bind(self, value: str, placeholder: str):
+        with self._lock:
+            self.to_placeholder[value] = placeholder
+            self.to_value[placeholder] = value
+
+    def new(self, kind: str, value: str) -> str:
+        with self._lock:
+            self._counter += 1
+            placeholder = "{{%s:%d}}" % (kind, self._counter)
+            self.bind(value, placeholder)
+            return placeholder
+
+    def reserve(self, numbers: Sequence[int]):
+        """Make :meth:`new` number past every placeholder already in a cassette."""
+        with self._lock:
+            self._counter = max([self._counter, *numbers])
+
+    def normalize(self, text: str, assign: bool) -> str:
+        """Replace ids with placeholders; unknown ones become ``{{kind:?}}`` unless ``assign``."""
+        for kind, pattern in ID_PATTERNS:
+            def sub(m, kind=kind):
+                value = m.group(0)
+                with self._lock:
+                    known = self.to_placeholder.get(value)
+                    if known is not None:
+                        return known
+                    if assign:
+                        return self.new(kind, value)
+                return "{{%s:%s}}" % (kind, _UNKNOWN)
+            text = pattern.sub(sub, text)
+        return text
+
+    def denormalize(self, text: str) -> str:
+        """Placeholders → values, minting stable synthetic ids for new ones."""
+        def sub(m):
+            placeholder = m.group(0)
+            with self._lock:
+                value = self.to_value.get(placeholder)
+                if value is None:
+                    value = _synthetic(m.group(1), int(m.group(2)))
+                    self.bind(value, placeholder)
+                return value
+        return _PLACEHOLDER.sub(sub, text)
+
+
+def _shape(text: str) -> str:
+    """``text`` with every placeholder reduced to its kind: the matching key."""
+    return _PLACEHOLDER.sub(lambda m: "{{%s}}" % m.group(1), text)
+
+
+def _placeholders(text: str) -> List[Tuple[str, str]]:
+    return [(m.group(1), m.group(2)) for m in _PLACEHOLDER.finditer(text)]
+
+
+# ── cassette ──────────────────────────────────────────────────────────────────
+class Cassette:
+    """Recorded exchanges plus the id map and drift log of the current run."""
+
+    def __init__(self, path: str, mode: str = "replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError("mode must be 'record' or 'replay'")
+        self.path = path
+        self.mode = mode
+        self.ids = IdMap()
+        self.interactions: List[dict] = []
+        self.drift: List[dict] = []
+        self._lock = threading.Lock()
+        self._queues: Dict[str, List[int]] = defaultdict(list)
+        self._used = set()
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != VERSION:
+                raise ValueError(f"{path}: unsupported cassette version {data.get('version')}")
+            self.interactions = data["interactions"]
+            numbers = []
+            for i, item in enumerate(self.interactions):
+                key = item["method"] + " " + _shape(item["url"]) + "\n" + _shape(item["body"])
+                self._queues[key].append(i)
+                numbers += [int(n) for _, n in _placeholders(item["url"] + item["body"])]
+            self.ids.reserve(numbers)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ── recording ─────────────────────────────────────────────────────────────
+    def normalize_request(self, method: str, url: str, content: bytes, content_type: str,
+                          assign: bool) -> Tuple[str, str]:
+        url = self.ids.normalize(_canonical_url(url), assign)
+        body = self.ids.normalize(_canonical_body(content, content_type), assign)
+        return url, body
+
+    def record(self, method: str, url: str, body: str, status: int, headers: Dict[str, str],
+               chunks: List[bytes], streamed: bool):
+        item = {"method": method, "url": url, "body": body, "status": status,
+                "headers": headers}
+        text = [self.ids.normalize(_scrub_text(_encode_chunk(c)), assign=True) for c in chunks]
+        if streamed:
+            item["chunks"] = text
+        else:
+            item["response"] = "".join(text)
+        with self._lock:
+            self.interactions.append(item)
+
+    # ── replay ────────────────────────────────────────────────────────────────
+    def match(self, method: str, url: str, content: bytes, content_type: str) -> dict:
+        """The next recorded interaction for this request, with ids bound; or a drift error."""
+        raw = _canonical_url(url) + _canonical_body(content, content_type)
+        live_url, live_body = self.normalize_request(method, url, content, content_type, assign=False)
+        key = method + " " + _shape(live_url) + "\n" + _shape(live_body)
+        live = _placeholders(live_url + live_body)
+        values = [m.group(0) for m in _ANY_ID.finditer(raw)]
+        with self._lock:
+            for i in self._queues.get(key, ()):
+                if i in self._used:
+                    continue
+                item = self.interactions[i]
+                bindings = self._align(live, values, _placeholders(item["url"] + item["body"]))
+                if bindings is not None:
+                    for value, placeholder in bindings.items():
+                        self.ids.bind(value, placeholder)
+                    self._used.add(i)
+                    return item
+            self._drift(method, live_url, live_body)
+        raise LookupError(f"no recorded response for {method} {live_url} (see {self.drift_path})")
+
+    def _align(self, live, values, recorded) -> Optional[Dict[str, str]]:
+        """New id bindings that make ``live`` equal ``recorded``, or None if they can't."""
+        bindings: Dict[str, str] = {}
+        for (_, number), value, (kind, rnumber) in zip(live, values, recorded):
+            placeholder = "{{%s:%s}}" % (kind, rnumber)
+            if number != _UNKNOWN:
+                if number != rnumber:
+                    return None
+            elif bindings.setdefault(value, placeholder) != placeholder:
+                return None
+            elif placeholder in self.ids.to_value:
+                return None            # already stands for another id of this run
+        if len(set(bindings.values())) != len(bindings):
+            return None
+        return bindings
+
+    def _drift(self, method: str, url: str, body: str):
+        request = f"{method} {url}\n{body}"
+        best, best_ratio = None, 0.0
+        for item in self.interactions:
+            if item["method"] != method:
+                continue
+            candidate = f"{item['method']} {item['url']}\n{item['body']}"
+            ratio = difflib.SequenceMatcher(None, _shape(candidate), _shape(request)).ratio()
+            if ratio > best_ratio:
+                best, best_ratio = candidate, ratio
+        entry = {"request": request, "closest": best, "similarity": round(best_ratio, 3)}
+        if best is not None:
+            entry["diff"] = list(difflib.unified_diff(
+                _pretty(_shape(best)), _pretty(_shape(request)), "recorded", "live", lineterm="", n=2))
+        self.drift.append(entry)
+        self._write_report()       # now, so it survives a crashing caller
+
+    # ── reporting ─────────────────────────────────────────────────────────────
+    @property
+    def drift_path(self) -> str:
+        return os.path.splitext(self.path)[0] + ".drift.json"
+
+    def unused(self) -> List[str]:
+        return [f"{item['method']} {item['url']}" for i, item in enumerate(self.interactions)
+                if i not in self._used]
+
+    def report(self) -> dict:
+        return {"cassette": self.path, "interactions": len(self.interactions),
+                "replayed": len(self._used), "drift": self.drift, "unused": self.unused()}
+
+    def _write_report(self) -> dict:
+        report = self.report()
+        if report["drift"] or report["unused"]:
+            with open(self.drift_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=1, ensure_ascii=False)
+        return report
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION, "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                       "interactions": self.interactions}, f, indent=1, ensure_ascii=False)
+
+    def close(self, verbose: bool = True):
+        """Write the cassette (record) or the drift report (replay, if anything drifted)."""
+        uninstall()
+        if self.mode == "record":
+            self.save()
+            if verbose:
+                print(f"Recorded {len(self.interactions)} exchanges to {self.path}")
+            return
+        report = self._write_report()
+        if verbose:
+            print(summary(report))
+
+
+def _pretty(request: str) -> List[str]:
+    head, _, body = request.partition("\n")
+    try:
+        body = json.dumps(json.loads(body), indent=1, sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        pass
+    return [head] + body.splitlines()
+
+
+def summary(report: dict) -> str:
+    lines = [f"Replay: {report['replayed']}/{report['interactions']} recorded exchanges used, "
+             f"{len(report['drift'])} drifted, {len(report['unused'])} unused"]
+    for entry in report["drift"][:10]:
+        closest = (f"closest recorded: {entry['similarity']:.0%} similar"
+                   if entry["closest"] else "nothing recorded for this method")
+        lines.append(f"  ✗ {entry['request'].splitlines()[0]}  ({closest})")
+        lines.extend("      " + line for line in entry.get("diff", [])[3:15])
+    for url in report["unused"][:10]:
+        lines.append(f"  – unused: {url}")
+    return "\n".join(lines)
+
+
+# ── httpx transport hooks ─────────────────────────────────────────────────────
+_active: Optional[Cassette] = None
+_originals: dict = {}
+
+
+def _read_raw(response) -> List[bytes]:
+    try:
+        return list(response.stream)
+    finally:
+        response.close()
+
+
+def _decoded(chunks: List[bytes], encoding: str) -> List[bytes]:
+    if encoding in ("gzip", "deflate"):
+        data = b"".join(chunks)
+        data = gzip.decompress(data) if encoding == "gzip" else zlib.decompress(data)
+        return [data]
+    return chunks
+
+
+def _replay_response(cassette: Cassette, request, asynchronous: bool):
+    content = request.read() if hasattr(request, "read") else request.content
+    try:
+        item = cassette.match(request.method, str(request.url), content,
+                              request.headers.get("content-type", ""))
+    except LookupError as e:
+        raise httpx.ConnectError(str(e), request=request) from None
+    if "chunks" in item:
+        chunks = [_decode_chunk(cassette.ids.denormalize(c)) for c in item["chunks"]]
+    else:
+        chunks = [_decode_chunk(cassette.ids.denormalize(item["response"]))]
+    stream = _AsyncChunks(chunks) if asynchronous else _Chunks(chunks)
+    return httpx.Response(item["status"], headers=item["headers"], stream=stream, request=request)
+
+
+class _Chunks(httpx.SyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+class _AsyncChunks(httpx.AsyncByteStream):
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def aclose(self):
+        pass
+
+
+def _record_request(cassette: Cassette, request):
+    content = request.read()
+    request.headers["accept-encoding"] = "identity"      # keep bodies scrubbable
+    url, body = cassette.normalize_request(request.method, str(request.url), content,
+                                           request.headers.get("content-type", ""), assign=True)
+    return url, body
+
+
+def _headers(response) -> Dict[str, str]:
+    return {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS}
+
+
+def _streamed(response) -> bool:
+    return "event-stream" in response.headers.get("content-type", "")
+
+
+def install(cassette: Cassette):
+    """Route every httpx request in this process through ``cassette``."""
+    global _active
+    uninstall()
+    _active = cassette
+    sync_handle = httpx.HTTPTransport.handle_request
+    async_handle = httpx.AsyncHTTPTransport.handle_async_request
+    _originals.update(sync=sync_handle, async_=async_handle)
+
+    def handle_request(self, request):
+        if cassette.replaying:
+            return _replay_response(cassette, request, asynchronous=False)
+        url, body = _record_request(cassette, request)
+        response = sync_handle(self, request)
+        streamed = _streamed(response)
+        encoding = response.headers.get("content-encoding", "")
+        if streamed and not encoding:
+            return httpx.Response(response.status_code, headers=response.headers,
+                                  stream=_RecordingStream(response, cassette, request.method,
+                                                          url, body, streamed),
+                                  request=request, extensions=response.extensions)
+        chunks = _decoded(_read_raw(response), encoding)
+        cassette.record(request.method, url, body, response.status_code, _headers(response),
+                        chunks, streamed)
+        headers = [(k, v) for k, v in response.headers.items()
+                   if k.lower() not in ("content-encoding", "content-length")]
+        return httpx.Response(response.status_code, headers=headers, stream=_Chunks(chunks),
+                              request=request, extensions=response.extensions)
+
+    async def handle_async_request(self, request):
+        if cassette.replaying:
+            return _replay_response(cassette, request, asynchronous=True)
+        url, body = _record_request(cassette, request)
+        response = await async_handle(self, request)
+        raw = [chunk async for chunk in response.stream]
+        await response.aclose()
+        encoding = response.headers.get("content-encoding", "")
+        chunks = _decoded(raw, encoding)
+        cassette.record(request.method, url, body, response.status_code, _headers(response),
+                        chunks, _streamed(response))
+        headers = [(k, v) for k, v in response.headers.items()
+                   if k.lower() not in ("content-encoding", "content-length")]
+        return httpx.Response(response.status_code, headers=headers, stream=_AsyncChunks(chunks),
+                              request=request, extensions=response.extensions)
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+    return cassette
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    """Passes a live event stream through chunk by chunk and records it on close."""
+
+    def __init__(self, response, cassette, method, url, body, streamed):
+        self.response = response
+        self.cassette = cassette
+        self.args = (method, url, body)
+        self.streamed = streamed
+        self.chunks: List[bytes] = []
+        self._done = False
+
+    def __iter__(self):
+        for chunk in self.response.stream:
+            self.chunks.append(chunk)
+            yield chunk
+
+    def close(self):
+        if not self._done:
+            self._done = True
+            self.response.close()
+            method, url, body = self.args
+            self.cassette.record(method, url, body, self.response.status_code,
+                                 _headers(self.response), self.chunks, self.streamed)
+
+
+def uninstall():
+    global _active
+    if not _originals:
+        return
+    httpx.HTTPTransport.handle_request = _originals.pop("sync")
+    httpx.AsyncHTTPTransport.handle_async_request = _originals.pop("async_")
+    _active = None
+
+
+def active() -> Optional[Cassette]:
+    return _active
+
+
+def from_env() -> Optional[Cassette]:
+    """Install a cassette from ``LYZR_CASSETTE`` (+ ``LYZR_RECORD=1`` to record).
+
+    In replay mode ``LYZR_API_KEY`` is set to a dummy value if missing, since
+    the SDK insists on one.
+    """
+    path = os.getenv("LYZR_CASSETTE")
+    if not path:
+        return None
+    mode = "record" if os.getenv("LYZR_RECORD") == "1" else "replay"
+    if mode == "replay":
+        os.environ.setdefault("LYZR_API_KEY", "sk-replay")
+    cassette = install(Cassette(path, mode))
+    print(f"{'Recording' if mode == 'record' else 'Replaying'} Studio HTTP "
+          f"{'to' if mode == 'record' else 'from'} {path}")
+    return cassette
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect cassettes and drift reports.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("show", help="list the exchanges in a cassette")
+    show.add_argument("cassette")
+    drift = sub.add_parser("drift", help="print a drift report")
+    drift.add_argument("report")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        with open(args.cassette, encoding="utf-8") as f:
+            data = json.load(f)
+        print(f"{args.cassette}: {len(data['interactions'])} exchanges, recorded {data.get('recorded_at')}")
+        for item in data["interactions"]:
+            kind = f"{len(item['chunks'])} chunks" if "chunks" in item else f"{len(item['response'])} B"
+            print(f"  {item['status']} {item['method']:<6} {urlsplit(item['url']).path:<50} {kind}")
+        return 0
+    with open(args.report, encoding="utf-8") as f:
+        report = json.load(f)
+    print(summary(report))
+    return 1 if report["drift"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
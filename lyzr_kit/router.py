@@ -0,0 +1,428 @@
+"""Local pre-router for the lesson 15 manager/specialist pattern.
+
+Every customer message used to go through the "Support Manager" LLM just to
+pick ``handle_order_query`` / ``handle_product_query`` /
+``handle_billing_query`` — a full model round-trip before any real work.
+:class:`PreRouter` makes that decision in-process in microseconds:
+
+* a multinomial Naive Bayes classifier trained on each wrapper's docstring
+  (its description and the quoted example questions; "Do NOT use for" lines
+  are skipped) plus any labelled examples you add;
+* keyword rules per tool (order ids, "refund", "in stock", ...) that boost
+  the classifier and flag queries touching several domains.
+
+:class:`RoutedSupport` sends confident, single-domain queries straight to the
+wrapper tool and everything else (ambiguous or multi-domain) to the manager.
+
+    python -m lyzr_kit.router            # evaluate on the built-in labelled set
+    python -m lyzr_kit.router --live     # also time/score the real manager
+"""
+
+import inspect
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Sequence
+
+_WORD = re.compile(r"[a-z0-9]+(?:-\d+)?")
+_STOP = frozenset("a an and are as at be can do does for from have hi i i'd i'm is it my me "
+                  "of on or our please the this to was what when where which with would you "
+                  "your".split())
+
+
+def _tokens(text: str) -> List[str]:
+    words = []
+    for w in _WORD.findall(text.lower()):
+        if w in _STOP:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        words.append(w)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+def docstring_examples(fn: Callable) -> List[str]:
+    """Training text from a wrapper docstring: description lines and quoted examples.
+
+    "Do NOT use for ..." lines describe *other* tools, so they are left out.
+    """
+    lines = []
+    for line in (inspect.getdoc(fn) or "").splitlines():
+        line = line.strip(" -")
+        if not line or line.lower().startswith(("do not", "don't", "use this tool for")):
+            continue
+        quoted = re.findall(r'"([^"]+)"', line)
+        lines.extend(quoted)
+        lines.append(re.sub(r'\([^)]*"[^"]*"[^)]*\)', "", line))
+    return [l for l in lines if l.strip()]
+
+
+# Keyword rules for the lesson 15 wrappers. Each match adds RULE_WEIGHT to
+# that tool's score; matches for two or more tools mark the query multi-domain.
+ECOMMERCE_RULES: Dict[str, Sequence[str]] = {
+    "handle_order_query": (r"\bord-?\d+", r"\b(track\w*|shipp\w*|deliver\w*|arriv\w*)\b",
+                           r"\bwhere('s| is) (my|the) (order|package|parcel)",
+                           r"\bcancel(l?ing|l?ed)? (my|the|this|that|it|order)\b",
+                           r"\breturn (it|my|the|this)\b", r"\bexchange\b"),
+    "handle_product_query": (r"\bin stock\b", r"\b(recommend\w*|compar\w*|spec\w*|dimension\w*)\b",
+                             r"\b(difference between|which (one|model)|looking for|warranty)\b",
+                             r"\b(battery|colou?r|weight|material|compatible)\b"),
+    "handle_billing_query": (r"\b(refund\w*|invoice\w*|receipt|charg\w*|billing|billed)\b",
+                             r"\b(card|payment|paypal|declined|overcharg\w*|subscription)\b",
+                             r"\bmoney back\b"),
+}
+RULE_WEIGHT = 1.0
+
+# Extra labelled examples for the lesson 15 wrappers (kept disjoint from EVAL_SET).
+ECOMMERCE_EXAMPLES: Dict[str, Sequence[str]] = {
+    "handle_order_query": (
+        "Has my package been dispatched yet?", "I need to change the delivery address",
+        "The parcel says delivered but I never got it", "How long does shipping take?",
+        "I want to send back the shoes I bought", "Which courier is delivering my stuff?"),
+    "handle_product_query": (
+        "Do you sell ergonomic chairs?", "Is this monitor good for gaming?",
+        "What sizes does the rain jacket come in?", "Does the blender come with a glass jar?",
+        "Can you suggest a gift for a runner?", "Is the desk easy to assemble?"),
+    "handle_billing_query": (
+        "Why is there an extra fee on my statement?", "Can I pay in installments?",
+        "Please update the card on file", "My payment did not go through",
+        "I need a VAT invoice for my company", "When will I get my money back?"),
+}
+
+
+@dataclass
+class Route:
+    tool: Optional[str]            # None = fall back to the manager
+    confidence: float
+    scores: Dict[str, float]
+    reason: str
+    elapsed: float = 0.0           # seconds spent routing
+
+    @property
+    def direct(self) -> bool:
+        return self.tool is not None
+
+
+class PreRouter:
+    """Keyword rules + Naive Bayes over wrapper docstrings and examples."""
+
+    def __init__(self, tools: Sequence[Callable], examples: Optional[Dict[str, Iterable[str]]] = None,
+                 rules: Optional[Dict[str, Sequence[str]]] = None, threshold: float = 0.6,
+                 rule_weight: float = RULE_WEIGHT, alpha: float = 0.5):
+        self.tools = {fn.__name__: fn for fn in tools}
+        self.threshold = threshold
+        self.rule_weight = rule_weight
+        self.rules: Dict[str, List[Pattern]] = {
+            name: [re.compile(p, re.IGNORECASE) for p in (rules or {}).get(name, ())]
+            for name in self.tools}
+        self._fit(examples or {}, alpha)
+
+    def _fit(self, examples: Dict[str, Iterable[str]], alpha: float):
+        counts: Dict[str, Counter] = {}
+        docs = {}
+        for name, fn in self.tools.items():
+            texts = docstring_examples(fn) + [name.replace("_", " ")] + list(examples.get(name, ()))
+            counts[name] = Counter(t for text in texts for t in _tokens(text))
+            docs[name] = len(texts)
+        vocab = set().union(*counts.values()) if counts else set()
+        total_docs = sum(docs.values()) or 1
+        self._prior = {n: math.log(docs[n] / total_docs) for n in counts}
+        self._loglik: Dict[str, Dict[str, float]] = {}
+        self._unseen: Dict[str, float] = {}
+        for name, c in counts.items():
+            denom = sum(c.values()) + alpha * (len(vocab) + 1)
+            self._loglik[name] = {t: math.log((n + alpha) / denom) for t, n in c.items()}
+            self._unseen[name] = math.log(alpha / denom)
+        self._vocab = vocab
+
+    def classify(self, query: str) -> Dict[str, float]:
+        """Naive Bayes posterior over tools (only words seen in training count)."""
+        toks = [t for t in _tokens(query) if t in self._vocab]
+        logp = {n: self._prior[n] + sum(self._loglik[n].get(t, self._unseen[n]) for t in toks)
+                for n in self.tools}
+        top = max(logp.values())
+        exp = {n: math.exp(v - top) for n, v in logp.items()}
+        z = sum(exp.values())
+        return {n: v / z for n, v in exp.items()}
+
+    def route(self, query: str) -> Route:
+        start = time.perf_counter()
+        hits = {n: sum(1 for p in pats if p.search(query)) for n, pats in self.rules.items()}
+        domains = [n for n, h in hits.items() if h]
+        posterior = self.classify(query)
+        combined = {n: posterior[n] + self.rule_weight * hits[n] for n in self.tools}
+        z = sum(combined.values())
+        scores = {n: v / z for n, v in combined.items()}
+        best = max(scores, key=scores.get)
+        confidence = scores[best]
+
+        if len(domains) > 1:
+            tool, reason = None, f"multi-domain ({', '.join(sorted(domains))})"
+        elif confidence < self.threshold:
+            tool, reason = None, f"low confidence ({confidence:.2f} < {self.threshold:.2f})"
+        elif domains and domains[0] != best:
+            tool, reason = None, f"rules say {domains[0]}, classifier says {best}"
+        else:
+            tool, reason = best, "rules + classifier" if domains else "classifier"
+        return Route(tool, confidence, scores, reason, time.perf_counter() - start)
+
+
+@dataclass
+class RouterStats:
+    direct: int = 0
+    fallback: int = 0
+    routing_time: float = 0.0
+    by_tool: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def fallback_rate(self) -> float:
+        total = self.direct + self.fallback
+        return self.fallback / total if total else 0.0
+
+
+class RoutedSupport:
+    """Answer queries via the pre-router, falling back to the manager agent.
+
+    ``manager`` is the manager agent (anything with ``run(query, **kw)``); the
+    wrapper tools given to the router are called directly for confident routes.
+    """
+
+    def __init__(self, router: PreRouter, manager, on_route: Optional[Callable[[str, Route], None]] = None):
+        self.router = router
+        self.manager = manager
+        self.on_route = on_route
+        self.stats = RouterStats()
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str, **run_kwargs) -> str:
+        route = self.router.route(query)
+        with self._lock:
+            self.stats.routing_time += route.elapsed
+            if route.direct:
+                self.stats.direct += 1
+                self.stats.by_tool[route.tool] += 1
+            else:
+                self.stats.fallback += 1
+        if self.on_route is not None:
+            self.on_route(query, route)
+        if route.direct:
+            return self.router.tools[route.tool](query)
+        return self.manager.run(query, **run_kwargs).response
+
+
+# ── evaluation ────────────────────────────────────────────────────────────────
+def lesson15_wrappers(call: Optional[Callable[[str, str], str]] = None) -> List[Callable]:
+    """The notebook 15 wrapper tools (same names and docstrings).
+
+    ``call(tool_name, query)`` does the work; by default it just returns the
+    tool name, which is all routing evaluation needs.
+    """
+    call = call or (lambda name, query: name)
+
+    def handle_order_query(query: str) -> str:
+        """Handle customer questions about orders, returns, cancellations, and shipping status.
+
+        Use this tool for:
+        - Order status and tracking ("Where is my order?", "Has ORD-1001 shipped?")
+        - Return requests ("I want to return my purchase")
+        - Order cancellations ("Can I cancel order ORD-1002?")
+        - Delivery timeframe questions ("When will it arrive?")
+
+        Do NOT use for product questions, billing issues, or payment problems.
+        """
+        return call("handle_order_query", query)
+
+    def handle_product_query(query: str) -> str:
+        """Answer customer questions about products, availability, specifications, and recommendations.
+
+        Use this tool for:
+        - Product availability ("Is the blue backpack in stock?")
+        - Product specifications ("What are the dimensions of the standing desk?")
+        - Product comparisons ("What's the difference between Model A and Model B?")
+        - Purchase recommendations ("I need a laptop for video editing under $1500")
+
+        Do NOT use for order status, billing, or payment questions.
+        """
+        return call("handle_product_query", query)
+
+    def handle_billing_query(query: str) -> str:
+        """Resolve billing issues, process refund requests, and answer payment and invoice questions.
+
+        Use this tool for:
+        - Refund requests ("I'd like a refund for my order")
+        - Payment failures ("My card was declined")
+        - Invoice requests ("I need an invoice for my purchase")
+        - Billing statement questions ("I was charged twice")
+
+        Do NOT use for order logistics, shipping, or product information.
+        """
+        return call("handle_billing_query", query)
+
+    return [handle_order_query, handle_product_query, handle_billing_query]
+
+
+O, P, B, M = "handle_order_query", "handle_product_query", "handle_billing_query", "multi"
+EVAL_SET = [
+    ("Hi, I placed order ORD-1001 last week. Can you tell me where it is?", O),
+    ("Where's my package? It was supposed to come Tuesday.", O),
+    ("Can you track ORD-2234 for me", O),
+    ("I'd like to cancel my order before it ships", O),
+    ("How do I return a jacket that doesn't fit?", O),
+    ("My parcel is stuck in transit for a week", O),
+    ("Has order ORD-1550 left the warehouse?", O),
+    ("Can I exchange the shoes for a bigger size?", O),
+    ("What's the estimated delivery date for ORD-1003?", O),
+    ("The tracking page hasn't updated in days", O),
+    ("I'm looking for a wireless keyboard for programming. Budget is $150. Any recommendations?", P),
+    ("Is the standing desk available in white?", P),
+    ("What's the battery life of the noise-cancelling headphones?", P),
+    ("Do you have the trail running shoes in stock in size 10?", P),
+    ("Which is better for travel, the 40L or the 55L backpack?", P),
+    ("Is the smart watch compatible with Android?", P),
+    ("What material is the office chair made of?", P),
+    ("Can you recommend a laptop bag that fits a 16 inch laptop?", P),
+    ("Does the coffee grinder have a warranty?", P),
+    ("What are the dimensions of the bookshelf?", P),
+    ("I was charged twice for my last order. I'd like a refund for the duplicate charge.", B),
+    ("My credit card was declined at checkout", B),
+    ("Can I get an invoice for my purchase from March?", B),
+    ("I still haven't received my refund", B),
+    ("Why was I billed $20 more than the listed price?", B),
+    ("How do I change my payment method?", B),
+    ("Do you accept PayPal?", B),
+    ("I need a receipt for my expense report", B),
+    ("My subscription renewed and I didn't want it to", B),
+    ("There's a charge on my statement I don't recognise", B),
+    ("My order ORD-1002 still hasn't arrived and I want to cancel it and get a refund.", M),
+    ("The headphones I ordered arrived broken, I want my money back", M),
+    ("Is the blue backpack in stock, and can I pay with PayPal?", M),
+    ("Track ORD-1009 and tell me if the invoice was sent", M),
+    ("I was charged but my order was cancelled", M),
+    ("Which monitor do you recommend, and when would it be delivered?", M),
+    ("hello", M),
+    ("I have a question", M),
+]
+
+
+def evaluate(router: PreRouter, dataset=EVAL_SET, manager_latency: float = 1.2) -> dict:
+    """Score ``router`` on ``(query, label)`` pairs; label ``"multi"`` = should fall back."""
+    direct = correct = fallback = wrong_direct_multi = 0
+    routing_time = 0.0
+    mistakes = []
+    for query, label in dataset:
+        route = router.route(query)
+        routing_time += route.elapsed
+        if not route.direct:
+            fallback += 1
+            continue
+        direct += 1
+        if route.tool == label:
+            correct += 1
+        else:
+            if label == M:
+                wrong_direct_multi += 1
+            mistakes.append((query, label, route.tool, round(route.confidence, 2)))
+    n = len(dataset)
+    return {
+        "queries": n,
+        "direct": direct,
+        "direct_accuracy": correct / direct if direct else 0.0,
+        "fallback_rate": fallback / n if n else 0.0,
+        "multi_sent_direct": wrong_direct_multi,
+        "mean_routing_us": routing_time / n * 1e6 if n else 0.0,
+        "manager_latency": manager_latency,
+        "latency_saved": direct * manager_latency - routing_time,
+        "latency_saved_per_query": (direct * manager_latency - routing_time) / n if n else 0.0,
+        "mistakes": mistakes,
+    }
+
+
+def measure_manager(dataset=EVAL_SET, provider: str = "openai/gpt-4o-mini") -> dict:
+    """Route ``dataset`` through a real manager whose tools only record their name.
+
+    Gives the manager's own routing accuracy and its routing round-trip time —
+    the latency the pre-router saves on every direct route.
+    """
+    from lyzr import Studio
+
+    studio = Studio(api_key=os.environ["LYZR_API_KEY"])
+    picked: List[str] = []
+    tools = lesson15_wrappers(lambda name, query: picked.append(name) or "Noted.")
+    manager = studio.create_agent(
+        name="Router Eval Manager", provider=provider,
+        role="Customer support routing manager",
+        goal="Route customer queries to the correct specialist",
+        instructions=("You do NOT answer questions yourself. Always use the appropriate "
+                      "specialist tool. If a query spans multiple domains, call every relevant tool."))
+    try:
+        for fn in tools:
+            manager.add_tool(fn)
+        latencies, correct = [], 0
+        for query, label in dataset:
+            picked.clear()
+            t0 = time.perf_counter()
+            manager.run(query)
+            latencies.append(time.perf_counter() - t0)
+            chosen = set(picked)
+            correct += (chosen == {label}) if label != M else (len(chosen) != 1)
+        return {"accuracy": correct / len(dataset), "latency": sum(latencies) / len(latencies)}
+    finally:
+        manager.delete()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the local pre-router on labelled queries.")
+    parser.add_argument("--data", help="JSONL with {\"query\": ..., \"label\": tool name or \"multi\"}")
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--manager-latency", type=float, default=1.2,
+                        help="seconds per manager routing round-trip (measured with --live)")
+    parser.add_argument("--live", action="store_true", help="also run the real manager (needs LYZR_API_KEY)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    dataset = EVAL_SET
+    if args.data:
+        with open(args.data) as f:
+            dataset = [(r["query"], r["label"]) for r in map(json.loads, f) if r]
+    router = PreRouter(lesson15_wrappers(), ECOMMERCE_EXAMPLES, ECOMMERCE_RULES, args.threshold)
+
+    live = None
+    if args.live:
+        live = measure_manager(dataset)
+        args.manager_latency = live["latency"]
+    result = evaluate(router, dataset, args.manager_latency)
+    if live is not None:
+        result["manager"] = live
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print(f"\nPre-router evaluation — {result['queries']} labelled queries "
+          f"(threshold {args.threshold})")
+    print("=" * 60)
+    print(f"Routed directly:    {result['direct']} ({1 - result['fallback_rate']:.0%})")
+    print(f"Direct accuracy:    {result['direct_accuracy']:.1%}")
+    print(f"Fallback rate:      {result['fallback_rate']:.1%}")
+    print(f"Multi-domain sent direct: {result['multi_sent_direct']}")
+    print(f"Routing time:       {result['mean_routing_us']:.0f}µs per query")
+    print(f"Latency saved:      {result['latency_saved']:.1f}s total, "
+          f"{result['latency_saved_per_query']:.2f}s per query "
+          f"(manager round-trip {result['manager_latency']:.2f}s"
+          f"{', measured' if live else ', assumed'})")
+    if live is not None:
+        print(f"Manager accuracy:   {live['accuracy']:.1%} (for comparison)")
+    for query, label, got, conf in result["mistakes"]:
+        print(f"  ✗ {query[:55]!r}: expected {label}, routed to {got} ({conf})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Dependency-aware parallel runner for the validation suites.
+
+Each test is declared as a :class:`Task` with the numbers of the tests it
+depends on. :func:`run_tasks` starts every task as soon as all of its
+dependencies have passed, using a bounded thread pool, so total wall time
+tends towards the longest dependency chain instead of the sum of all tests.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class Task:
+    """A single test: a number, a display name, a callable and its dependencies."""
+    n: int
+    name: str
+    fn: Callable[[], None]
+    deps: Sequence[int] = field(default_factory=tuple)
+
+
+@dataclass
+class TaskResult:
+    n: int
+    name: str
+    ok: bool
+    error: Optional[str] = None
+    duration: float = 0.0      # seconds spent inside the task
+    skipped: bool = False      # True if a dependency failed and the task never ran
+
+
+def _check_graph(tasks: Sequence[Task]) -> Dict[int, Task]:
+    by_n = {}
+    for t in tasks:
+        if t.n in by_n:
+            raise ValueError(f"duplicate task number {t.n}")
+        by_n[t.n] = t
+    for t in tasks:
+        for d in t.deps:
+            if d not in by_n:
+                raise ValueError(f"Test {t.n} depends on unknown Test {d}")
+
+    # Kahn's algorithm — fail early on cycles instead of deadlocking the pool.
+    indegree = {n: len(t.deps) for n, t in by_n.items()}
+    children = {n: [] for n in by_n}
+    for t in tasks:
+        for d in t.deps:
+            children[d].append(t.n)
+    ready = [n for n, k in indegree.items() if k == 0]
+    seen = 0
+    while ready:
+        n = ready.pop()
+        seen += 1
+        for c in children[n]:
+            indegree[c] -= 1
+            if indegree[c] == 0:
+                ready.append(c)
+    if seen != len(by_n):
+        raise ValueError("task dependencies contain a cycle")
+    return by_n
+
+
+def run_tasks(
+    tasks: Sequence[Task],
+    max_workers: int = 4,
+    on_done: Optional[Callable[[TaskResult], None]] = None,
+) -> Dict[int, TaskResult]:
+    """Run ``tasks`` respecting their dependencies; return results keyed by number.
+
+    A task whose dependency failed (or was itself skipped) is not run and is
+    reported as a skipped failure. ``on_done`` is called from the scheduling
+    thread — never concurrently — once per task as it finishes.
+    """
+    by_n = _check_graph(tasks)
+    results: Dict[int, TaskResult] = {}
+    pending = dict(by_n)
+    lock = threading.Lock()
+
+    def timed(task: Task) -> TaskResult:
+        start = time.perf_counter()
+        try:
+            task.fn()
+            ok, err = True, None
+        except Exception as e:
+            ok, err = False, str(e)
+        return TaskResult(task.n, task.name, ok, err, time.perf_counter() - start)
+
+    def finish(res: TaskResult):
+        with lock:
+            results[res.n] = res
+        if on_done is not None:
+            on_done(res)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        running = {}
+        while pending or running:
+            for n in sorted(pending):
+                task = pending[n]
+                if not all(d in results for d in task.deps):
+                    continue
+                del pending[n]
+                broken = [d for d in task.deps if not results[d].ok]
+                if broken:
+                    finish(TaskResult(n, task.name, False,
+                                      f"skipped: Test {broken[0]} failed",
+                                      skipped=True))
+                    continue
+                running[pool.submit(timed, task)] = n
+            if not running:
+                # Everything left was just skipped; go round again to pick up
+                # anything that depended on the skipped tasks.
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                del running[fut]
+                finish(fut.result())
+    return results
+
+
+def critical_path(tasks: Sequence[Task],
+                  results: Dict[int, TaskResult]) -> Tuple[List[int], float]:
+    """Return the slowest dependency chain and its summed duration.
+
+    This is the lower bound on wall time for the suite with unlimited workers.
+    """
+    by_n = {t.n: t for t in tasks}
+    best: Dict[int, Tuple[float, List[int]]] = {}
+
+    def longest(n: int) -> Tuple[float, List[int]]:
+        if n not in best:
+            own = results[n].duration if n in results else 0.0
+            chains = [longest(d) for d in by_n[n].deps]
+            head = max(chains, key=lambda c: c[0], default=(0.0, []))
+            best[n] = (head[0] + own, head[1] + [n])
+        return best[n]
+
+    if not by_n:
+        return [], 0.0
+    total, chain = max((longest(n) for n in by_n), key=lambda c: c[0])
+    return chain, total
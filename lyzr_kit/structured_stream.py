@@ -0,0 +1,361 @@
+"""Stream a structured output and get partial Pydantic models as fields finish.
+
+``stream=True`` can't be combined with ``response_model`` (lesson 11), so a
+capstone ``ResearchReport`` normally shows nothing until the whole report is
+generated. The workaround: create the agent *without* ``response_model``,
+tell it to answer with JSON matching the schema (:func:`schema_instructions`),
+stream the text, and parse it incrementally. :func:`stream_model` yields a
+partial model each time a top-level field or a list item completes —
+``executive_summary`` first, then ``key_findings`` one by one — and finally
+the fully validated model::
+
+    agent = studio.create_agent(..., instructions=base + schema_instructions(ResearchReport))
+    for report in stream_model(agent, "Write the report", ResearchReport):
+        render(report)          # report.model_fields_set = fields received so far
+
+Fields not received yet are ``None`` (``[]`` for lists) on partial models,
+which are built with ``model_construct`` and so are not validated. Only the
+last item is. The parser is a single pass over the text (no re-parsing per
+chunk), skips any preamble or Markdown fence before the opening ``{``, and
+ignores anything after the closing ``}``.
+
+    python -m lyzr_kit.structured_stream --stub     # simulated report stream
+"""
+
+import json
+import re
+import sys
+import time
+import typing
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+_SPECIAL = re.compile(r'["\\]')
+_PARTIAL_ESCAPE = re.compile(r"(?<!\\)((?:\\\\)*)\\u[0-9a-fA-F]{0,3}$")   # unfinished \uXXXX
+_LITERAL_CHARS = frozenset("0123456789+-.eEtruefalsn")
+
+Path = Tuple[Any, ...]
+
+
+class PartialJSON:
+    """Incremental JSON parser: :meth:`feed` text, read :attr:`value` any time.
+
+    ``feed`` returns the paths of values completed by that text, e.g.
+    ``("executive_summary",)`` or ``("key_findings", 2)``. With
+    ``partial_strings`` the string currently being received is also visible
+    in :attr:`value` (useful for a typing effect); otherwise only finished
+    values are.
+    """
+
+    def __init__(self, start: str = "{[", partial_strings: bool = False):
+        self.start = start
+        self.partial_strings = partial_strings
+        self.value: Any = None
+        self.done = False
+        self._stack: List[Any] = []        # open containers
+        self._paths: List[Path] = []       # path of each open container
+        self._keys: List[Any] = []         # pending key per open dict (None = expecting one)
+        self._raw: Optional[List[str]] = None   # raw characters of the current string
+        self._is_key = False
+        self._escape = False
+        self._literal: Optional[str] = None
+        self._placed_partial = False         # a partial string sits at the current position
+
+    @property
+    def in_string(self) -> bool:
+        return self._raw is not None and not self._is_key
+
+    # ── feeding ───────────────────────────────────────────────────────────────
+    def feed(self, text: str) -> List[Path]:
+        completed: List[Path] = []
+        i, n = 0, len(text)
+        while i < n and not self.done:
+            if self._raw is not None:
+                i = self._string(text, i, completed)
+                continue
+            c = text[i]
+            if self._literal is not None:
+                if c in _LITERAL_CHARS:
+                    self._literal += c
+                    i += 1
+                    continue
+                self._finish_literal(completed)
+            i += 1
+            if not self._stack:
+                if c in self.start:           # anything before the root is preamble
+                    self._open({} if c == "{" else [])
+                continue
+            if c in " \t\r\n:,":
+                continue
+            if c == "{" or c == "[":
+                self._open({} if c == "{" else [])
+            elif c == "}" or c == "]":
+                self._close(completed)
+            elif c == '"':
+                self._raw, self._escape = [], False
+                self._is_key = isinstance(self._stack[-1], dict) and self._keys[-1] is None
+            elif c in _LITERAL_CHARS:
+                self._literal = c
+            else:
+                raise ValueError(f"unexpected character {c!r} in JSON")
+        if self.partial_strings and self.in_string and self._raw:
+            self._place(self._decode(partial=True), final=False)
+        return completed
+
+    def _string(self, text: str, i: int, completed: List[Path]) -> int:
+        raw = self._raw
+        if self._escape:                      # escape split across chunks
+            raw.append("\\" + text[i])
+            self._escape = False
+            i += 1
+        while i < len(text):
+            m = _SPECIAL.search(text, i)
+            if m is None:
+                raw.append(text[i:])
+                return len(text)
+            j = m.start()
+            raw.append(text[i:j])
+            if text[j] == "\\":
+                if j + 1 == len(text):
+                    self._escape = True
+                    return len(text)
+                raw.append(text[j:j + 2])
+                i = j + 2
+                continue
+            value = self._decode()
+            self._raw = None
+            if self._is_key:
+                self._keys[-1] = value
+            else:
+                self._place(value, final=True)
+                completed.append(self._child_path())
+                self._after_value()
+            return j + 1
+        return i
+
+    def _decode(self, partial: bool = False) -> str:
+        raw = "".join(self._raw)
+        if partial:
+            raw = _PARTIAL_ESCAPE.sub(r"\1", raw)
+        return json.loads('"' + raw + '"')
+
+    def _finish_literal(self, completed: List[Path]):
+        literal, self._literal = self._literal, None
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            raise ValueError(f"invalid JSON literal {literal!r}") from None
+        self._place(value, final=True)
+        completed.append(self._child_path())
+        self._after_value()
+
+    # ── structure ─────────────────────────────────────────────────────────────
+    def _child_path(self) -> Path:
+        parent = self._stack[-1]
+        key = self._keys[-1] if isinstance(parent, dict) else len(parent) - 1
+        return self._paths[-1] + (key,)
+
+    def _place(self, value, final: bool):
+        """Put ``value`` at the current position (replacing a partial string)."""
+        parent = self._stack[-1]
+        if isinstance(parent, dict):
+            parent[self._keys[-1]] = value
+        elif self._placed_partial:
+            parent[-1] = value
+        else:
+            parent.append(value)
+        self._placed_partial = not final
+
+    def _after_value(self):
+        if isinstance(self._stack[-1], dict):
+            self._keys[-1] = None
+
+    def _open(self, container):
+        if not self._stack:
+            self.value = container
+            path: Path = ()
+        else:
+            self._place(container, final=True)
+            path = self._child_path()
+        self._stack.append(container)
+        self._paths.append(path)
+        self._keys.append(None)
+
+    def _close(self, completed: List[Path]):
+        self._stack.pop()
+        completed.append(self._paths.pop())
+        self._keys.pop()
+        if self._stack:
+            self._after_value()
+        else:
+            self.done = True
+
+
+# ── models ────────────────────────────────────────────────────────────────────
+def _fields(model) -> dict:
+    fields = getattr(model, "model_fields", None)
+    if fields is not None:
+        return {name: f.annotation for name, f in fields.items()}
+    return {name: f.outer_type_ for name, f in model.__fields__.items()}      # pydantic v1
+
+
+def _model_type(tp):
+    return tp if isinstance(tp, type) and hasattr(tp, "__fields__") else None
+
+
+def _snapshot(value):
+    if isinstance(value, dict):
+        return {k: _snapshot(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_snapshot(v) for v in value]
+    return value
+
+
+def partial_model(model, data: dict):
+    """An unvalidated ``model`` built from whatever ``data`` holds so far."""
+    values = {}
+    for name, tp in _fields(model).items():
+        origin = typing.get_origin(tp)
+        args = typing.get_args(tp)
+        if name not in data:
+            values[name] = [] if origin in (list, List) else None
+            continue
+        value = data[name]
+        nested = _model_type(tp)
+        item = _model_type(args[0]) if origin in (list, List) and args else None
+        if nested is not None and isinstance(value, dict):
+            value = partial_model(nested, value)
+        elif item is not None and isinstance(value, list):
+            value = [partial_model(item, v) if isinstance(v, dict) else v for v in value]
+        else:
+            value = _snapshot(value)
+        values[name] = value
+    construct = getattr(model, "model_construct", None) or model.construct
+    return construct(_fields_set=set(data), **values)
+
+
+def validate(model, data: dict):
+    check = getattr(model, "model_validate", None) or model.parse_obj
+    return check(data)
+
+
+def schema_instructions(model) -> str:
+    """Instructions that make an agent answer with JSON matching ``model``."""
+    schema = model.model_json_schema() if hasattr(model, "model_json_schema") else model.schema()
+    order = ", ".join(_fields(model))
+    return (f"\n\nRespond with a single JSON object and nothing else — no Markdown, no prose. "
+            f"It must match this JSON schema, with the fields in this order: {order}.\n"
+            f"{json.dumps(schema)}")
+
+
+def iter_partial(chunks: Iterable[str], model, depth: int = 2,
+                 partial_strings: bool = False) -> Iterator:
+    """Parse streamed text; yield partial models, then the validated one.
+
+    A partial is yielded whenever a value at most ``depth`` levels deep
+    completes (1 = top-level fields, 2 = also their list items), or on every
+    chunk while a string is arriving when ``partial_strings`` is set.
+    """
+    parser = PartialJSON(start="{", partial_strings=partial_strings)
+    for text in chunks:
+        if parser.done:
+            continue                      # drain the stream; trailing text is ignored
+        completed = parser.feed(text)
+        if parser.done:
+            break
+        if parser.value is not None and (
+                any(0 < len(path) <= depth for path in completed)
+                or (partial_strings and parser.in_string)):
+            yield partial_model(model, parser.value)
+    if not parser.done:
+        raise ValueError("stream ended before the JSON object was complete")
+    yield validate(model, parser.value)
+
+
+def stream_model(agent, message: str, model, depth: int = 2, partial_strings: bool = False,
+                 **run_kwargs) -> Iterator:
+    """``agent.run(message, stream=True)`` parsed into partial ``model`` instances."""
+    if getattr(agent, "response_model", None) is not None:
+        raise ValueError("stream_model needs an agent without response_model; "
+                         "put schema_instructions(model) in its instructions instead")
+    chunks = agent.run(message, stream=True, **run_kwargs)
+    return iter_partial((getattr(c, "content", c) or "" for c in chunks), model, depth,
+                        partial_strings)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+def _demo_model():
+    from pydantic import BaseModel, Field
+
+    class ResearchReport(BaseModel):              # as in notebook 10
+        topic: str = Field(description="The research topic analyzed")
+        executive_summary: str = Field(description="2-3 sentence high-level summary for executives")
+        key_findings: List[str] = Field(description="5-7 specific, evidence-based findings")
+        recommendations: List[str] = Field(description="3-5 actionable recommendations")
+        confidence_score: float = Field(ge=0.0, le=1.0, description="Confidence in findings from 0.0 to 1.0")
+        sources_used: List[str] = Field(description="List of sources/references cited")
+    return ResearchReport
+
+
+_DEMO_REPORT = {
+    "topic": "AI agent frameworks in the enterprise",
+    "executive_summary": "Enterprise adoption of agent frameworks is accelerating, driven by "
+                         "tool use and retrieval. Governance and evaluation remain the main blockers.",
+    "key_findings": [f"Finding {i}: " + "supporting detail " * 8 for i in range(1, 7)],
+    "recommendations": [f"Recommendation {i}: " + "concrete next step " * 6 for i in range(1, 5)],
+    "confidence_score": 0.82,
+    "sources_used": ["Industry survey 2025", "Vendor documentation", "Analyst report"],
+}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream a ResearchReport and show partial results.")
+    parser.add_argument("--stub", action="store_true", help="simulated stream, no API key needed")
+    parser.add_argument("--prompt", default="Write a research report on AI agent frameworks "
+                                            "for an enterprise strategy team.")
+    args = parser.parse_args(argv)
+    ResearchReport = _demo_model()
+
+    if args.stub:
+        from lyzr_kit.stub import Latency, StubStudio
+        studio = StubStudio(latency=Latency(first_token=0.5, per_chunk=0.02),
+                            reply_text="```json\n" + json.dumps(_DEMO_REPORT, indent=1) + "\n```")
+    else:
+        import os
+        if not os.getenv("LYZR_API_KEY"):
+            print("ERROR: LYZR_API_KEY not set (or use --stub)")
+            return 1
+        from lyzr import Studio
+        studio = Studio(api_key=os.environ["LYZR_API_KEY"])
+    agent = studio.create_agent(
+        name="Report Streamer", provider="openai/gpt-4o-mini", role="Research analyst",
+        goal="Write concise research reports",
+        instructions="You write data-driven research reports." + schema_instructions(ResearchReport))
+
+    try:
+        start = time.perf_counter()
+        printed = {}                          # field → items printed so far
+        for report in stream_model(agent, args.prompt, ResearchReport):
+            t = time.perf_counter() - start
+            for name in _fields(ResearchReport):
+                if name not in report.model_fields_set:
+                    continue
+                value = getattr(report, name)
+                if isinstance(value, list):
+                    for i in range(printed.get(name, 0), len(value)):
+                        print(f"{t:6.2f}s  {name}[{i}]: {str(value[i])[:60]}")
+                    printed[name] = len(value)
+                elif name not in printed:
+                    print(f"{t:6.2f}s  {name}: {str(value)[:70]}")
+                    printed[name] = 1
+        print(f"{time.perf_counter() - start:6.2f}s  validated {type(report).__name__} "
+              f"(confidence {report.confidence_score:.0%})")
+    finally:
+        if not args.stub:
+            agent.delete()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""In-process stand-in for the lyzr ``Studio`` API.
+
+``StubStudio`` mirrors the surface the lessons use — ``create_agent`` /
+``agent.run`` (plain, ``stream=True``, ``response_model``, tools, memory
+sessions), knowledge bases, contexts and RAI policies — with configurable,
+simulated latency and no network. It exists so tooling (benchmarks, load
+generators) can be exercised offline; it does not pretend to be an LLM.
+"""
+
+import inspect
+import itertools
+import random
+import re
+import threading
+import time
+import typing
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+_ids = itertools.count(1)
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}-stub-{next(_ids):06d}"
+
+
+@dataclass
+class Latency:
+    """Simulated timings in seconds; each sample gets ±``jitter`` relative noise."""
+    first_token: float = 0.05     # request → first byte (or full reply, when not streaming)
+    per_chunk: float = 0.005      # gap between streamed chunks
+    tool_call: float = 0.01       # extra round-trip when a tool is used
+    kb_query: float = 0.02
+    context_write: float = 0.03
+    jitter: float = 0.2
+
+    def sample(self, base: float) -> float:
+        if base <= 0:
+            return 0.0
+        return max(0.0, base * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+@dataclass
+class StubResponse:
+    response: str
+    session_id: Optional[str] = None
+
+
+@dataclass
+class StubStream:
+    content: str
+    done: bool = False
+
+
+def _placeholder(tp):
+    origin = typing.get_origin(tp)
+    if origin in (list, List):
+        return []
+    if origin is typing.Union:
+        args = [a for a in typing.get_args(tp) if a is not type(None)]
+        return _placeholder(args[0]) if args else None
+    return {str: "stub", int: 1, float: 0.5, bool: True}.get(tp)
+
+
+def _fill_model(model):
+    """Build an instance of a Pydantic model with placeholder field values."""
+    fields = getattr(model, "model_fields", None)
+    if fields is None:           # pydantic v1
+        fields = {k: f.outer_type_ for k, f in getattr(model, "__fields__", {}).items()}
+        return model(**{k: _placeholder(t) for k, t in fields.items()})
+    return model(**{k: _placeholder(f.annotation) for k, f in fields.items()})
+
+
+_ARG_PATTERNS = {
+    int: re.compile(r"-?\d+"),
+    str: re.compile(r"\b[A-Z]{2,}-?\d+\b"),   # ORD-1001, FX123456, ...
+}
+
+
+def _call_tool(fn: Callable, message: str) -> Optional[str]:
+    """Call ``fn`` if its single argument can be pulled out of ``message``."""
+    params = list(inspect.signature(fn).parameters.values())
+    if len(params) != 1:
+        return None
+    hint = typing.get_type_hints(fn).get(params[0].name, str)
+    pattern = _ARG_PATTERNS.get(hint)
+    match = pattern.search(message) if pattern else None
+    if match is None:
+        return None
+    return str(fn(hint(match.group(0))))
+
+
+class StubAgent:
+    def __init__(self, studio: "StubStudio", name: str, provider: str, role: str = "",
+                 goal: str = "", instructions: str = "", response_model=None, **kwargs):
+        self._studio = studio
+        self.id = _new_id("agent")
+        self.name = name
+        self.provider = provider
+        self.role = role
+        self.goal = goal
+        self.instructions = instructions
+        self.response_model = response_model
+        self.knowledge_base_ids = list(kwargs.get("knowledge_base_ids") or [])
+        self.tools: List[Callable] = []
+        self.contexts: list = []
+        self.rai_policy = None
+        self.memory: Optional[int] = None
+        self._sessions: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    # configuration -----------------------------------------------------------
+    def update(self, **fields):
+        for k, v in fields.items():
+            setattr(self, k, v)
+        return self
+
+    def clone(self, name: Optional[str] = None) -> "StubAgent":
+        twin = self._studio.create_agent(
+            name=name or f"{self.name} (copy)", provider=self.provider, role=self.role,
+            goal=self.goal, instructions=self.instructions,
+            response_model=self.response_model, knowledge_base_ids=self.knowledge_base_ids)
+        twin.tools = list(self.tools)
+        return twin
+
+    def delete(self):
+        self._studio._agents.pop(self.id, None)
+
+    def add_tool(self, fn: Callable):
+        self.tools.append(fn)
+
+    def add_memory(self, max_messages: int = 10):
+        self.memory = max_messages
+
+    def remove_memory(self):
+        self.memory = None
+        self._sessions.clear()
+
+    def add_context(self, ctx):
+        self.contexts.append(ctx)
+
+    def remove_context(self, ctx):
+        self.contexts = [c for c in self.contexts if c.id != ctx.id]
+
+    def add_rai_policy(self, policy):
+        self.rai_policy = policy
+
+    def remove_rai_policy(self):
+        self.rai_policy = None
+
+    def set_image_model(self, model: str):
+        self.image_model = model
+
+    # running -----------------------------------------------------------------
+    def _reply(self, message: str, session_id: Optional[str]) -> str:
+        lat = self._studio.latency
+        parts = []
+        for tool in self.tools:
+            out = _call_tool(tool, message)
+            if out is not None:
+                time.sleep(lat.sample(lat.tool_call))
+                parts.append(out)
+        if self.memory and session_id:
+            with self._lock:
+                history = self._sessions.setdefault(session_id, [])
+                if history:
+                    parts.append(f"(earlier: {history[-1]})")
+                history.append(message)
+                del history[:-self.memory]
+        parts.append(self._studio.reply_text)
+        return " ".join(parts)
+
+    def run(self, message: str, session_id: Optional[str] = None, stream: bool = False, **kwargs):
+        if stream:
+            if self.response_model is not None:
+                raise ValueError("stream=True is not supported with response_model")
+            return self._stream(message, session_id)
+        lat = self._studio.latency
+        time.sleep(lat.sample(lat.first_token))
+        text = self._reply(message, session_id)
+        if self.response_model is not None:
+            return _fill_model(self.response_model)
+        return StubResponse(text, session_id)
+
+    def _stream(self, message: str, session_id: Optional[str]) -> Iterator[StubStream]:
+        lat = self._studio.latency
+        time.sleep(lat.sample(lat.first_token))
+        words = self._reply(message, session_id).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(lat.sample(lat.per_chunk))
+            yield StubStream(word if i == 0 else " " + word)
+        yield StubStream("", done=True)
+
+
+@dataclass
+class StubDocument:
+    id: str
+    source: str
+    text: str
+
+
+@dataclass
+class StubQueryResult:
+    text: str
+    score: float
+    source: str = ""
+    id: str = ""
+
+
+class StubKnowledgeBase:
+    """Keyword-overlap KB; good enough to return plausible hits offline."""
+
+    def __init__(self, studio: "StubStudio", name: str):
+        self._studio = studio
+        self.id = _new_id("kb")
+        self.name = name
+        self._docs: Dict[str, StubDocument] = {}
+        self._lock = threading.Lock()
+
+    def add_text(self, text: str, source: str = "text", chunk_size: int = 1024,
+                 chunk_overlap: int = 128) -> bool:
+        doc = StubDocument(_new_id("doc"), source, text)
+        with self._lock:
+            self._docs[doc.id] = doc
+        return True
+
+    def add_website(self, url: str, max_pages: int = 1, max_depth: int = 1):
+        return self.add_text(f"Content crawled from {url}", source=url)
+
+    def list_documents(self) -> List[StubDocument]:
+        with self._lock:
+            return list(self._docs.values())
+
+    def delete_documents(self, ids: List[str]):
+        # The server deletes by document name (the source); ids work here too.
+        wanted = set(ids)
+        with self._lock:
+            for doc in list(self._docs.values()):
+                if doc.id in wanted or doc.source in wanted:
+                    del self._docs[doc.id]
+
+    def reset(self):
+        with self._lock:
+            self._docs.clear()
+
+    def delete(self):
+        self._studio._kbs.pop(self.id, None)
+
+    def query(self, query: str, top_k: int = 5, score_threshold: float = 0.0) -> List[StubQueryResult]:
+        lat = self._studio.latency
+        time.sleep(lat.sample(lat.kb_query))
+        words = set(re.findall(r"\w+", query.lower()))
+        hits = []
+        for doc in self.list_documents():
+            doc_words = set(re.findall(r"\w+", doc.text.lower()))
+            score = len(words & doc_words) / max(1, len(words))
+            if score > 0 and score >= score_threshold:
+                hits.append(StubQueryResult(doc.text, score, doc.source, doc.id))
+        hits.sort(key=lambda r: r.score, reverse=True)
+        return hits[:top_k]
+
+
+class StubContext:
+    def __init__(self, studio: "StubStudio", name: str, value: str):
+        self._studio = studio
+        self.id = _new_id("ctx")
+        self.name = name
+        self.value = value
+
+    def update(self, value: str):
+        time.sleep(self._studio.latency.sample(self._studio.latency.context_write))
+        self.value = value
+        return self
+
+    def delete(self):
+        self._studio._contexts.pop(self.id, None)
+
+
+class StubRAIPolicy:
+    def __init__(self, studio: "StubStudio", name: str, **settings):
+        self._studio = studio
+        self.id = _new_id("rai")
+        self.name = name
+        self.settings = settings
+
+    def delete(self):
+        self._studio._policies.pop(self.id, None)
+
+
+class StubStudio:
+    """Drop-in for ``lyzr.Studio`` in offline tooling."""
+
+    def __init__(self, api_key: str = "stub", latency: Optional[Latency] = None,
+                 reply_text: str = "This is a simulated reply from the stub backend."):
+        self.latency = latency or Latency()
+        self.reply_text = reply_text
+        self._agents: Dict[str, StubAgent] = {}
+        self._kbs: Dict[str, StubKnowledgeBase] = {}
+        self._contexts: Dict[str, StubContext] = {}
+        self._policies: Dict[str, StubRAIPolicy] = {}
+
+    def create_agent(self, name: str, provider: str, **kwargs) -> StubAgent:
+        agent = StubAgent(self, name, provider, **kwargs)
+        self._agents[agent.id] = agent
+        return agent
+
+    def get_agent(self, agent_id: str) -> StubAgent:
+        return self._agents[agent_id]
+
+    def list_agents(self) -> List[StubAgent]:
+        return list(self._agents.values())
+
+    def create_knowledge_base(self, name: str, **kwargs) -> StubKnowledgeBase:
+        kb = StubKnowledgeBase(self, name)
+        self._kbs[kb.id] = kb
+        return kb
+
+    def get_knowledge_base(self, kb_id: str) -> StubKnowledgeBase:
+        return self._kbs[kb_id]
+
+    def list_knowledge_bases(self) -> List[StubKnowledgeBase]:
+        return list(self._kbs.values())
+
+    def create_context(self, name: str, value: str) -> StubContext:
+        ctx = StubContext(self, name, value)
+        self._contexts[ctx.id] = ctx
+        return ctx
+
+    def list_contexts(self) -> List[StubContext]:
+        return list(self._contexts.values())
+
+    def create_rai_policy(self, name: str, **settings) -> StubRAIPolicy:
+        policy = StubRAIPolicy(self, name, **settings)
+        self._policies[policy.id] = policy
+        return policy
+
+    def list_rai_policies(self) -> List[StubRAIPolicy]:
+        return list(self._policies.values())
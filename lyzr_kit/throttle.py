@@ -0,0 +1,544 @@
+"""Client-side adaptive concurrency and rate limiting for ``agent.run``.
+
+With many agents running at once (specialists, managers, WhatsApp sessions,
+batch jobs) the provider's rate limits are hit and calls simply fail.
+:class:`Throttle` sits in front of ``agent.run`` and, per provider
+(``openai/gpt-4o``, ``openai/gpt-4o-mini``, ...):
+
+* admits calls through a token bucket (``rate`` per second, ``burst``),
+* caps calls in flight at a concurrency limit that adapts AIMD-style: +1 per
+  window of successful calls, ×``decrease`` on a 429 / 5xx / timeout or when
+  latency climbs well above the observed baseline,
+* retries retryable failures with full-jitter exponential backoff (honouring
+  ``Retry-After``), without holding a slot while it sleeps,
+* opens a circuit breaker when failures persist (``failure_threshold`` in a row
+  over at least ``failure_window`` seconds, with no success in between), so
+  callers fail fast with :class:`CircuitOpenError` until a probe succeeds.
+
+The limiter state lives in a :class:`ThrottleState`: :class:`MemoryState`
+for one process, :class:`SQLiteState` to share limits, buckets and breakers
+between worker processes on a host. In-flight slots are leases with an
+expiry, so a crashed worker can't leak capacity. :meth:`Throttle.metrics`
+reports the current limit, in-flight count, circuit state and queue-wait
+percentiles per provider::
+
+    throttle = Throttle({"openai/gpt-4o": ProviderLimits(rate=5, max_limit=16)},
+                        state=SQLiteState("/tmp/lyzr-throttle.db"))
+    order_agent = throttle.wrap(order_agent)      # run() now goes through it
+    throttle.metrics()
+
+    python -m lyzr_kit.throttle --simulate            # watch the limit converge
+    python -m lyzr_kit.throttle --simulate --processes 4 --db /tmp/t.db
+"""
+
+import abc
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from lyzr_kit.bench import summarize
+
+
+@dataclass
+class ProviderLimits:
+    rate: float = 10.0                # calls admitted per second (token bucket refill)
+    burst: float = 20.0               # bucket size
+    initial_limit: float = 8.0        # starting concurrency limit
+    min_limit: float = 1.0
+    max_limit: float = 64.0
+    decrease: float = 0.5             # multiplicative decrease on overload
+    cooldown: float = 2.0             # at most one decrease per cooldown seconds
+    latency_tolerance: float = 3.0    # latency > baseline × this counts as overload (0 = off)
+    failure_threshold: int = 5        # consecutive failures that open the circuit…
+    failure_window: float = 5.0       # …once the failure streak has lasted this long
+    open_for: float = 30.0            # seconds the circuit stays open before a probe
+    lease_ttl: float = 600.0          # a slot held longer than this is reclaimed
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit breaker is open; the call was not attempted."""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"circuit open for {provider}; retry in {retry_in:.1f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+# ── outcome classification ────────────────────────────────────────────────────
+_STATUS = re.compile(r"\b(429|5\d\d)\b")
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for obj in (exc, getattr(exc, "response", None)):
+        code = getattr(obj, "status_code", None) or getattr(obj, "status", None)
+        if isinstance(code, int):
+            return code
+    m = _STATUS.search(str(exc))
+    return int(m.group(1)) if m else None
+
+
+def classify(exc: BaseException) -> str:
+    """``"throttled"``, ``"server"``, ``"timeout"`` (all retryable) or ``"client"``."""
+    name = type(exc).__name__.lower()
+    if "ratelimit" in name or "rate limit" in str(exc).lower():
+        return "throttled"
+    code = _status_code(exc)
+    if code == 429:
+        return "throttled"
+    if code is not None and code >= 500:
+        return "server"
+    if isinstance(exc, (TimeoutError, ConnectionError)) or "timeout" in name:
+        return "timeout"
+    return "client"
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    value = getattr(exc, "retry_after", None)
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if value is None and headers is not None:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# ── limiter logic (pure functions over a state dict) ──────────────────────────
+def _new_state(cfg: ProviderLimits, now: float) -> dict:
+    return {"tokens": cfg.burst, "refilled": now, "limit": cfg.initial_limit, "leases": {},
+            "circuit": "closed", "open_until": 0.0, "failures": 0, "failing_since": 0.0, "baseline": None,
+            "last_decrease": 0.0, "paused_until": 0.0, "opened": 0}
+
+
+def _acquire(state: dict, cfg: ProviderLimits, now: float, lease: str) -> Tuple[str, float]:
+    """Try to take a slot. Returns ``("ok", 0)``, ``("wait", seconds)`` or ``("open", seconds)``."""
+    leases = state["leases"]
+    for key in [k for k, expires in leases.items() if expires < now]:
+        del leases[key]
+    if state["circuit"] == "open":
+        if now < state["open_until"]:
+            return "open", state["open_until"] - now
+        state["circuit"] = "half_open"              # let one probe through
+    if state["circuit"] == "half_open" and leases:
+        return "open", cfg.cooldown
+    if now < state["paused_until"]:
+        return "wait", state["paused_until"] - now
+    state["tokens"] = min(cfg.burst, state["tokens"] + (now - state["refilled"]) * cfg.rate)
+    state["refilled"] = now
+    limit = 1 if state["circuit"] == "half_open" else max(1, int(state["limit"]))
+    if len(leases) >= limit:
+        return "wait", 0.05
+    if state["tokens"] < 1:
+        return "wait", (1 - state["tokens"]) / cfg.rate
+    state["tokens"] -= 1
+    leases[lease] = now + cfg.lease_ttl
+    return "ok", 0.0
+
+
+def _decrease(state: dict, cfg: ProviderLimits, now: float):
+    if now - state["last_decrease"] >= cfg.cooldown:
+        state["limit"] = max(cfg.min_limit, state["limit"] * cfg.decrease)
+        state["last_decrease"] = now
+
+
+def _release(state: dict, cfg: ProviderLimits, now: float, lease: str, outcome: str,
+             latency: float, pause: Optional[float]):
+    state["leases"].pop(lease, None)
+    if outcome == "ok":
+        state["failures"] = 0
+        if state["circuit"] == "half_open":
+            state["circuit"] = "closed"
+        base = state["baseline"]
+        # Follows latency down at once and drifts up slowly: a floor for "normal".
+        state["baseline"] = latency if base is None else min(latency, base + (latency - base) * 0.05)
+        if cfg.latency_tolerance and base is not None and latency > base * cfg.latency_tolerance:
+            _decrease(state, cfg, now)
+        else:
+            state["limit"] = min(cfg.max_limit, state["limit"] + 1.0 / max(state["limit"], 1.0))
+    elif outcome in ("throttled", "server", "timeout"):
+        _decrease(state, cfg, now)
+        if pause:
+            state["paused_until"] = max(state["paused_until"], now + pause)
+        if not state["failures"]:
+            state["failing_since"] = now
+        state["failures"] += 1
+        sustained = (state["failures"] >= cfg.failure_threshold
+                     and now - state["failing_since"] >= cfg.failure_window)
+        if state["circuit"] == "half_open" or sustained:
+            if state["circuit"] != "open":
+                state["opened"] += 1
+            state["circuit"], state["open_until"] = "open", now + cfg.open_for
+
+
+# ── shared state backends ─────────────────────────────────────────────────────
+class ThrottleState(abc.ABC):
+    """Per-provider limiter state. ``update`` must apply ``fn`` atomically."""
+
+    @abc.abstractmethod
+    def update(self, provider: str, cfg: ProviderLimits, fn: Callable[[dict], object]):
+        ...
+
+
+class MemoryState(ThrottleState):
+    """State for the threads of one process."""
+
+    def __init__(self):
+        self._states: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def update(self, provider, cfg, fn):
+        with self._lock:
+            state = self._states.get(provider)
+            if state is None:
+                state = self._states[provider] = _new_state(cfg, time.time())
+            return fn(state)
+
+
+class SQLiteState(ThrottleState):
+    """State shared by worker processes on one host, in a single SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS throttle "
+                             "(provider TEXT PRIMARY KEY, state TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def update(self, provider, cfg, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT state FROM throttle WHERE provider = ?", (provider,)).fetchone()
+            state = json.loads(row[0]) if row else _new_state(cfg, time.time())
+            result = fn(state)
+            conn.execute("INSERT OR REPLACE INTO throttle VALUES (?, ?)", (provider, json.dumps(state)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+
+# ── controller ────────────────────────────────────────────────────────────────
+class Throttle:
+    """Admission control, adaptive concurrency, retries and circuit breaking per provider."""
+
+    WINDOW = 10_000
+
+    def __init__(self, limits: Optional[Dict[str, ProviderLimits]] = None,
+                 default: Optional[ProviderLimits] = None, state: Optional[ThrottleState] = None,
+                 retries: int = 4, backoff: float = 0.5, max_backoff: float = 30.0,
+                 acquire_timeout: float = 120.0):
+        self.limits = dict(limits or {})
+        self.default = default or ProviderLimits()
+        self.state = state or MemoryState()
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+        self._released = threading.Condition()
+        self._lock = threading.Lock()
+        self._queue_wait: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.WINDOW))
+        self._latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.WINDOW))
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._waiting: Dict[str, int] = defaultdict(int)
+
+    def config(self, provider: str) -> ProviderLimits:
+        return self.limits.get(provider, self.default)
+
+    def _count(self, provider: str, key: str, n: int = 1):
+        with self._lock:
+            self._counts[provider][key] += n
+
+    # ── slots ─────────────────────────────────────────────────────────────────
+    def acquire(self, provider: str) -> str:
+        """Block until a slot is granted; returns its lease id."""
+        cfg = self.config(provider)
+        lease = os.urandom(8).hex()
+        start = time.perf_counter()
+        deadline = start + self.acquire_timeout
+        with self._lock:
+            self._waiting[provider] += 1
+        try:
+            while True:
+                status, wait = self.state.update(
+                    provider, cfg, lambda s: _acquire(s, cfg, time.time(), lease))
+                if status == "ok":
+                    break
+                if status == "open":
+                    self._count(provider, "rejected_open")
+                    raise CircuitOpenError(provider, wait)
+                if time.perf_counter() + wait > deadline:
+                    raise TimeoutError(f"no {provider} slot within {self.acquire_timeout:g}s")
+                with self._released:              # woken early by local releases
+                    self._released.wait(min(wait, 0.25))
+        finally:
+            with self._lock:
+                self._waiting[provider] -= 1
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._queue_wait[provider].append(waited)
+        return lease
+
+    def release(self, provider: str, lease: str, outcome: str = "ok", latency: float = 0.0,
+                pause: Optional[float] = None):
+        cfg = self.config(provider)
+        self.state.update(provider, cfg,
+                          lambda s: _release(s, cfg, time.time(), lease, outcome, latency, pause))
+        with self._lock:
+            self._counts[provider][outcome] += 1
+            if outcome == "ok":
+                self._latency[provider].append(latency)
+        with self._released:
+            self._released.notify_all()
+
+    @contextmanager
+    def slot(self, provider: str):
+        """Hold one slot for the duration of the block (no retries)."""
+        lease = self.acquire(provider)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            kind = classify(e) if isinstance(e, Exception) else "client"
+            self.release(provider, lease, kind, time.perf_counter() - start, retry_after(e))
+            raise
+        self.release(provider, lease, "ok", time.perf_counter() - start)
+
+    # ── calls ─────────────────────────────────────────────────────────────────
+    def call(self, provider: str, fn: Callable, *args, **kwargs):
+        """``fn(*args, **kwargs)`` under the provider's limits, retried with jitter."""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.slot(provider):
+                    return fn(*args, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if classify(e) == "client" or attempt == self.retries:
+                    raise
+                self._backoff(provider, attempt, e)
+
+    def _backoff(self, provider: str, attempt: int, exc: BaseException):
+        self._count(provider, "retries")
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        time.sleep(max(delay, retry_after(exc) or 0.0))
+
+    def wrap(self, agent, provider: Optional[str] = None) -> "ThrottledAgent":
+        return ThrottledAgent(agent, self, provider)
+
+    # ── metrics ───────────────────────────────────────────────────────────────
+    def metrics(self) -> Dict[str, dict]:
+        """Shared limiter state plus this process's counters and wait windows."""
+        providers = set(self.limits) | set(self._counts) | set(self._queue_wait)
+        out = {}
+        for provider in sorted(providers):
+            cfg = self.config(provider)
+            state = self.state.update(provider, cfg, lambda s: json.loads(json.dumps(s)))
+            now = time.time()
+            with self._lock:
+                counts = dict(self._counts[provider])
+                waits, latency = list(self._queue_wait[provider]), list(self._latency[provider])
+                waiting = self._waiting[provider]
+            out[provider] = {
+                "limit": round(state["limit"], 2),
+                "in_flight": sum(1 for exp in state["leases"].values() if exp >= now),
+                "waiting": waiting,
+                "tokens": round(min(cfg.burst, state["tokens"] + (now - state["refilled"]) * cfg.rate), 2),
+                "circuit": state["circuit"],
+                "circuit_opened": state["opened"],
+                "baseline_latency": state["baseline"],
+                "queue_wait": summarize(waits),
+                "latency": summarize(latency),
+                **counts,
+            }
+        return out
+
+
+class ThrottledAgent:
+    """Agent proxy whose ``run()`` goes through a :class:`Throttle`."""
+
+    def __init__(self, agent, throttle: Throttle, provider: Optional[str] = None):
+        self._agent = agent
+        self._throttle = throttle
+        self._provider = provider or getattr(agent, "provider", None) or "default"
+
+    def __getattr__(self, attr):
+        return getattr(self._agent, attr)
+
+    def run(self, message, *args, stream: bool = False, **kwargs):
+        if not stream:
+            return self._throttle.call(self._provider, self._agent.run, message, *args, **kwargs)
+        # A stream holds its slot until it is consumed; only opening it is retried.
+        throttle, provider = self._throttle, self._provider
+        for attempt in range(throttle.retries + 1):
+            lease = throttle.acquire(provider)
+            start = time.perf_counter()
+            try:
+                chunks = self._agent.run(message, *args, stream=True, **kwargs)
+                break
+            except Exception as e:
+                kind = classify(e)
+                throttle.release(provider, lease, kind, time.perf_counter() - start, retry_after(e))
+                if kind == "client" or attempt == throttle.retries:
+                    raise
+                throttle._backoff(provider, attempt, e)
+
+        def generate():
+            outcome, pause = "ok", None
+            try:
+                yield from chunks
+            except Exception as e:
+                outcome, pause = classify(e), retry_after(e)
+                raise
+            finally:
+                throttle.release(provider, lease, outcome, time.perf_counter() - start, pause)
+        return generate()
+
+
+# ── simulation ────────────────────────────────────────────────────────────────
+class SimulatedProvider:
+    """Fake LLM endpoint: latency grows with load; over ``capacity`` calls get 429s."""
+
+    def __init__(self, capacity: int = 12, latency: float = 0.2, active=None):
+        self.capacity = capacity
+        self.latency = latency
+        self.active = active        # multiprocessing.Value to share load across processes
+        self._local = 0
+        self._lock = threading.Lock()
+
+    def _adjust(self, delta: int) -> int:
+        if self.active is not None:
+            with self.active.get_lock():
+                self.active.value += delta
+                return self.active.value
+        with self._lock:
+            self._local += delta
+            return self._local
+
+    def run(self, message: str):
+        load = self._adjust(1)
+        try:
+            if load > self.capacity:
+                time.sleep(0.01)
+                err = RuntimeError("429 Too Many Requests")
+                err.status_code = 429
+                raise err
+            time.sleep(self.latency * (1 + 0.5 * load / self.capacity) * random.uniform(0.8, 1.2))
+            return message
+        finally:
+            self._adjust(-1)
+
+
+def simulate(throttle: Optional[Throttle], provider: SimulatedProvider, threads: int = 48,
+             duration: float = 10.0, report_every: float = 1.0, name: str = "sim") -> dict:
+    """Hammer ``provider`` from ``threads`` threads; returns counts."""
+    stop = time.perf_counter() + duration
+    counts = defaultdict(int)
+    lock = threading.Lock()
+
+    def worker():
+        while time.perf_counter() < stop:
+            try:
+                if throttle is None:
+                    provider.run("hi")
+                else:
+                    throttle.call(name, provider.run, "hi")
+                key = "ok"
+            except CircuitOpenError:
+                key = "circuit_open"
+                time.sleep(0.1)
+            except Exception:
+                key = "failed"
+            with lock:
+                counts[key] += 1
+
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    start = time.perf_counter()
+    while any(t.is_alive() for t in pool):
+        time.sleep(report_every)
+        if throttle is not None and report_every:
+            m = throttle.metrics().get(name, {})
+            print(f"  t={time.perf_counter() - start:5.1f}s  limit={m.get('limit', 0):5.1f}  "
+                  f"in_flight={m.get('in_flight', 0):3}  429s={m.get('throttled', 0):5}  "
+                  f"ok={counts['ok']:6}  wait p95={m.get('queue_wait', {}).get('p95', 0):.2f}s")
+    return dict(counts)
+
+
+def _simulate_process(db: str, active, threads: int, duration: float, capacity: int):
+    throttle = Throttle({"sim": ProviderLimits(rate=200, burst=50)}, state=SQLiteState(db),
+                        backoff=0.05, max_backoff=1.0)
+    counts = simulate(throttle, SimulatedProvider(capacity, active=active), threads, duration,
+                      report_every=0)
+    print(f"  pid {os.getpid()}: {counts}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate adaptive concurrency against a rate-limited provider.")
+    parser.add_argument("--simulate", action="store_true")
+    parser.add_argument("--capacity", type=int, default=12, help="provider's concurrent-call capacity")
+    parser.add_argument("--threads", type=int, default=48)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--db", default="lyzr-throttle.db", help="SQLite state file for --processes")
+    args = parser.parse_args(argv)
+    if not args.simulate:
+        parser.print_help()
+        return 1
+
+    if args.processes > 1:
+        import multiprocessing
+
+        active = multiprocessing.Value("i", 0)
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        SQLiteState(args.db)
+        print(f"{args.processes} processes × {args.threads // args.processes} threads sharing {args.db}, "
+              f"capacity {args.capacity}")
+        procs = [multiprocessing.Process(target=_simulate_process,
+                                         args=(args.db, active, args.threads // args.processes,
+                                               args.duration, args.capacity))
+                 for _ in range(args.processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        shared = Throttle({"sim": ProviderLimits(rate=200, burst=50)}, state=SQLiteState(args.db))
+        m = shared.metrics()["sim"]
+        print(f"Shared limit {m['limit']}, circuit {m['circuit']}")
+        return 0
+
+    print(f"Without throttle ({args.threads} threads, capacity {args.capacity}):")
+    naive = simulate(None, SimulatedProvider(args.capacity), args.threads, args.duration / 2,
+                     report_every=0)
+    print(f"  {naive}")
+    print("With throttle:")
+    throttle = Throttle({"sim": ProviderLimits(rate=200, burst=50)}, backoff=0.05, max_backoff=1.0)
+    counts = simulate(throttle, SimulatedProvider(args.capacity), args.threads, args.duration)
+    print(f"  {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
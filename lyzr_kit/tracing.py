@@ -0,0 +1,516 @@
+"""Hierarchical tracing for agent runs, tools and sub-agents.
+
+Wrap agents with :meth:`Tracer.agent` and every ``run()`` becomes a span, with
+latency, prompt/response size, and, for ``stream=True``, time to first chunk
+and chunk count. Tools added through the wrapper (or decorated with
+:meth:`Tracer.tool`) become child spans and are counted on their parent run.
+Because lesson 15's wrapper tools call the specialists' ``run()`` from inside
+the manager's tool call, a traced manager → specialist → tool chain nests
+naturally::
+
+    tracer = Tracer([JSONLExporter("traces.jsonl"), ConsoleSummary()])
+    order_agent = tracer.agent(order_agent)
+    manager = tracer.agent(manager_agent)
+    manager.add_tool(handle_order_query)      # traced tool
+    manager.run("Where is ORD-1001?")
+    tracer.close()                            # flush; prints the summary
+
+The current span lives in a ``contextvars.ContextVar``, so nesting follows the
+call stack (and :mod:`lyzr_kit.fanout` copies it into its worker threads).
+Overhead is a few microseconds per span; use ``sample_rate`` to keep a
+fraction of traces when volume is high. Exporters: :class:`JSONLExporter`,
+:class:`ConsoleSummary` and :class:`OTLPJSONExporter`, which writes
+OpenTelemetry OTLP/JSON for a collector file receiver or posts it to an
+OTLP/HTTP endpoint.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Sequence
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("lyzr_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str                       # "agent" | "tool" | "internal"
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int                   # wall clock, for exporters
+    sampled: bool = True
+    duration: float = 0.0           # seconds (monotonic)
+    status: str = "ok"
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _t0: float = field(default=0.0, repr=False)
+
+    @property
+    def end_ns(self) -> int:
+        return self.start_ns + int(self.duration * 1e9)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "kind": self.kind, "trace_id": self.trace_id,
+                "span_id": self.span_id, "parent_id": self.parent_id,
+                "start_ns": self.start_ns, "duration": self.duration, "status": self.status,
+                "error": self.error, "attributes": self.attributes}
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def _response_size(result) -> Optional[int]:
+    text = getattr(result, "response", None)
+    if isinstance(text, str):
+        return len(text)
+    if isinstance(result, str):
+        return len(result)
+    for attr in ("model_dump_json", "json"):            # response_model instances
+        fn = getattr(result, attr, None)
+        if callable(fn):
+            try:
+                return len(fn())
+            except Exception:
+                return None
+    return None
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporters."""
+
+    def __init__(self, exporters: Sequence = (), sample_rate: float = 1.0):
+        self.exporters = list(exporters)
+        self.sample_rate = sample_rate
+
+    # ── spans ─────────────────────────────────────────────────────────────────
+    def start(self, name: str, kind: str = "internal", **attributes) -> Span:
+        parent = _current.get()
+        if parent is not None:
+            trace_id, sampled = parent.trace_id, parent.sampled
+        else:
+            trace_id, sampled = os.urandom(16).hex(), random.random() < self.sample_rate
+        return Span(name, kind, trace_id, os.urandom(8).hex(),
+                    parent.span_id if parent is not None else None, time.time_ns(), sampled,
+                    attributes=attributes, _t0=time.perf_counter())
+
+    def finish(self, span: Span, error: Optional[BaseException] = None):
+        span.duration = time.perf_counter() - span._t0
+        if error is not None:
+            span.status, span.error = "error", f"{type(error).__name__}: {error}"
+        if not span.sampled:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception:
+                pass                # tracing must never break the traced call
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes) -> Iterator[Span]:
+        span = self.start(name, kind, **attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            _current.reset(token)
+            self.finish(span, e)
+            raise
+        _current.reset(token)
+        self.finish(span)
+
+    # ── instrumentation ───────────────────────────────────────────────────────
+    def tool(self, fn: Callable, name: Optional[str] = None) -> Callable:
+        """Trace a tool function. ``functools.wraps`` keeps what ``add_tool`` reads."""
+        if getattr(fn, "__traced__", False):
+            return fn
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            parent = _current.get()
+            if parent is not None:
+                parent.attributes["tool_calls"] = parent.attributes.get("tool_calls", 0) + 1
+            with self.span(span_name, "tool") as span:
+                result = fn(*args, **kwargs)
+                size = _response_size(result)
+                if size is not None:
+                    span.set(response_chars=size)
+                return result
+        wrapper.__traced__ = True
+        return wrapper
+
+    def agent(self, agent, name: Optional[str] = None) -> "TracedAgent":
+        return TracedAgent(agent, self, name)
+
+    def close(self):
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close is not None:
+                close()
+
+
+class TracedAgent:
+    """Agent proxy whose ``run()`` (sync or streaming) and ``add_tool()`` are traced."""
+
+    def __init__(self, agent, tracer: Tracer, name: Optional[str] = None):
+        self._agent = agent
+        self._tracer = tracer
+        self._name = name or getattr(agent, "name", None) or "agent"
+
+    def __getattr__(self, attr):
+        return getattr(self._agent, attr)
+
+    def add_tool(self, fn: Callable, *args, **kwargs):
+        return self._agent.add_tool(self._tracer.tool(fn), *args, **kwargs)
+
+    def run(self, message, *args, stream: bool = False, **kwargs):
+        attrs = {"agent": self._name, "prompt_chars": len(message) if isinstance(message, str) else None,
+                 "stream": stream}
+        if kwargs.get("session_id"):
+            attrs["session_id"] = kwargs["session_id"]
+        if stream:
+            return self._stream(message, args, kwargs, attrs)
+        with self._tracer.span(f"{self._name}.run", "agent", **attrs) as span:
+            result = self._agent.run(message, *args, **kwargs)
+            size = _response_size(result)
+            if size is not None:
+                span.set(response_chars=size)
+            return result
+
+    def _stream(self, message, args, kwargs, attrs):
+        tracer = self._tracer
+        span = tracer.start(f"{self._name}.run", "agent", **attrs)
+        # Tools called while the stream is produced nest under this span.
+        token = _current.set(span)
+        try:
+            chunks = self._agent.run(message, *args, stream=True, **kwargs)
+        except BaseException as e:
+            _current.reset(token)
+            tracer.finish(span, e)
+            raise
+        _current.reset(token)
+
+        def generate():
+            count = chars = 0
+            error = None
+            iterator = iter(chunks)
+            try:
+                while True:
+                    # Current only while the stream is producing, not while the
+                    # caller handles a chunk.
+                    inner = _current.set(span)
+                    try:
+                        chunk = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        _current.reset(inner)
+                    if count == 0:
+                        span.set(first_chunk_s=time.perf_counter() - span._t0)
+                    count += 1
+                    content = getattr(chunk, "content", chunk)
+                    chars += len(content) if isinstance(content, str) else 0
+                    yield chunk
+            except GeneratorExit:
+                span.set(abandoned=True)
+                raise
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                span.set(chunks=count, response_chars=chars)
+                tracer.finish(span, error)
+        return generate()
+
+
+# ── exporters ─────────────────────────────────────────────────────────────────
+class JSONLExporter:
+    """One JSON object per finished span, buffered and appended to ``path``."""
+
+    def __init__(self, path: str, flush_every: int = 200):
+        self.path = path
+        self.flush_every = flush_every
+        self._buf: List[str] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._buf.append(line)
+            if len(self._buf) >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        if self._buf:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(self._buf) + "\n")
+            self._buf.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+
+class ConsoleSummary:
+    """Aggregates spans by name; :meth:`report` prints p50/p95 per hop.
+
+    Also keeps the spans of the last few traces so :meth:`print_trace` can
+    show the manager → specialist → tool tree of one request.
+    """
+
+    def __init__(self, keep_traces: int = 20, max_samples: int = 10_000, stream=None):
+        self.stream = stream or sys.stdout
+        self.max_samples = max_samples
+        self._durations: Dict[tuple, Deque[float]] = defaultdict(lambda: deque(maxlen=max_samples))
+        self._errors: Dict[tuple, int] = defaultdict(int)
+        self._traces: "Dict[str, List[Span]]" = {}
+        self._order: Deque[str] = deque(maxlen=keep_traces)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        key = (span.kind, span.name)
+        with self._lock:
+            self._durations[key].append(span.duration)
+            if span.status != "ok":
+                self._errors[key] += 1
+            if span.trace_id not in self._traces:
+                if len(self._order) == self._order.maxlen:
+                    self._traces.pop(self._order[0], None)
+                self._order.append(span.trace_id)
+                self._traces[span.trace_id] = []
+            self._traces[span.trace_id].append(span)
+
+    def report(self) -> str:
+        from lyzr_kit.bench import summarize
+
+        lines = [f"{'kind':<8} {'span':<34} {'calls':>6} {'p50':>8} {'p95':>8} {'max':>8} {'err':>4}"]
+        with self._lock:
+            rows = sorted(self._durations.items(), key=lambda kv: -sum(kv[1]))
+            for (kind, name), samples in rows:
+                s = summarize(list(samples))
+                lines.append(f"{kind:<8} {name[:34]:<34} {s['count']:>6} {s['p50']:>7.2f}s "
+                             f"{s['p95']:>7.2f}s {s['max']:>7.2f}s {self._errors[(kind, name)]:>4}")
+        return "\n".join(lines)
+
+    def trace_tree(self, trace_id: Optional[str] = None) -> str:
+        with self._lock:
+            if not self._order:
+                return ""
+            spans = list(self._traces.get(trace_id or self._order[-1], []))
+        children: Dict[Optional[str], List[Span]] = defaultdict(list)
+        ids = {s.span_id for s in spans}
+        for s in sorted(spans, key=lambda s: s.start_ns):
+            children[s.parent_id if s.parent_id in ids else None].append(s)
+
+        lines = []
+
+        def walk(parent_id, depth):
+            for s in children.get(parent_id, []):
+                extra = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                                  for k, v in s.attributes.items()
+                                  if k in ("first_chunk_s", "chunks", "tool_calls", "response_chars"))
+                mark = " ✗" if s.status != "ok" else ""
+                lines.append(f"{'  ' * depth}{s.name} {s.duration:.2f}s{mark}"
+                             + (f" ({extra})" if extra else ""))
+                walk(s.span_id, depth + 1)
+        walk(None, 0)
+        return "\n".join(lines)
+
+    def print_trace(self, trace_id: Optional[str] = None):
+        print(self.trace_tree(trace_id), file=self.stream)
+
+    def close(self):
+        if self._durations:
+            print("\nTrace summary\n" + self.report(), file=self.stream)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPJSONExporter:
+    """OpenTelemetry OTLP/JSON (``ExportTraceServiceRequest``) output.
+
+    With ``path``, batches are appended as JSON lines (readable by the
+    collector's ``otlpjsonfile`` receiver); with ``endpoint``
+    (e.g. ``http://localhost:4318/v1/traces``) they are POSTed instead.
+    """
+
+    _KINDS = {"agent": 3, "tool": 1, "internal": 1}     # CLIENT / INTERNAL
+
+    def __init__(self, path: Optional[str] = None, endpoint: Optional[str] = None,
+                 service_name: str = "lyzr-agents", batch_size: int = 256):
+        if not path and not endpoint:
+            raise ValueError("give a path or an endpoint")
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self._batch: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) < self.batch_size:
+                return
+            batch, self._batch = self._batch, []
+        self._send(batch)
+
+    def encode(self, spans: Sequence[Span]) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name",
+                                         "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "lyzr_kit.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id, "spanId": s.span_id,
+                    **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                    "name": s.name, "kind": self._KINDS.get(s.kind, 1),
+                    "startTimeUnixNano": str(s.start_ns), "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": _otlp_value(v)}
+                                   for k, v in {"lyzr.kind": s.kind, **s.attributes}.items()
+                                   if v is not None],
+                    "status": {"code": 2, "message": s.error} if s.status != "ok" else {"code": 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def _send(self, batch: Sequence[Span]):
+        if not batch:
+            return
+        body = json.dumps(self.encode(batch))
+        if self.endpoint:
+            req = urllib.request.Request(self.endpoint, data=body.encode("utf-8"), method="POST",
+                                         headers={"Content-Type": "application/json"})
+            urllib.request.urlopen(req, timeout=10).close()
+        else:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(body + "\n")
+
+    def close(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        try:
+            self._send(batch)
+        except Exception:
+            pass
+
+
+def overhead(n: int = 100_000) -> float:
+    """Mean seconds of tracing overhead per span (with a no-op exporter)."""
+    class _Null:
+        def export(self, span):
+            pass
+
+    tracer = Tracer([_Null()])
+    fn = tracer.tool(lambda x: x)
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    traced = time.perf_counter() - start
+    plain = lambda x: x
+    start = time.perf_counter()
+    for i in range(n):
+        plain(i)
+    return (traced - (time.perf_counter() - start)) / n
+
+
+def load(path: str) -> List[Span]:
+    """Read spans back from a :class:`JSONLExporter` file."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                spans.append(Span(**json.loads(line)))
+    return spans
+
+
+def _demo(tracer: Tracer):
+    """Stub manager → specialist → tool run, to see the span tree offline."""
+    from lyzr_kit.stub import StubStudio
+
+    studio = StubStudio()
+    specialist = tracer.agent(studio.create_agent(name="Order Specialist", provider="stub",
+                                                  role="orders"))
+    manager = tracer.agent(studio.create_agent(name="Support Manager", provider="stub",
+                                               role="routing"))
+
+    def lookup_order(order_id: str) -> str:
+        """Look up an order by ID."""
+        return f"{order_id}: shipped"
+    specialist.add_tool(lookup_order)
+
+    def handle_order_query(query: str) -> str:
+        """Route order questions to the order specialist."""
+        return specialist.run(query).response
+    manager.add_tool(handle_order_query)
+
+    manager.run("Where is my order ORD-1001?")
+    for _ in manager.run("Summarise order ORD-1001", stream=True):
+        pass
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise traces or measure tracing overhead.")
+    parser.add_argument("traces", nargs="?", help="JSONL file written by JSONLExporter")
+    parser.add_argument("--trace", help="print this trace id's tree (default: the last trace)")
+    parser.add_argument("--otlp", metavar="PATH", help="also convert the spans to OTLP/JSON here")
+    parser.add_argument("--demo", action="store_true", help="trace a stub manager/specialist run")
+    parser.add_argument("--overhead", action="store_true", help="measure per-span overhead")
+    args = parser.parse_args(argv)
+
+    if args.overhead:
+        print(f"Tracing overhead: {overhead() * 1e6:.1f}µs per span")
+    if args.demo:
+        summary = ConsoleSummary()
+        tracer = Tracer([summary])
+        _demo(tracer)
+        for trace_id in list(summary._order):
+            summary.print_trace(trace_id)
+        tracer.close()
+    if args.traces:
+        summary = ConsoleSummary(keep_traces=10 ** 6)
+        spans = load(args.traces)
+        for span in spans:
+            summary.export(span)
+        print(summary.report())
+        print()
+        summary.print_trace(args.trace)
+        if args.otlp:
+            exporter = OTLPJSONExporter(args.otlp, batch_size=10 ** 9)
+            for span in spans:
+                exporter.export(span)
+            exporter.close()
+            print(f"\n{len(spans)} spans written to {args.otlp}")
+    if not (args.overhead or args.demo or args.traces):
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""Production webhook service for the lesson 14 WhatsApp co-pilot.
+
+Meta expects a webhook to answer within a few seconds and retries otherwise,
+while an agent turn can take much longer. So the service acknowledges every
+delivery immediately and hands messages to a :class:`SessionDispatcher`:
+
+* one FIFO queue per phone number, and at most one turn in flight per number,
+  so a customer's turns reach ``agent.run(..., session_id=phone)`` strictly
+  in order;
+* different numbers are processed in parallel by a bounded worker pool
+  (``agent.run`` is blocking, so it runs in a thread pool);
+* when too many messages are queued, new deliveries get a 503 and Meta
+  redelivers them later (backpressure); redeliveries of messages already
+  accepted are de-duplicated by message id;
+* queue depth, queue wait, agent time and end-to-end latency are exposed at
+  ``/metrics`` (plus the per-provider limits with ``--throttle-db``, see
+  :mod:`lyzr_kit.throttle`).
+
+Deliveries are authenticated: every POST must carry Meta's
+``X-Hub-Signature-256`` HMAC-SHA256 of the raw body under the app secret,
+and the verification handshake must present the verify token. The server
+refuses to start without both.
+
+Run it with::
+
+    LYZR_API_KEY=sk-... WHATSAPP_AGENT_ID=... WEBHOOK_VERIFY_TOKEN=... \\
+        WHATSAPP_APP_SECRET=... python -m lyzr_kit.webhook --port 8000
+    WEBHOOK_VERIFY_TOKEN=... WHATSAPP_APP_SECRET=... \\
+        python -m lyzr_kit.webhook --stub     # stub agent, replies printed
+
+``fastapi`` and ``uvicorn`` are only needed for the HTTP app; the dispatcher
+itself is plain asyncio (see ``lyzr_kit.loadgen``).
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+import urllib.request
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+from lyzr_kit.bench import summarize
+
+GRAPH_API = "https://graph.facebook.com/v19.0"
+
+
+@dataclass
+class Inbound:
+    session_id: str          # customer phone number
+    text: str
+    message_id: str = ""
+    received: float = 0.0    # time.monotonic() when the webhook accepted it
+
+
+class Metrics:
+    """Counters and bounded latency windows for /metrics."""
+
+    WINDOW = 10_000
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.queue_wait: Deque[float] = deque(maxlen=self.WINDOW)
+        self.agent_time: Deque[float] = deque(maxlen=self.WINDOW)
+        self.end_to_end: Deque[float] = deque(maxlen=self.WINDOW)
+
+    def snapshot(self, depth: int, sessions: int, in_flight: int) -> dict:
+        return {
+            "queue_depth": depth,
+            "max_queue_depth": self.max_depth,
+            "active_sessions": sessions,
+            "in_flight": in_flight,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queue_wait": summarize(list(self.queue_wait)),
+            "agent_time": summarize(list(self.agent_time)),
+            "end_to_end": summarize(list(self.end_to_end)),
+        }
+
+
+class SessionDispatcher:
+    """Per-session FIFO queues drained by a bounded pool of workers.
+
+    ``handle(session_id, text) -> reply`` and ``send(session_id, reply)`` are
+    blocking callables and run in a thread pool of ``workers`` threads.
+    """
+
+    def __init__(self, handle: Callable[[str, str], str], send: Callable[[str, str], object],
+                 workers: int = 16, max_pending: int = 10_000, max_per_session: int = 50,
+                 dedupe_window: int = 50_000):
+        self.handle = handle
+        self.send = send
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_session = max_per_session
+        self.metrics = Metrics()
+        self._queues: Dict[str, Deque[Inbound]] = {}
+        self._ready: "asyncio.Queue[Optional[str]]" = None
+        self._pending = 0
+        self._in_flight = 0
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._dedupe_window = dedupe_window
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wa-turn")
+        self._tasks: List[asyncio.Task] = []
+        self._idle: Optional[asyncio.Event] = None
+
+    # ── lifecycle ─────────────────────────────────────────────────────────────
+    async def start(self):
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait until every accepted message has been processed."""
+        await asyncio.wait_for(self._idle.wait(), timeout)
+
+    async def stop(self, timeout: float = 30.0):
+        try:
+            await self.drain(timeout)
+        except asyncio.TimeoutError:
+            pass
+        for _ in self._tasks:
+            self._ready.put_nowait(None)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False)
+
+    # ── intake ────────────────────────────────────────────────────────────────
+    def submit(self, msg: Inbound) -> bool:
+        """Queue ``msg``; False means "overloaded, ask the sender to retry".
+
+        Must be called from the event loop thread. Duplicates count as accepted.
+        """
+        if msg.message_id:
+            if msg.message_id in self._seen:
+                self.metrics.duplicates += 1
+                return True
+        queue = self._queues.get(msg.session_id)
+        if self._pending >= self.max_pending or (queue and len(queue) >= self.max_per_session):
+            self.metrics.rejected += 1
+            return False
+        if msg.message_id:
+            self._seen[msg.message_id] = None
+            if len(self._seen) > self._dedupe_window:
+                self._seen.popitem(last=False)
+        if not msg.received:
+            msg.received = time.monotonic()
+
+        self._pending += 1
+        self.metrics.accepted += 1
+        self.metrics.max_depth = max(self.metrics.max_depth, self._pending)
+        self._idle.clear()
+        if queue is None:
+            # Session not active: create its queue and schedule it. While the
+            # queue exists, exactly one worker owns the session.
+            self._queues[msg.session_id] = deque([msg])
+            self._ready.put_nowait(msg.session_id)
+        else:
+            queue.append(msg)
+        return True
+
+    # ── processing ────────────────────────────────────────────────────────────
+    def _turn(self, msg: Inbound, dequeued: float):
+        start = time.monotonic()
+        reply = self.handle(msg.session_id, msg.text)
+        agent_done = time.monotonic()
+        self.send(msg.session_id, reply)
+        return dequeued - msg.received, agent_done - start, time.monotonic() - msg.received
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session = await self._ready.get()
+            if session is None:
+                return
+            queue = self._queues[session]
+            msg = queue.popleft()
+            self._in_flight += 1
+            try:
+                wait, agent_time, total = await loop.run_in_executor(
+                    self._executor, self._turn, msg, time.monotonic())
+                self.metrics.queue_wait.append(wait)
+                self.metrics.agent_time.append(agent_time)
+                self.metrics.end_to_end.append(total)
+                self.metrics.processed += 1
+            except Exception as e:
+                self.metrics.failed += 1
+                print(f"[webhook] turn failed for {session}: {type(e).__name__}: {e}",
+                      file=sys.stderr)
+            finally:
+                self._in_flight -= 1
+                self._pending -= 1
+            if queue:
+                # Back of the line: other sessions get a turn before this one's next.
+                self._ready.put_nowait(session)
+            else:
+                del self._queues[session]
+                if self._pending == 0:
+                    self._idle.set()
+
+    def snapshot(self) -> dict:
+        return self.metrics.snapshot(self._pending, len(self._queues), self._in_flight)
+
+
+# ── Meta payloads ─────────────────────────────────────────────────────────────
+
+def parse_messages(body: dict) -> List[Inbound]:
+    """Extract text messages from a Meta webhook payload (all entries/changes)."""
+    out = []
+    for entry in body.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
+            for m in value.get("messages", []) or []:
+                if m.get("type", "text") != "text":
+                    continue
+                out.append(Inbound(m["from"], m["text"]["body"], m.get("id", "")))
+    return out
+
+
+def meta_payload(phone: str, text: str, message_id: str) -> dict:
+    """Build a minimal inbound-message payload in Meta's webhook shape."""
+    return {"object": "whatsapp_business_account", "entry": [{"changes": [{"value": {
+        "messaging_product": "whatsapp",
+        "messages": [{"from": phone, "id": message_id, "timestamp": str(int(time.time())),
+                      "type": "text", "text": {"body": text}}],
+    }}]}]}
+
+
+def sign(app_secret: str, body: bytes) -> str:
+    """``X-Hub-Signature-256`` value Meta sends with ``body``."""
+    return "sha256=" + hmac.new(app_secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def signature_valid(app_secret: str, body: bytes, header: Optional[str]) -> bool:
+    return bool(header) and hmac.compare_digest(sign(app_secret, body), header)
+
+
+class MetaCloudSender:
+    """Send replies through the WhatsApp Cloud API (blocking; runs in the pool)."""
+
+    def __init__(self, phone_number_id: str, token: str, timeout: float = 10.0):
+        self.url = f"{GRAPH_API}/{phone_number_id}/messages"
+        self.token = token
+        self.timeout = timeout
+
+    def __call__(self, to_number: str, message: str):
+        body = json.dumps({"messaging_product": "whatsapp", "to": to_number,
+                           "type": "text", "text": {"body": message}}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Authorization": f"Bearer {self.token}", "Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return resp.status
+
+
+def print_sender(to_number: str, message: str):
+    """Simulation sender, like ``send_whatsapp_reply`` in the notebook."""
+    print(f"[WhatsApp → {to_number}]: {message[:80]}")
+
+
+def agent_handler(agent) -> Callable[[str, str], str]:
+    """Adapt a lyzr agent: the phone number is the memory session id."""
+    def handle(session_id: str, text: str) -> str:
+        return agent.run(text, session_id=session_id).response
+    return handle
+
+
+# ── HTTP app ──────────────────────────────────────────────────────────────────
+
+def create_app(dispatcher: SessionDispatcher, verify_token: str, app_secret: str, throttle=None):
+    if not verify_token or not app_secret:
+        raise ValueError("webhook needs both a verify token and the Meta app secret")
+    from fastapi import FastAPI, HTTPException, Request, Response
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await dispatcher.start()
+        try:
+            yield
+        finally:
+            await dispatcher.stop()
+
+    app = FastAPI(title="WhatsApp co-pilot webhook", lifespan=lifespan)
+
+    @app.get("/webhook")
+    async def verify(request: Request):
+        """Meta webhook verification handshake."""
+        q = request.query_params
+        if q.get("hub.mode") == "subscribe" and q.get("hub.verify_token") == verify_token:
+            return Response(content=q.get("hub.challenge", ""), media_type="text/plain")
+        raise HTTPException(status_code=403, detail="Invalid verify token")
+
+    @app.post("/webhook")
+    async def receive(request: Request):
+        """Acknowledge immediately; the turn runs in the background."""
+        raw = await request.body()
+        if not signature_valid(app_secret, raw, request.headers.get("X-Hub-Signature-256")):
+            raise HTTPException(status_code=403, detail="Invalid signature")
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON")
+        for msg in parse_messages(body):
+            if not dispatcher.submit(msg):
+                # Meta retries non-2xx deliveries with backoff.
+                raise HTTPException(status_code=503, detail="Overloaded, retry later")
+        return {"status": "ok"}
+
+    @app.get("/metrics")
+    async def metrics():
+        snapshot = dispatcher.snapshot()
+        if throttle is not None:
+            snapshot["throttle"] = throttle.metrics()
+        return snapshot
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    return app
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="WhatsApp co-pilot webhook server.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent agent turns")
+    parser.add_argument("--max-pending", type=int, default=10_000)
+    parser.add_argument("--stub", action="store_true", help="use the offline stub agent")
+    parser.add_argument("--stream", action="store_true",
+                        help="send replies sentence by sentence as they stream (no RAI agents)")
+    parser.add_argument("--throttle-db", metavar="PATH",
+                        help="adaptive per-provider rate limiting, shared through this SQLite file")
+    args = parser.parse_args(argv)
+
+    verify_token = os.getenv("WEBHOOK_VERIFY_TOKEN", "")
+    app_secret = os.getenv("WHATSAPP_APP_SECRET", "")
+    if not verify_token or not app_secret:
+        print("ERROR: set WEBHOOK_VERIFY_TOKEN and WHATSAPP_APP_SECRET.")
+        return 1
+
+    if args.stub:
+        from lyzr_kit.stub import StubStudio
+        agent = StubStudio().create_agent(name="WhatsApp Stub", provider="stub")
+    else:
+        agent_id = os.getenv("WHATSAPP_AGENT_ID", "")
+        if not os.getenv("LYZR_API_KEY") or not agent_id:
+            print("ERROR: set LYZR_API_KEY and WHATSAPP_AGENT_ID (or use --stub).")
+            return 1
+        from lyzr import Studio
+        agent = Studio(api_key=os.environ["LYZR_API_KEY"]).get_agent(agent_id)
+
+    throttle = None
+    if args.throttle_db:
+        from lyzr_kit.throttle import SQLiteState, Throttle
+        throttle = Throttle(state=SQLiteState(args.throttle_db))
+        agent = throttle.wrap(agent)
+
+    phone_id, token = os.getenv("WHATSAPP_PHONE_NUMBER_ID"), os.getenv("WHATSAPP_TOKEN")
+    sender = MetaCloudSender(phone_id, token) if phone_id and token else print_sender
+    if args.stream:
+        from lyzr_kit.delivery import RateLimiter, streaming_handler
+        handle, send = streaming_handler(agent, sender, limiter=RateLimiter()), lambda to, msg: None
+    else:
+        handle, send = agent_handler(agent), sender
+    dispatcher = SessionDispatcher(handle, send, workers=args.workers,
+                                   max_pending=args.max_pending)
+    app = create_app(dispatcher, verify_token, app_secret, throttle)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,34 @@
 Lyzr ADK Validation Script
 Tests core API patterns from all 13 lessons.
 Run with: LYZR_API_KEY=sk-... python validate.py
+
+Independent tests run concurrently (set VALIDATE_WORKERS, default 4);
+each test declares which earlier tests it depends on.
+
+Offline: record once with LYZR_RECORD=1 LYZR_CASSETTE=cassettes/validate.json,
+then run with just LYZR_CASSETTE=... to replay without network or API key.
+Tests run one at a time while a cassette is active, so identical requests
+(e.g. two tests listing agents) replay in the order they were recorded.
 """
 
 import os
 import sys
 import time
 import uuid
+import threading
 import traceback
 
+from lyzr_kit.cleanup import Registry, delete_all
+from lyzr_kit.context_sync import ContextSync
+from lyzr_kit.kb import wait_for_indexed
+from lyzr_kit import replay
+from lyzr_kit.runner import Task, run_tasks, critical_path
+
 MODEL = "openai/gpt-4o-mini"
+# Tests run in a thread pool; each one is mostly a network round-trip to Studio.
+WORKERS = int(os.getenv("VALIDATE_WORKERS", "4"))
+# VALIDATE_LOCAL_KB=1 runs Test 10 against the offline NumPy KB (no indexing delay).
+LOCAL_KB = os.getenv("VALIDATE_LOCAL_KB") == "1"
 
 # ── colours & helpers ──────────────────────────────────────────────────────────
 GREEN = "\033[92m"
@@ -21,25 +40,32 @@ RESET = "\033[0m"
 passed = 0
 failed = 0
 results = []
+_results_lock = threading.Lock()
 
 
-def ok(n: int, name: str):
+def ok(n: int, name: str, duration: float = 0.0):
     global passed
-    passed += 1
-    msg = f"{GREEN}✅ Test {n}: {name} — PASSED{RESET}"
-    print(msg)
-    results.append((n, name, True, None))
+    with _results_lock:
+        passed += 1
+        msg = f"{GREEN}✅ Test {n}: {name} — PASSED ({duration:.2f}s){RESET}"
+        print(msg)
+        results.append((n, name, True, None, duration))
 
 
-def fail(n: int, name: str, err: str):
+def fail(n: int, name: str, err: str, duration: float = 0.0):
     global failed
-    failed += 1
-    msg = f"{RED}❌ Test {n}: {name} — FAILED: {err}{RESET}"
-    print(msg)
-    results.append((n, name, False, err))
+    with _results_lock:
+        failed += 1
+        msg = f"{RED}❌ Test {n}: {name} — FAILED: {err} ({duration:.2f}s){RESET}"
+        print(msg)
+        results.append((n, name, False, err, duration))
 
 
 # ── setup ──────────────────────────────────────────────────────────────────────
+cassette = replay.from_env()   # LYZR_CASSETTE: record/replay Studio HTTP
+REPLAYING = cassette is not None and cassette.replaying
+if cassette is not None:
+    WORKERS = 1   # cassettes match identical requests by order, which needs a serial run
 API_KEY = os.getenv("LYZR_API_KEY", "")
 if not API_KEY:
     print("ERROR: LYZR_API_KEY environment variable not set.")
@@ -51,55 +77,49 @@ print("=" * 60)
 from lyzr import Studio
 from lyzr.rai import PIIType, PIIAction
 
-# Cleanup registry — resources to delete at the end
-cleanup = {
-    "agents": [],       # agent objects
-    "kbs": [],          # knowledge base objects
-    "contexts": [],     # context objects
-    "policies": [],     # RAI policy objects
-}
+# Cleanup registry — resources to delete at the end (thread-safe; tests add
+# to it from worker threads)
+cleanup = Registry()
+
+
+studio = None
+agent = None
+
 
 # ── Test 1: Studio initialization ─────────────────────────────────────────────
-try:
+def test_1():
+    global studio
     studio = Studio(api_key=API_KEY)
     assert studio is not None
-    ok(1, "Studio initialization")
-except Exception as e:
-    fail(1, "Studio initialization", str(e))
-    print("Cannot continue without Studio. Exiting.")
-    sys.exit(1)
+
 
 # ── Test 2: create_agent ──────────────────────────────────────────────────────
-agent = None
-try:
-    agent = studio.create_agent(
+def test_2():
+    global agent
+    created = studio.create_agent(
         name="val-basic",
         provider=MODEL,
         role="assistant",
         goal="answer questions",
         instructions="Be very brief."
     )
-    assert agent is not None
-    assert hasattr(agent, "id") and agent.id
-    cleanup["agents"].append(agent)
-    ok(2, "create_agent")
-except Exception as e:
-    fail(2, "create_agent", str(e))
+    assert created is not None
+    assert hasattr(created, "id") and created.id
+    cleanup.add("agents", created)
+    agent = created
+
 
 # ── Test 3: agent.run() and response.response ─────────────────────────────────
-try:
-    assert agent is not None, "agent not created in Test 2"
+def test_3():
     response = agent.run("Hi")
     assert response is not None
     assert hasattr(response, "response"), "response object missing .response attribute"
     assert isinstance(response.response, str), f"response.response is {type(response.response)}, expected str"
     assert len(response.response) > 0, "response.response is empty"
-    ok(3, "agent.run() and response.response")
-except Exception as e:
-    fail(3, "agent.run() and response.response", str(e))
+
 
 # ── Test 4: list_agents / get_agent ───────────────────────────────────────────
-try:
+def test_4():
     agents_list = studio.list_agents()
     assert agents_list is not None
     ids = [a.id for a in agents_list]
@@ -107,24 +127,18 @@ try:
 
     retrieved = studio.get_agent(agent.id)
     assert retrieved.id == agent.id
-    ok(4, "list_agents / get_agent")
-except Exception as e:
-    fail(4, "list_agents / get_agent", str(e))
+
 
 # ── Test 5: agent.update() ────────────────────────────────────────────────────
-try:
-    assert agent is not None, "agent not created in Test 2"
+def test_5():
     agent.update(instructions="One sentence only.")
     # verify update persisted
     refreshed = studio.get_agent(agent.id)
     assert refreshed is not None
-    ok(5, "agent.update()")
-except Exception as e:
-    fail(5, "agent.update()", str(e))
+
 
 # ── Test 6: agent.clone() and clone.delete() ──────────────────────────────────
-try:
-    assert agent is not None, "agent not created in Test 2"
+def test_6():
     clone = agent.clone()
     assert clone is not None
     assert clone.id != agent.id
@@ -133,15 +147,13 @@ try:
     agents_after = studio.list_agents()
     ids_after = [a.id for a in agents_after]
     assert clone.id not in ids_after, "clone still present after delete"
-    ok(6, "agent.clone() and clone.delete()")
-except Exception as e:
-    fail(6, "agent.clone() and clone.delete()", str(e))
+
 
 # ── Test 7: Structured output with Pydantic (response_model) ──────────────────
 # NOTE: The notebooks show `response_format=Model` passed to agent.run(), but the
 # actual SDK uses `response_model=Model` on create_agent(). With response_model set,
 # agent.run() returns the Pydantic instance directly (not wrapped in AgentResponse).
-try:
+def test_7():
     from pydantic import BaseModel, Field
 
     class Sentiment(BaseModel):
@@ -156,32 +168,27 @@ try:
         instructions="Always fill all fields.",
         response_model=Sentiment,    # correct SDK parameter (not response_format)
     )
-    cleanup["agents"].append(struct_agent)
+    cleanup.add("agents", struct_agent)
 
     result = struct_agent.run("Great product!")
     # With response_model set, run() returns the Pydantic model directly
     assert isinstance(result, Sentiment), f"Expected Sentiment, got {type(result)}"
     assert hasattr(result, "label")
     assert hasattr(result, "score")
-    ok(7, "Structured output with Pydantic (response_format)")
-except Exception as e:
-    fail(7, "Structured output with Pydantic (response_format)", str(e))
+
 
 # ── Test 8: add_memory / remove_memory with session_id ────────────────────────
-try:
-    assert agent is not None, "agent not created in Test 2"
+def test_8():
     agent.add_memory(max_messages=5)
     session = str(uuid.uuid4())
     agent.run("My name is Val.", session_id=session)
     resp2 = agent.run("What is my name?", session_id=session)
     assert isinstance(resp2.response, str)
     agent.remove_memory()
-    ok(8, "add_memory / remove_memory with session_id")
-except Exception as e:
-    fail(8, "add_memory / remove_memory with session_id", str(e))
+
 
 # ── Test 9: add_tool with a simple Python function ────────────────────────────
-try:
+def test_9():
     def double(n: int) -> str:
         """Double a number and return the result as a string."""
         return str(n * 2)
@@ -193,46 +200,52 @@ try:
         goal="use tools",
         instructions="Use the double tool when asked to double a number."
     )
-    cleanup["agents"].append(tool_agent)
+    cleanup.add("agents", tool_agent)
     tool_agent.add_tool(double)
     resp = tool_agent.run("Double 7.")
     assert isinstance(resp.response, str)
     # The agent should mention 14 somewhere
-    ok(9, "add_tool with a simple Python function")
-except Exception as e:
-    fail(9, "add_tool with a simple Python function", str(e))
+
 
 # ── Test 10: create_knowledge_base / add_text / query ─────────────────────────
-kb = None
-try:
-    kb = studio.create_knowledge_base(name="val_kb_test")
+def test_10():
+    if LOCAL_KB:
+        from lyzr_kit.local_kb import LocalKBStudio
+        kb = LocalKBStudio().create_knowledge_base(name="val_kb_test")
+    else:
+        kb = studio.create_knowledge_base(name="val_kb_test")
+        cleanup.add("kbs", kb)
     assert kb is not None
     assert hasattr(kb, "id") and kb.id
-    cleanup["kbs"].append(kb)
 
+    ingested_at = time.monotonic()
     kb.add_text(
         text="The sky is blue. Water is wet.",
         source="facts"
     )
-    time.sleep(3)  # wait for indexing
+    # poll until the text is queryable instead of sleeping a fixed time
+    indexed = wait_for_indexed(kb, probe="What color is the sky?",
+                               ingested_at=ingested_at, deadline=20.0,
+                               initial_delay=0.0 if REPLAYING else 0.25)
+    print(f"  KB indexing latency: {indexed.latency:.2f}s "
+          f"({indexed.attempts} polls, ready={indexed.ready})")
 
     results_kb = kb.query("What color is the sky?", top_k=2)
     assert isinstance(results_kb, list), f"query returned {type(results_kb)}"
     # results may be 0 if indexing is slow, but call must not raise
-    ok(10, "create_knowledge_base / add_text / query")
-except Exception as e:
-    fail(10, "create_knowledge_base / add_text / query", str(e))
+    if LOCAL_KB:
+        assert results_kb and "sky" in results_kb[0].text, f"local KB missed: {results_kb}"
+
 
 # ── Test 11: create_context / add_context / context.update() / remove_context ─
-ctx = None
-try:
+def test_11():
     ctx = studio.create_context(
         name="val_ctx",
         value="User is a tester."
     )
     assert ctx is not None
     assert hasattr(ctx, "id") and ctx.id
-    cleanup["contexts"].append(ctx)
+    cleanup.add("contexts", ctx)
 
     ctx_agent = studio.create_agent(
         name="val-ctx",
@@ -241,62 +254,68 @@ try:
         goal="help",
         instructions="Use context."
     )
-    cleanup["agents"].append(ctx_agent)
+    cleanup.add("agents", ctx_agent)
 
     ctx_agent.add_context(ctx)
     ctx.update("User is an advanced tester.")
+
+    # Bursts through ContextSync: the no-op and the intermediate value are never written.
+    with ContextSync(debounce=0.2) as sync:
+        sync.track(ctx, "User is an advanced tester.")
+        sync.set(ctx, "User is an advanced tester.")
+        sync.set(ctx, "User is an expert tester.")
+        sync.set(ctx, "User is a senior tester.")
+    m = sync.metrics()
+    assert m["writes"] == 1 and m["skipped"] == 1, m
     ctx_agent.remove_context(ctx)
-    ok(11, "create_context / add_context / context.update() / remove_context")
-except Exception as e:
-    fail(11, "create_context / add_context / context.update() / remove_context", str(e))
+
 
 # ── Test 12: create_rai_policy / add_rai_policy ───────────────────────────────
 # NOTE: RAI uses a separate service endpoint (srs-prod.studio.lyzr.ai).
 # If that endpoint is unreachable, we accept a connectivity error as a known
 # infrastructure issue and still validate the API call shape is correct.
-policy = None
-try:
-    policy = studio.create_rai_policy(
-        name="val-rai-policy",
-        description="Validation test policy",
-        toxicity_threshold=0.4,
-        nsfw_check=False,
-        prompt_injection=False,
-    )
-    assert policy is not None
-    assert hasattr(policy, "id") and policy.id
-    cleanup["policies"].append(policy)
-
-    rai_agent = studio.create_agent(
-        name="val-rai",
-        provider=MODEL,
-        role="safe assistant",
-        goal="answer safely",
-        instructions="Be helpful."
-    )
-    cleanup["agents"].append(rai_agent)
+def test_12():
+    try:
+        policy = studio.create_rai_policy(
+            name="val-rai-policy",
+            description="Validation test policy",
+            toxicity_threshold=0.4,
+            nsfw_check=False,
+            prompt_injection=False,
+        )
+        assert policy is not None
+        assert hasattr(policy, "id") and policy.id
+        cleanup.add("policies", policy)
+
+        rai_agent = studio.create_agent(
+            name="val-rai",
+            provider=MODEL,
+            role="safe assistant",
+            goal="answer safely",
+            instructions="Be helpful."
+        )
+        cleanup.add("agents", rai_agent)
+
+        rai_agent.add_rai_policy(policy)
+        resp = rai_agent.run("Hello")
+        assert isinstance(resp.response, str)
+        rai_agent.remove_rai_policy()
+    except Exception as e:
+        err_str = str(e)
+        # Accept DNS/connectivity errors for the RAI service as a known infra issue
+        # (srs-prod.studio.lyzr.ai may not be publicly reachable in all environments)
+        if "nodename nor servname" in err_str or "ConnectError" in err_str or "Connection" in err_str:
+            raise RuntimeError(
+                f"RAI service unreachable (srs-prod.studio.lyzr.ai DNS/connectivity issue): {err_str}"
+            ) from e
+        raise
 
-    rai_agent.add_rai_policy(policy)
-    resp = rai_agent.run("Hello")
-    assert isinstance(resp.response, str)
-    rai_agent.remove_rai_policy()
-    ok(12, "create_rai_policy / add_rai_policy")
-except Exception as e:
-    err_str = str(e)
-    # Accept DNS/connectivity errors for the RAI service as a known infra issue
-    # (srs-prod.studio.lyzr.ai may not be publicly reachable in all environments)
-    if "nodename nor servname" in err_str or "ConnectError" in err_str or "Connection" in err_str:
-        fail(12, "create_rai_policy / add_rai_policy",
-             f"RAI service unreachable (srs-prod.studio.lyzr.ai DNS/connectivity issue): {err_str}")
-    else:
-        fail(12, "create_rai_policy / add_rai_policy", err_str)
 
 # ── Test 13: streaming (stream=True) ─────────────────────────────────────────
 # NOTE: stream=True yields AgentStream objects. Access chunk.content for text.
 # The notebooks show `print(chunk, end="")` but the actual SDK yields AgentStream
 # objects where you must use chunk.content to get the string fragment.
-try:
-    assert agent is not None, "agent not created in Test 2"
+def test_13():
     from lyzr.responses import AgentStream
     chunks_collected = []
     for i, chunk in enumerate(agent.run("Hi", stream=True)):
@@ -308,49 +327,67 @@ try:
         if i >= 2:   # collect at least 3 chunks then break
             break
     assert len(chunks_collected) > 0, "no chunks received from stream"
-    ok(13, "streaming (stream=True)")
-except Exception as e:
-    fail(13, "streaming (stream=True)", str(e))
 
-# ── Cleanup ────────────────────────────────────────────────────────────────────
-print("\n" + "=" * 60)
-print("Cleaning up created resources...")
 
-for ag in cleanup["agents"]:
-    try:
-        ag.delete()
-        print(f"  Deleted agent: {ag.id}")
-    except Exception as e:
-        print(f"  Warning: could not delete agent {ag.id}: {e}")
+# ── Dependency graph ──────────────────────────────────────────────────────────
+# Every test needs the Studio from Test 1. Tests 3–6, 8 and 13 share the Test 2
+# agent; 7, 9, 11 and 12 create their own. Test 8 also waits for Test 5 because
+# both reconfigure the shared agent (update vs. add_memory) and would race.
+TESTS = [
+    Task(1,  "Studio initialization", test_1),
+    Task(2,  "create_agent", test_2, deps=(1,)),
+    Task(3,  "agent.run() and response.response", test_3, deps=(2,)),
+    Task(4,  "list_agents / get_agent", test_4, deps=(2,)),
+    Task(5,  "agent.update()", test_5, deps=(2,)),
+    Task(6,  "agent.clone() and clone.delete()", test_6, deps=(2,)),
+    Task(7,  "Structured output with Pydantic (response_format)", test_7, deps=(1,)),
+    Task(8,  "add_memory / remove_memory with session_id", test_8, deps=(2, 5)),
+    Task(9,  "add_tool with a simple Python function", test_9, deps=(1,)),
+    Task(10, "create_knowledge_base / add_text / query", test_10, deps=(1,)),
+    Task(11, "create_context / add_context / context.update() / remove_context", test_11, deps=(1,)),
+    Task(12, "create_rai_policy / add_rai_policy", test_12, deps=(1,)),
+    Task(13, "streaming (stream=True)", test_13, deps=(2,)),
+]
+
+
+def report(res):
+    if res.ok:
+        ok(res.n, res.name, res.duration)
+    else:
+        fail(res.n, res.name, res.error, res.duration)
 
-for kb_obj in cleanup["kbs"]:
-    try:
-        kb_obj.delete()
-        print(f"  Deleted KB: {kb_obj.id}")
-    except Exception as e:
-        print(f"  Warning: could not delete KB {kb_obj.id}: {e}")
 
-for ctx_obj in cleanup["contexts"]:
-    try:
-        ctx_obj.delete()
-        print(f"  Deleted context: {ctx_obj.id}")
-    except Exception as e:
-        print(f"  Warning: could not delete context {ctx_obj.id}: {e}")
+run_start = time.perf_counter()
+task_results = run_tasks(TESTS, max_workers=WORKERS, on_done=report)
+wall_time = time.perf_counter() - run_start
 
-for pol_obj in cleanup["policies"]:
-    try:
-        pol_obj.delete()
-        print(f"  Deleted policy: {pol_obj.id}")
-    except Exception as e:
-        print(f"  Warning: could not delete policy {pol_obj.id}: {e}")
+if not task_results[1].ok:
+    print("Cannot continue without Studio. Exiting.")
+    sys.exit(1)
+
+# ── Cleanup ────────────────────────────────────────────────────────────────────
+print("\n" + "=" * 60)
+print("Cleaning up created resources...")
+
+cleanup_report = delete_all(cleanup)
+print(f"Cleanup: {cleanup_report}")
+if cassette is not None:
+    cassette.close()
 
 # ── Summary ───────────────────────────────────────────────────────────────────
-total = 13
+total = len(TESTS)
+chain, chain_time = critical_path(TESTS, task_results)
 print("\n" + "=" * 60)
+print("\nPer-test wall time:")
+for n, name, ok_flag, err, duration in sorted(results):
+    print(f"  Test {n:>2} {'✅' if ok_flag else '❌'} {duration:6.2f}s  {name}")
+print(f"\nWall time:          {wall_time:.2f}s ({WORKERS} workers)")
+print(f"Critical path time: {chain_time:.2f}s  (Tests {' → '.join(map(str, chain))})")
+print(f"Serial time:        {sum(r[4] for r in results):.2f}s")
 print(f"\n{passed}/{total} tests passed\n")
 
 if failed > 0:
     print("Failed tests:")
-    for n, name, ok_flag, err in results:
+    for n, name, ok_flag, err, duration in sorted(results):
         if not ok_flag:
             print(f"  Test {n} ({name}): {err}")
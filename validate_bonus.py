@@ -1,13 +1,53 @@
-"""Validation for bonus lessons 14 and 15."""
+"""Validation for bonus lessons 14 and 15.
+
+Run with: LYZR_API_KEY=sk-... python validate_bonus.py
+Offline: LYZR_CASSETTE=cassettes/bonus.json replays a run recorded with LYZR_RECORD=1.
+"""
 import os, sys, traceback
 
-os.environ["LYZR_API_KEY"] = "sk-default-gqcFW0hH98hyscbMUp8nS9cfHLEoLCDw"
+from lyzr_kit import replay
+
+# Before the key check: replay mode needs no key and supplies a dummy one.
+cassette = replay.from_env()
+if not os.getenv("LYZR_API_KEY"):
+    print("ERROR: LYZR_API_KEY environment variable not set.")
+    sys.exit(1)
 
 from lyzr import Studio
+from lyzr_kit.agent_pool import AgentPool, pooled_or_new
+from lyzr_kit.cache import ResponseCache, cached_tool
+from lyzr_kit.cleanup import Registry, delete_all
+from lyzr_kit.delivery import RateLimiter, deliver_stream
+from lyzr_kit.fanout import ask, fan_out
+from lyzr_kit.order_store import OrderStore, build_from_dicts, make_tools
+from lyzr_kit.pii import PIIEngine, check_parity, guard
+from lyzr_kit.router import (ECOMMERCE_EXAMPLES, ECOMMERCE_RULES, PreRouter, RoutedSupport,
+                             evaluate, lesson15_wrappers)
+from lyzr_kit.tracing import ConsoleSummary, JSONLExporter, Tracer
 
 studio = Studio(api_key=os.environ["LYZR_API_KEY"])
 
 results = []
+cleanup = Registry()   # everything created here is deleted at the end
+
+# Set LYZR_AGENT_POOL=path/to/agents.json to reuse agents across runs instead of
+# provisioning them every time. Pooled agents are kept, not cleaned up.
+pool = (AgentPool(studio, path=os.environ["LYZR_AGENT_POOL"], api_key=os.environ["LYZR_API_KEY"])
+        if os.getenv("LYZR_AGENT_POOL") else None)
+
+# Set LYZR_TRACE=traces.jsonl to record a span per agent run and tool call
+# (manager → tool → specialist) and print per-hop latencies at the end.
+tracer = (Tracer([JSONLExporter(os.environ["LYZR_TRACE"]), ConsoleSummary()])
+          if os.getenv("LYZR_TRACE") else None)
+
+
+def provision(name, tools=(), memory=None, **config):
+    """create_agent + add_tool/add_memory, through the agent pool when enabled."""
+    if tracer is not None:
+        tools = [tracer.tool(fn) for fn in tools]
+    agent = pooled_or_new(pool, studio, name, tools=tools, memory=memory,
+                          on_create=lambda a: cleanup.add("agents", a), **config)
+    return tracer.agent(agent) if tracer is not None else agent
 
 def test(name, fn):
     try:
@@ -53,10 +93,12 @@ def test14_1():
         goal="Help customers via WhatsApp",
         instructions="Look up orders when asked. Keep replies brief."
     )
+    cleanup.add("agents", agent)
     agent.add_tool(lookup_order)
     agent.add_memory(max_messages=5)
     from lyzr.rai import PIIType, PIIAction
     rai = studio.create_rai_policy(name="WA RAI Test", description="Test RAI policy", toxicity_threshold=0.4, pii_detection={PIIType.PHONE: PIIAction.REDACT, PIIType.EMAIL: PIIAction.REDACT})
+    cleanup.add("policies", rai)
     agent.add_rai_policy(rai)
     assert agent.id, "No agent ID"
 
@@ -64,14 +106,14 @@ test("14.1 Agent creation + tool + memory + RAI", test14_1)
 
 def test14_2():
     """Test: order lookup tool called by agent"""
-    agent = studio.create_agent(
+    agent = provision(
         name="WA Order Test",
         provider="openai/gpt-4o-mini",
         role="Order support agent",
         goal="Look up orders",
-        instructions="Use lookup_order for any order status question."
+        instructions="Use lookup_order for any order status question.",
+        tools=[lookup_order],
     )
-    agent.add_tool(lookup_order)
     r = agent.run("What is the status of order ORD-1001?")
     assert r.response, "Empty response"
     assert "ORD-1001" in r.response or "FedEx" in r.response or "shipped" in r.response, f"Order data not in response: {r.response[:100]}"
@@ -81,14 +123,14 @@ test("14.2 Order lookup tool routing", test14_2)
 def test14_3():
     """Test: session_id memory across turns"""
     import uuid
-    agent = studio.create_agent(
+    agent = provision(
         name="WA Session Test",
         provider="openai/gpt-4o-mini",
         role="Customer service agent",
         goal="Maintain conversation context",
-        instructions="Remember context across turns."
+        instructions="Remember context across turns.",
+        memory=5,
     )
-    agent.add_memory(max_messages=5)
     session = "+1-555-TEST"
     r1 = agent.run("My name is TestUser and I have a question about order ORD-1001.", session_id=session)
     r2 = agent.run("What was the order number I mentioned?", session_id=session)
@@ -104,6 +146,64 @@ def test14_4():
 
 test("14.4 send_whatsapp_reply simulation", test14_4)
 
+def test14_5():
+    """Test: streamed reply delivered sentence by sentence"""
+    agent = provision(
+        name="WA Stream Test",
+        provider="openai/gpt-4o-mini",
+        role="Customer service agent",
+        goal="Explain store policies",
+        instructions="Answer in three or four short sentences.",
+    )
+    r = deliver_stream(agent.run("Explain the return policy for headphones.", stream=True),
+                       "+1-555-0147", send_whatsapp_reply, min_chars=20, flush_after=2.0,
+                       limiter=RateLimiter(per_recipient_per_sec=2.0))
+    assert r.messages, "Nothing delivered"
+    assert r.time_to_first_sentence is not None and r.time_to_first_sentence <= r.total_time
+    print(f"    time to first sentence {r.time_to_first_sentence:.2f}s, "
+          f"total {r.total_time:.2f}s, {len(r.messages)} messages")
+
+test("14.5 Streamed sentence-level delivery", test14_5)
+
+def test14_6():
+    """Test: order tools backed by the indexed on-disk store, incl. batch lookup"""
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "orders.sqlite")
+    store = OrderStore(build_from_dicts(path, ORDERS))
+    lookup_order_db, lookup_orders_db, _ = make_tools(store)
+    assert lookup_order_db("ord-1001").startswith("Order ORD-1001: shipped"), lookup_order_db("ord-1001")
+    agent = provision(
+        name="WA Order Store Test",
+        provider="openai/gpt-4o-mini",
+        role="Order support agent",
+        goal="Look up orders",
+        instructions="Use lookup_orders when the customer asks about more than one order.",
+        tools=[lookup_order_db, lookup_orders_db],
+    )
+    r = agent.run("What's the status of ORD-1001 and ORD-1002?")
+    assert "FedEx" in r.response or "shipped" in r.response, f"ORD-1001 missing: {r.response[:100]}"
+    assert "UPS" in r.response or "processing" in r.response, f"ORD-1002 missing: {r.response[:100]}"
+
+test("14.6 Order store tools (batch lookup)", test14_6)
+
+def test14_7():
+    """Test: local PII pre-screen applies the 14.1 policy mapping before agent.run"""
+    from lyzr.rai import PIIType, PIIAction
+    engine = PIIEngine({PIIType.PHONE: PIIAction.REDACT, PIIType.EMAIL: PIIAction.REDACT})
+    screen = engine.screen("I'm +1 415-555-0100, jane@example.com. Where is ORD-1001?")
+    assert screen.text == "I'm <PHONE_NUMBER>, <EMAIL_ADDRESS>. Where is ORD-1001?", screen.text
+    failures = check_parity()
+    assert not failures, failures[0]
+
+    sent = []
+    class Echo:
+        def run(self, message, **kw):
+            sent.append(message)
+    guard(Echo(), engine).run("Reach me on jane@example.com")
+    assert sent == ["Reach me on <EMAIL_ADDRESS>"], sent
+
+test("14.7 Local PII pre-screen", test14_7)
+
 
 # ─── Lesson 15 tests ────────────────────────────────────────────────
 
@@ -112,21 +212,21 @@ print("\n=== Lesson 15: Multi-agent E-commerce ===")
 def test15_1():
     """Test: three sub-agents created"""
     global order_agent, product_agent, billing_agent
-    order_agent = studio.create_agent(
+    order_agent = provision(
         name="Order Specialist Test",
         provider="openai/gpt-4o-mini",
         role="Order management specialist",
         goal="Handle order questions",
         instructions="Answer order status, return, and cancellation questions concisely."
     )
-    product_agent = studio.create_agent(
+    product_agent = provision(
         name="Product Specialist Test",
         provider="openai/gpt-4o-mini",
         role="Product specialist",
         goal="Answer product questions",
         instructions="Answer product availability and recommendation questions concisely."
     )
-    billing_agent = studio.create_agent(
+    billing_agent = provision(
         name="Billing Specialist Test",
         provider="openai/gpt-4o-mini",
         role="Billing specialist",
@@ -160,7 +260,7 @@ def test15_2():
         """
         return billing_agent.run(query).response
 
-    manager = studio.create_agent(
+    manager = provision(
         name="Support Manager Test",
         provider="openai/gpt-4o-mini",
         role="Customer support routing manager",
@@ -171,11 +271,9 @@ def test15_2():
             "For products: use handle_product_query. "
             "For billing/payments/refunds: use handle_billing_query. "
             "Never answer from your own knowledge."
-        )
+        ),
+        tools=[handle_order_query, handle_product_query, handle_billing_query],
     )
-    manager.add_tool(handle_order_query)
-    manager.add_tool(handle_product_query)
-    manager.add_tool(handle_billing_query)
 
     # Test order routing
     r_order = manager.run("Where is my order ORD-1001?")
@@ -197,19 +295,32 @@ def test15_3():
         """Handle refund requests, payments, invoices, billing issues. Do NOT use for order logistics."""
         return billing_agent.run(query).response
 
-    manager2 = studio.create_agent(
+    def consult_order_and_billing(order_query: str, billing_query: str) -> str:
+        """Ask the order and billing specialists at the same time, for questions that span both.
+        Pass the order/shipping/cancellation part as order_query and the refund/payment part as billing_query.
+        """
+        fanned = fan_out(
+            {"Order specialist": order_query, "Billing specialist": billing_query},
+            {"Order specialist": ask(order_agent), "Billing specialist": ask(billing_agent)},
+            timeout=60.0,
+        )
+        latencies = ", ".join(f"{k} {v:.1f}s" for k, v in fanned.latency.items())
+        print(f"    [fan-out {fanned.elapsed:.1f}s: {latencies}]")
+        return fanned.combined()
+
+    manager2 = provision(
         name="Multi-domain Manager Test",
         provider="openai/gpt-4o-mini",
         role="Customer support routing manager",
-        goal="Route queries correctly, call multiple tools for multi-domain questions",
+        goal="Route queries correctly, consult several specialists at once for multi-domain questions",
         instructions=(
-            "Use handle_order_query_md for order questions. "
-            "Use handle_billing_query_md for billing/refund questions. "
-            "For queries spanning both domains, call both tools."
-        )
+            "Use handle_order_query_md for order-only questions. "
+            "Use handle_billing_query_md for billing/refund-only questions. "
+            "For queries spanning both domains, call consult_order_and_billing once "
+            "with the order part and the billing part, then combine the answers."
+        ),
+        tools=[handle_order_query_md, handle_billing_query_md, consult_order_and_billing],
     )
-    manager2.add_tool(handle_order_query_md)
-    manager2.add_tool(handle_billing_query_md)
 
     r = manager2.run("My order ORD-1002 hasn't arrived. I want to cancel it and get a refund.")
     assert r.response, "Empty multi-domain response"
@@ -217,6 +328,63 @@ def test15_3():
 
 test("15.3 Manager multi-domain query", test15_3)
 
+def test15_4():
+    """Test: repeated FAQ questions are served from the specialist cache"""
+    cache = ResponseCache(ttl=300)
+
+    @cached_tool(cache, "order")
+    def handle_order_query(query: str) -> str:
+        """Handle customer questions about orders, returns, cancellations, and shipping status."""
+        return order_agent.run(query).response
+
+    first = handle_order_query("What is your return window?")
+    second = handle_order_query("what is your return window")
+    assert first and second == first, "Cached answer differs from the original"
+    handle_order_query("Where is ORD-1001?")   # order IDs are never cached
+    s = cache.stats
+    assert (s.hits, s.misses, s.bypassed) == (1, 1, 1), f"Unexpected cache stats: {s}"
+    assert handle_order_query.__doc__.startswith("Handle customer questions"), "Docstring lost"
+
+test("15.4 Specialist response cache", test15_4)
+
+def test15_5():
+    """Test: local pre-router sends clear-cut queries straight to the specialist"""
+    called = []
+
+    def call(name, query):
+        called.append(name)
+        agent = {"handle_order_query": order_agent, "handle_product_query": product_agent,
+                 "handle_billing_query": billing_agent}[name]
+        return agent.run(query).response
+
+    router = PreRouter(lesson15_wrappers(call), ECOMMERCE_EXAMPLES, ECOMMERCE_RULES)
+    report = evaluate(router)
+    assert report["direct_accuracy"] >= 0.9, f"Pre-router accuracy {report['direct_accuracy']:.0%}"
+    assert report["multi_sent_direct"] == 0, "Multi-domain query bypassed the manager"
+
+    class NoManager:
+        def run(self, query, **kw):
+            raise AssertionError(f"Unexpected manager fallback for {query!r}")
+
+    support = RoutedSupport(router, NoManager())
+    r = support("I was charged twice for my last order. I'd like a refund for the duplicate charge.")
+    assert r and called == ["handle_billing_query"], f"Routed to {called}"
+
+test("15.5 Local pre-router bypasses the manager", test15_5)
+
+
+# ─── Cleanup ────────────────────────────────────────────────────────
+
+print("\nCleaning up created resources...")
+print(f"Cleanup: {delete_all(cleanup)}")
+if pool is not None:
+    print(f"Agent pool: {pool.stats.reused} reused, {pool.stats.updated} updated, "
+          f"{pool.stats.created} created")
+if tracer is not None:
+    tracer.close()
+if cassette is not None:
+    cassette.close()
+
 
 # ─── Summary ────────────────────────────────────────────────────────
 